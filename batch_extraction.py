@@ -0,0 +1,188 @@
+"""
+Headless batch extraction of tender dossiers.
+
+Processes a directory of tender folders (each holding its RC, CPS and/or avis
+PDFs) with a pool of workers, and writes the results of each tender to a JSON
+file and to the SQLite `extractions` table. Failed tenders are written to a
+separate `<tender>.error.json` file, so a resumed run (--skip-existing) retries them.
+
+Usage:
+    python batch_extraction.py dossiers/ --workers 4 --output output/batch
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from db import DatabaseManager
+from utils.extraction import EXTRACTION_MODE, MAX_CONCURRENT_FIELDS, run_extraction
+from utils.progress import LoggingProgress
+
+logger = logging.getLogger("batch_extraction")
+
+# Constants
+DOC_TYPES = ("rc", "cps", "avis")
+DEFAULT_WORKERS = 2
+DEFAULT_OUTPUT_DIR = "output/batch"
+DEFAULT_DB_PATH = "data/tenders.db"
+ERROR_SUFFIX = ".error.json"
+
+def find_tender_documents(tender_dir: str) -> Dict[str, str]:
+    """
+    Find the RC / CPS / avis PDFs of a tender folder.
+    A file belongs to a document type when its name starts with it (rc.pdf, RC_2024.pdf, ...).
+
+    Args:
+        tender_dir (str): Tender folder
+
+    Returns:
+        Dict[str, str]: Document type -> PDF path
+    """
+    documents = {}
+    for filename in sorted(os.listdir(tender_dir)):
+        stem, ext = os.path.splitext(filename.lower())
+        if ext != ".pdf":
+            continue
+        for doc_type in DOC_TYPES:
+            if doc_type not in documents and re.match(rf"{doc_type}(?:$|[\s_.-])", stem):
+                documents[doc_type] = os.path.join(tender_dir, filename)
+                break
+    return documents
+
+def result_path(output_dir: str, name: str, failed: bool = False) -> str:
+    """Path of the JSON result file of a tender (failed extractions have their own file)"""
+    return os.path.join(output_dir, f"{name}{ERROR_SUFFIX}" if failed else f"{name}.json")
+
+def is_extracted(output_dir: str, name: str) -> bool:
+    """Whether a tender already has a successful result file (result files of older runs may hold errors)"""
+    try:
+        with open(result_path(output_dir, name), "r", encoding="utf-8") as f:
+            return json.load(f).get("status") == "ok"
+    except (OSError, ValueError):
+        return False
+
+def extract_tender(name: str, tender_dir: str, output_dir: str, max_concurrency: int, mode: str) -> Dict:
+    """
+    Extract one tender and write its JSON result file.
+
+    Args:
+        name (str): Tender name (folder name)
+        tender_dir (str): Tender folder
+        output_dir (str): Directory of the JSON result files
+        max_concurrency (int): Fields extracted at the same time
+        mode (str): Extraction mode ("per_field" or "structured")
+
+    Returns:
+        Dict: Tender summary (status, duration, results, output path)
+    """
+    documents = find_tender_documents(tender_dir)
+    if not documents:
+        return {"tender": name, "status": "skipped", "error": "Aucun PDF RC/CPS/avis trouvé"}
+
+    start = time.perf_counter()
+    results, paths = run_extraction(documents, LoggingProgress(name, logger), max_concurrency, mode)
+    duration = time.perf_counter() - start
+
+    status = "error" if "Error" in results else "ok"
+    record = {
+        "tender": name,
+        "status": status,
+        "documents": documents,
+        "session_dir": paths["session_dir"] if paths else None,
+        "duration_seconds": round(duration, 2),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+
+    output_path = result_path(output_dir, name, failed=status == "error")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+    if status == "ok" and os.path.exists(result_path(output_dir, name, failed=True)):
+        # Error of a previous run, now retried successfully
+        os.remove(result_path(output_dir, name, failed=True))
+    record["output_path"] = output_path
+    return record
+
+def run_batch(input_dir: str, output_dir: str = DEFAULT_OUTPUT_DIR, workers: int = DEFAULT_WORKERS,
+              max_concurrency: int = MAX_CONCURRENT_FIELDS, mode: str = EXTRACTION_MODE,
+              db_path: Optional[str] = DEFAULT_DB_PATH, skip_existing: bool = False) -> List[Dict]:
+    """
+    Extract every tender folder of a directory with a pool of workers.
+
+    Args:
+        input_dir (str): Directory with one sub-folder per tender
+        output_dir (str): Directory of the JSON result files
+        workers (int): Tenders processed at the same time
+        max_concurrency (int): Fields extracted at the same time within a tender
+        mode (str): Extraction mode ("per_field" or "structured")
+        db_path (Optional[str]): SQLite database receiving the results, None to skip it
+        skip_existing (bool): Skip tenders already extracted successfully (failed ones are retried)
+
+    Returns:
+        List[Dict]: Summary of each tender
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tenders = sorted(d for d in os.listdir(input_dir) if os.path.isdir(os.path.join(input_dir, d)))
+    if skip_existing:
+        tenders = [t for t in tenders if not is_extracted(output_dir, t)]
+    logger.info("%d dossiers à traiter avec %d workers", len(tenders), workers)
+
+    # The database connection is only used from this thread
+    db = DatabaseManager(db_path) if db_path else None
+
+    summaries = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(extract_tender, name, os.path.join(input_dir, name), output_dir, max_concurrency, mode): name
+            for name in tenders
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                summary = {"tender": name, "status": "error", "error": str(e)}
+
+            if db is not None and summary["status"] == "ok":
+                summary["extraction_id"] = db.save_extraction_to_db(summary["results"])
+
+            logger.info("[%s] %s (%d/%d)", name, summary["status"], len(summaries) + 1, len(tenders))
+            summary.pop("results", None)
+            summaries.append(summary)
+
+    with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(sorted(summaries, key=lambda s: s["tender"]), f, ensure_ascii=False, indent=2)
+    return summaries
+
+def main():
+    parser = argparse.ArgumentParser(description="Extraction en lot des dossiers d'appels d'offres")
+    parser.add_argument("input_dir", help="Directory with one sub-folder of RC/CPS/avis PDFs per tender")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR, help="Directory of the JSON result files")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Tenders processed at the same time")
+    parser.add_argument("--field-concurrency", type=int, default=MAX_CONCURRENT_FIELDS,
+                        help="Fields extracted at the same time within a tender")
+    parser.add_argument("--mode", choices=["per_field", "structured"], default=EXTRACTION_MODE)
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="SQLite database receiving the results")
+    parser.add_argument("--no-db", action="store_true", help="Only write the JSON files")
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="Skip tenders already extracted successfully (resume a run, retrying failures)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    summaries = run_batch(args.input_dir, args.output, args.workers, args.field_concurrency, args.mode,
+                          None if args.no_db else args.db, args.skip_existing)
+    failed = [s["tender"] for s in summaries if s["status"] == "error"]
+    if failed:
+        logger.error("Échec pour %d dossiers: %s", len(failed), ", ".join(failed))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
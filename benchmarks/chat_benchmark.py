@@ -0,0 +1,116 @@
+"""
+Time-to-first-token benchmark of chatbot answers, streamed or not.
+
+Runs on the offline backend with simulated request and per-token latencies
+(TENDERAI_OFFLINE_CHAT_LATENCY_MS, TENDERAI_OFFLINE_TOKEN_LATENCY_MS), in a
+temporary directory so the response cache starts empty. Without streaming the
+first token is shown with the whole answer; with streaming it is shown after
+the request latency and one token. The script also checks that closing a stream
+early stops the generation and caches nothing, and compares the history part of
+the prompt over a long session with and without the bounded conversation memory.
+
+Usage:
+    python benchmarks/chat_benchmark.py --questions 10 --chat-latency-ms 400 --token-latency-ms 15
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+CONTEXT = (
+    "Le montant de la caution provisoire est fixé à trente mille dirhams et doit être déposé auprès du trésorier "
+    "payeur avant la date limite de remise des offres fixée au treize juin à dix heures dans la salle des réunions. "
+    "Les critères d'évaluation des offres sont la conformité technique des prestations proposées puis le prix le plus "
+    "bas parmi les offres retenues après l'examen des dossiers administratifs et techniques par la commission."
+)
+
+def _messages(question: str):
+    return [
+        {"role": "system", "content": f"Réponds à partir du contexte.\n\nCONTEXTE EXTRAIT DES DOCUMENTS:\n{CONTEXT}"},
+        {"role": "user", "content": question},
+    ]
+
+def run(questions: int) -> None:
+    from utils.backends import get_chat_client
+    from utils.llm_cache import cached_chat_completion, get_llm_cache, stream_chat_completion
+
+    client = get_chat_client()
+    blocking, first_token, streamed_total = [], [], []
+    for i in range(questions):
+        question = f"Question {i}: quel est le montant de la caution provisoire et la date limite des offres ?"
+
+        start = time.perf_counter()
+        cached_chat_completion(client, "offline-chat", _messages(question + " (sans streaming)"), temperature=0.3)
+        blocking.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        first = None
+        for _ in stream_chat_completion(client, "offline-chat", _messages(question), temperature=0.3):
+            if first is None:
+                first = time.perf_counter() - start
+        first_token.append(first)
+        streamed_total.append(time.perf_counter() - start)
+
+    # Closing a stream early (new user message) stops it and caches nothing
+    cancelled = _messages("Question annulée: quels sont les critères d'évaluation des offres ?")
+    pieces = stream_chat_completion(client, "offline-chat", cancelled, temperature=0.3)
+    next(pieces)
+    start = time.perf_counter()
+    pieces.close()
+    close_time = time.perf_counter() - start
+    cache = get_llm_cache()
+    assert cache.get(cache.make_key("offline-chat", 0.3, cancelled, {})) is None, "A cancelled stream was cached"
+
+    def p50(values):
+        return statistics.median(values) * 1000
+
+    print(f"{questions} questions")
+    print(f"Time to first token, streamed:      {p50(first_token):8.1f} ms (p50)")
+    print(f"Time to first token, not streamed:  {p50(blocking):8.1f} ms (p50, whole answer)")
+    print(f"Full answer, streamed:              {p50(streamed_total):8.1f} ms (p50)")
+    print(f"Cancellation: stream closed in {close_time * 1000:.2f} ms, nothing cached")
+
+def history_growth(turns: int) -> None:
+    """History tokens per turn: full replay vs ConversationMemory"""
+    from utils.backends import get_chat_client
+    from utils.chat_memory import ConversationMemory
+    from utils.context_packing import count_tokens
+
+    client = get_chat_client()
+    memory = ConversationMemory()
+    history = []
+    print(f"{'turn':>5} {'full history':>13} {'memory':>8}  (history tokens in the prompt)")
+    for turn in range(1, turns + 1):
+        messages = memory.build_messages(history, client, "offline-chat")
+        if turn % max(1, turns // 6) == 0 or turn == turns:
+            full = sum(count_tokens(m["content"]) for m in history)
+            bounded = sum(count_tokens(m["content"]) for m in messages)
+            print(f"{turn:>5} {full:>13} {bounded:>8}")
+        history.append({"content": f"Question {turn}: quel est le délai d'exécution du lot {turn} du marché ?", "is_user": True})
+        history.append({"content": f"Selon l'article {turn} du CPS, le délai d'exécution du lot {turn} est de "
+                                   f"{turn % 12 + 1} mois à compter de l'ordre de service. " * 4, "is_user": False})
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-first-token of chatbot answers")
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--chat-latency-ms", type=float, default=400, help="Simulated request latency")
+    parser.add_argument("--token-latency-ms", type=float, default=15, help="Simulated generation time per token")
+    parser.add_argument("--turns", type=int, default=30, help="Length of the simulated session (history size)")
+    args = parser.parse_args()
+
+    os.environ["TENDERAI_BACKEND"] = "offline"
+    os.environ["TENDERAI_OFFLINE_CHAT_LATENCY_MS"] = str(args.chat_latency_ms)
+    os.environ["TENDERAI_OFFLINE_TOKEN_LATENCY_MS"] = str(args.token_latency_ms)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        run(args.questions)
+        history_growth(args.turns)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Stage-level benchmark of the tender extraction pipeline.
+
+Runs utils/extraction end-to-end on a corpus of sample tenders and reports, per
+pipeline stage (save, pymupdf, llamaparse, chunking, embedding, retrieval, llm),
+the p50/p95 latency, plus the peak RSS and token counts of each run. Results are
+written as JSON so they can be compared between commits (--compare).
+
+Corpus layout: one directory per tender holding rc.pdf, cps.pdf and/or avis.pdf.
+A synthetic corpus can be generated with --make-sample-corpus.
+
+API calls are answered by the offline backend (utils/backends.py). To benchmark
+against real responses, record them once with the openai backend (--record: LlamaParse
+outputs, embeddings and chat answers, on cold caches) and pass the file with --replay.
+Replay hits and misses are reported; a replayed benchmark fails if any request was
+missing from the recording, since its stages would not measure the recorded pipeline.
+
+Usage:
+    python benchmarks/extraction_benchmark.py --make-sample-corpus benchmarks/corpus
+    python benchmarks/extraction_benchmark.py --corpus benchmarks/corpus --runs 5 --output results.json
+    python benchmarks/extraction_benchmark.py --corpus benchmarks/corpus --compare baseline.json
+    python benchmarks/extraction_benchmark.py --corpus benchmarks/corpus --runs 1 --record responses.jsonl
+    python benchmarks/extraction_benchmark.py --corpus benchmarks/corpus --replay responses.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Constants
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOC_TYPES = ("rc", "cps", "avis")
+DEFAULT_RUNS = 3
+STAGES = ("save", "pymupdf", "llamaparse", "chunking", "embedding", "index_load", "rules", "retrieval", "llm")
+
+class _UploadedPDF:
+    """File-like object standing in for a Streamlit upload"""
+
+    def __init__(self, path: str):
+        self.name = os.path.basename(path)
+        self._path = path
+
+    def read(self) -> bytes:
+        with open(self._path, "rb") as f:
+            return f.read()
+
+def _peak_rss_mb() -> Dict[str, float]:
+    """Peak resident set size of this process and of its finished children (MB)"""
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit,
+    }
+
+def run_single(tender_dir: str, repeat: int = 1) -> Dict:
+    """
+    Extract one tender in the current process (current directory = scratch data dir).
+
+    Args:
+        tender_dir (str): Directory holding the tender PDFs
+        repeat (int): Number of consecutive extractions; only the last one is measured
+
+    Returns:
+        Dict: Stage durations, tokens, total time and peak RSS of the measured run
+    """
+    sys.path.insert(0, REPO_ROOT)
+    from utils.backends import replay_stats
+    from utils.extraction import run_extraction
+    from utils.profiling import recording
+
+    uploaded_files = {}
+    for doc_type in DOC_TYPES:
+        path = os.path.join(tender_dir, f"{doc_type}.pdf")
+        uploaded_files[doc_type] = _UploadedPDF(path) if os.path.exists(path) else None
+
+    # Warm-up runs fill the document, embedding and LLM caches
+    for _ in range(repeat - 1):
+        run_extraction(uploaded_files)
+
+    with recording() as recorder:
+        start = time.perf_counter()
+        results, _ = run_extraction(uploaded_files)
+        total = time.perf_counter() - start
+
+    report = recorder.to_dict()
+    report["total_seconds"] = total
+    report["peak_rss_mb"] = _peak_rss_mb()
+    report["fields_extracted"] = sum(1 for value in (results or {}).values() if value and not value.startswith("Erreur"))
+    report["replay"] = replay_stats()
+    return report
+
+def _run_in_subprocess(tender_dir: str, warm: bool, env: Dict[str, str]) -> Dict:
+    """Run one measured extraction in a fresh interpreter with empty caches"""
+    workdir = tempfile.mkdtemp(prefix="tenderai_bench_")
+    output_path = os.path.join(workdir, "report.json")
+    try:
+        command = [sys.executable, os.path.abspath(__file__), "--single", os.path.abspath(tender_dir),
+                   "--single-output", output_path, "--repeat", "2" if warm else "1"]
+        completed = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+        if completed.returncode != 0 or not os.path.exists(output_path):
+            raise RuntimeError(f"Benchmark run failed for {tender_dir}:\n{completed.stderr[-2000:]}")
+        with open(output_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0}
+    return {"p50": float(np.percentile(values, 50)), "p95": float(np.percentile(values, 95))}
+
+def summarize(reports: List[Dict]) -> Dict:
+    """
+    Aggregate run reports into per-stage percentiles.
+
+    Args:
+        reports (List[Dict]): Reports returned by run_single
+
+    Returns:
+        Dict: Per-stage p50/p95 (per run and per call), totals, peak RSS and tokens
+    """
+    stage_names = list(STAGES) + sorted({name for r in reports for name in r["durations"]} - set(STAGES))
+    stages = {}
+    for name in stage_names:
+        per_run = [sum(r["durations"].get(name, [])) for r in reports]
+        per_call = [d for r in reports for d in r["durations"].get(name, [])]
+        if not per_call:
+            continue
+        stages[name] = {
+            "calls_per_run": len(per_call) / len(reports),
+            "per_run_seconds": _percentiles(per_run),
+            "per_call_seconds": _percentiles(per_call),
+        }
+
+    return {
+        "stages": stages,
+        "total_seconds": _percentiles([r["total_seconds"] for r in reports]),
+        "peak_rss_mb": {
+            "self": max(r["peak_rss_mb"]["self"] for r in reports),
+            "children": max(r["peak_rss_mb"]["children"] for r in reports),
+        },
+        "tokens_per_run": {key: float(np.mean([r["tokens"][key] for r in reports]))
+                           for key in ("prompt_tokens", "completion_tokens", "llm_calls")},
+    }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _replay_totals(reports: List[Dict]) -> Dict[str, Dict[str, int]]:
+    """Replay hits and misses summed over runs, per kind of request"""
+    totals = {}
+    for report in reports:
+        for kind, counts in report.get("replay", {}).items():
+            total = totals.setdefault(kind, {"hits": 0, "misses": 0})
+            total["hits"] += counts["hits"]
+            total["misses"] += counts["misses"]
+    return totals
+
+def run_benchmark(corpus_dir: str, runs: int = DEFAULT_RUNS, warm: bool = False,
+                  replay_file: Optional[str] = None, record_file: Optional[str] = None) -> Dict:
+    """
+    Benchmark every tender of a corpus.
+
+    Args:
+        corpus_dir (str): Directory with one sub-directory per tender
+        runs (int): Measured runs per tender
+        warm (bool): Measure a second extraction on warm caches instead of a cold one
+        replay_file (Optional[str]): Recording (JSONL) of parses, embeddings and chat answers to replay
+        record_file (Optional[str]): Record the openai backend's parses, embeddings and answers to this file
+
+    Returns:
+        Dict: Benchmark results (metadata, per-tender and overall summaries)
+
+    Raises:
+        RuntimeError: Some requests were missing from the replay file
+    """
+    env = dict(os.environ)
+    if record_file:
+        env["TENDERAI_BACKEND"] = "openai"
+        env["TENDERAI_RECORD_FILE"] = os.path.abspath(record_file)
+    env.setdefault("TENDERAI_BACKEND", "offline")
+    if replay_file:
+        env["TENDERAI_REPLAY_FILE"] = os.path.abspath(replay_file)
+
+    tenders = sorted(d for d in os.listdir(corpus_dir) if os.path.isdir(os.path.join(corpus_dir, d)))
+    if not tenders:
+        raise ValueError(f"Aucun dossier d'appel d'offres dans {corpus_dir}")
+
+    all_reports = []
+    per_tender = {}
+    for tender in tenders:
+        reports = []
+        for run in range(runs):
+            print(f"{tender}: run {run + 1}/{runs}", file=sys.stderr, flush=True)
+            reports.append(_run_in_subprocess(os.path.join(corpus_dir, tender), warm, env))
+        per_tender[tender] = summarize(reports)
+        all_reports.extend(reports)
+
+    replay = _replay_totals(all_reports) if replay_file else None
+    if replay:
+        for kind, counts in replay.items():
+            print(f"Replay {kind}: {counts['hits']} hits, {counts['misses']} misses", file=sys.stderr)
+        missed = {kind: counts["misses"] for kind, counts in replay.items() if counts["misses"]}
+        if missed:
+            raise RuntimeError(f"Requests missing from the replay file {replay_file}: {missed}. "
+                               "Record it again with --record on the same corpus.")
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "backend": env["TENDERAI_BACKEND"],
+        "replay_file": replay_file,
+        "replay": replay,
+        "cache": "warm" if warm else "cold",
+        "runs_per_tender": runs,
+        "overall": summarize(all_reports),
+        "tenders": per_tender,
+    }
+
+def compare(results: Dict, baseline: Dict) -> None:
+    """Print per-stage p50 changes against a baseline result file"""
+    current, previous = results["overall"], baseline["overall"]
+    print(f"{'stage':<12} {'baseline p50':>14} {'current p50':>14} {'change':>9}")
+    rows = [(name, previous["stages"].get(name, {}).get("per_run_seconds", {}).get("p50"),
+             stage["per_run_seconds"]["p50"]) for name, stage in current["stages"].items()]
+    rows.append(("total", previous["total_seconds"]["p50"], current["total_seconds"]["p50"]))
+    for name, before, after in rows:
+        change = f"{(after - before) / before:+.1%}" if before else "n/a"
+        before_text = f"{before:.3f}s" if before is not None else "-"
+        print(f"{name:<12} {before_text:>14} {after:>13.3f}s {change:>9}")
+
+def make_sample_corpus(output_dir: str, tenders: int = 3, pages: int = 8) -> None:
+    """
+    Generate synthetic tender PDFs (French RC / CPS / avis wording).
+
+    Args:
+        output_dir (str): Corpus directory to create
+        tenders (int): Number of tenders
+        pages (int): Pages per document
+    """
+    import fitz  # PyMuPDF
+
+    sections = {
+        "rc": ("Règlement de consultation", [
+            "Objet de la consultation : travaux d'aménagement et d'entretien des espaces verts du lot {n}.",
+            "Le maître d'ouvrage est la Commune de Rabat, représentée par son président.",
+            "Le montant de la caution provisoire est fixé à {caution} dirhams.",
+            "La date limite de remise des offres est fixée au {day:02d}/06/2024 à 10h00.",
+            "Les critères d'évaluation des offres sont la conformité technique et le prix le plus bas.",
+        ]),
+        "cps": ("Cahier des prescriptions spéciales", [
+            "Le délai d'exécution des travaux est de {delay} mois à compter de l'ordre de service.",
+            "L'estimation du coût des prestations établie par le maître d'ouvrage est de {amount} dirhams TTC.",
+            "Les pénalités de retard sont fixées à un millième du montant du marché par jour calendaire.",
+            "Le titulaire doit fournir la liste des moyens humains et matériels affectés au chantier.",
+            "Les prix du présent marché sont fermes et non révisables.",
+        ]),
+        "avis": ("Avis d'appel d'offres ouvert", [
+            "Appel d'offres ouvert sur offres de prix n° {n}/2024 relatif aux travaux d'aménagement.",
+            "Le dossier d'appel d'offres peut être retiré au service des marchés de la commune.",
+            "Le montant de la caution provisoire est fixé à {caution} dirhams.",
+            "L'ouverture des plis aura lieu en séance publique le {day:02d}/06/2024 à 10h00.",
+        ]),
+    }
+
+    for t in range(1, tenders + 1):
+        tender_dir = os.path.join(output_dir, f"tender_{t:02d}")
+        os.makedirs(tender_dir, exist_ok=True)
+        values = {"n": t, "caution": 10000 * t, "day": 10 + t, "delay": 6 + t, "amount": f"{1250000 * t:,}".replace(",", " ")}
+        for doc_type, (title, sentences) in sections.items():
+            pdf = fitz.open()
+            for p in range(1, pages + 1):
+                page = pdf.new_page()
+                lines = [f"{title} - Article {p}"] + [s.format(**values) for s in sentences]
+                page.insert_textbox(fitz.Rect(50, 50, 550, 800), "\n\n".join(lines), fontsize=10)
+            pdf.save(os.path.join(tender_dir, f"{doc_type}.pdf"))
+            pdf.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage-level benchmark of the tender extraction pipeline")
+    parser.add_argument("--corpus", help="Directory with one sub-directory of PDFs per tender")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Measured runs per tender")
+    parser.add_argument("--warm", action="store_true", help="Measure runs on warm caches")
+    parser.add_argument("--replay", help="Recording to replay (JSONL written with --record)")
+    parser.add_argument("--record", help="Record parses, embeddings and chat answers of the openai backend to this file")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    parser.add_argument("--make-sample-corpus", metavar="DIR", help="Generate a synthetic corpus and exit")
+    # Internal: one measured run, executed in a scratch directory by run_benchmark
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    parser.add_argument("--single-output", help=argparse.SUPPRESS)
+    parser.add_argument("--repeat", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.make_sample_corpus:
+        make_sample_corpus(args.make_sample_corpus)
+        return
+
+    if args.single:
+        report = run_single(args.single, repeat=args.repeat)
+        with open(args.single_output, "w", encoding="utf-8") as f:
+            json.dump(report, f)
+        return
+
+    if not args.corpus:
+        parser.error("--corpus is required")
+
+    if args.record and args.replay:
+        parser.error("--record and --replay are exclusive")
+
+    try:
+        results = run_benchmark(args.corpus, runs=args.runs, warm=args.warm, replay_file=args.replay,
+                                record_file=args.record)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
+    else:
+        json.dump(results["overall"], sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Load and search benchmark of the memory-mapped index against the llama-index JSON stores.
+
+Random chunks and embeddings are indexed both ways (no embedding calls): the
+script checks that both return the same top-k chunks, then times persisting,
+loading and searching each index.
+
+Usage:
+    python benchmarks/index_benchmark.py --chunks 5000 --dim 1536
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+import numpy as np
+from llama_index.core import StorageContext, VectorStoreIndex, load_index_from_storage
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores import VectorStoreQuery
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.backends import HashingEmbedding
+from utils.mmap_index import MmapVectorIndex, _normalize_rows
+
+def make_index_data(chunks: int, dim: int, seed: int):
+    """Random chunks with embeddings"""
+    rng = np.random.default_rng(seed)
+    words = ["marché", "caution", "provisoire", "dirhams", "plis", "ouverture", "lot", "prix", "délai", "article"]
+    picker = random.Random(seed)
+    nodes = [
+        TextNode(
+            id_=f"node-{i}",
+            text=" ".join(picker.choice(words) for _ in range(200)),
+            metadata={"type": picker.choice(["rc", "cps", "avis"]), "page": picker.randint(1, 80)},
+        )
+        for i in range(chunks)
+    ]
+    embeddings = rng.standard_normal((chunks, dim)).astype(np.float32)
+    return nodes, embeddings
+
+def _time(function, repeat: int = 3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+def run(chunks: int, dim: int, queries: int, top_k: int, seed: int) -> None:
+    nodes, embeddings = make_index_data(chunks, dim, seed)
+    query_vectors = np.random.default_rng(seed + 1).standard_normal((queries, dim)).astype(np.float32)
+    embed_model = HashingEmbedding(embed_dim=dim)
+
+    for node, embedding in zip(nodes, embeddings):
+        node.embedding = embedding.tolist()
+    json_index = VectorStoreIndex(nodes, embed_model=embed_model)
+    records = [
+        {"id": n.node_id, "text": n.text, "metadata": n.metadata, "excluded_embed": [], "excluded_llm": [],
+         "start": None, "end": None}
+        for n in nodes
+    ]
+    mmap_index = MmapVectorIndex(records, _normalize_rows(embeddings), embed_model.model_name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir, mmap_dir, half_dir = (os.path.join(tmp, name) for name in ("json", "mmap", "mmap16"))
+        results = {
+            "persist (JSON stores)": _time(lambda: json_index.storage_context.persist(persist_dir=json_dir), 1)[0],
+            "persist (mmap float32)": _time(lambda: mmap_index.persist(mmap_dir), 1)[0],
+            "persist (mmap float16)": _time(lambda: mmap_index.persist(half_dir, dtype="float16"), 1)[0],
+        }
+        load_json, loaded_json = _time(
+            lambda: load_index_from_storage(StorageContext.from_defaults(persist_dir=json_dir), embed_model=embed_model), 1
+        )
+        load_mmap, loaded_mmap = _time(lambda: MmapVectorIndex.load(mmap_dir))
+        load_half, loaded_half = _time(lambda: MmapVectorIndex.load(half_dir))
+        results.update({
+            "load (JSON stores)": load_json,
+            "load (mmap float32)": load_mmap,
+            "load (mmap float16)": load_half,
+        })
+
+        # Same top-k chunks from both indices
+        vector_store = loaded_json.vector_store
+        agreement = 0
+        for query in query_vectors:
+            expected = vector_store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=top_k)).ids
+            actual = [loaded_mmap.records[row]["id"] for row, _ in loaded_mmap.search(query, top_k)]
+            agreement += expected == actual
+        assert agreement == queries, f"Top-{top_k} results differ on {queries - agreement}/{queries} queries"
+
+        results.update({
+            "search x%d (JSON stores)" % queries: _time(lambda: [
+                vector_store.query(VectorStoreQuery(query_embedding=q.tolist(), similarity_top_k=top_k))
+                for q in query_vectors
+            ], 1)[0],
+            "search x%d (mmap float32)" % queries: _time(lambda: [loaded_mmap.search(q, top_k) for q in query_vectors])[0],
+            "search x%d (mmap float16)" % queries: _time(lambda: [loaded_half.search(q, top_k) for q in query_vectors])[0],
+        })
+
+        print(f"{chunks} chunks, {dim} dimensions, top-{top_k}: same results on {queries} queries")
+        print(f"Size on disk: JSON {_dir_size(json_dir) / 1e6:.1f} MB, mmap float32 {_dir_size(mmap_dir) / 1e6:.1f} MB, "
+              f"mmap float16 {_dir_size(half_dir) / 1e6:.1f} MB")
+        for name, seconds in results.items():
+            print(f"{name:<28} {seconds * 1000:10.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory-mapped index vs llama-index JSON stores")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.chunks, args.dim, args.queries, args.top_k, args.seed)
+
+if __name__ == "__main__":
+    main()
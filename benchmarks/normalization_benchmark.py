@@ -0,0 +1,130 @@
+"""
+Micro-benchmark of utils/normalization.
+
+Random amounts and dates are written in the formats found in tenders and forms
+("1 234 567,89 DH", "1.250.000,00 dirhams", "2,5 millions de dirhams",
+"13/06/2024", "1er juin 2024"...). The script times the scalar and column paths
+against the previous per-value parser. The same generators drive the property
+tests of tests/test_normalization.py.
+
+Usage:
+    python benchmarks/normalization_benchmark.py --size 100000
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+from datetime import date, timedelta
+from typing import Callable, List, Tuple
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.normalization import parse_amount, parse_amount_series, parse_date, parse_date_series
+
+FRENCH_MONTH_NAMES = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août",
+                      "septembre", "octobre", "novembre", "décembre"]
+
+def _group_thousands(integer: int, separator: str) -> str:
+    return f"{integer:,}".replace(",", separator)
+
+def random_amount(rng: random.Random) -> Tuple[str, float]:
+    """A random amount written in one of the usual formats, with its value"""
+    integer = rng.randint(1000, 50_000_000)
+    cents = rng.choice([0, rng.randint(1, 99)])
+    value = integer + cents / 100
+    style = rng.randrange(6)
+    if style == 0:
+        text = f"{_group_thousands(integer, ' ')},{cents:02d} DH"
+    elif style == 1:
+        text = f"{_group_thousands(integer, '.')},{cents:02d} dirhams TTC"
+    elif style == 2:
+        text = f"{_group_thousands(integer, ',')}.{cents:02d} MAD"
+    elif style == 3:
+        text = f"Le montant est fixé à {integer},{cents:02d} Dhs"
+    elif style == 4:
+        # Whole millions written with a multiplier word
+        millions = rng.randint(1, 90) / 2
+        value = millions * 1e6
+        text = f"{str(millions).replace('.', ',').removesuffix(',0')} millions de dirhams"
+    else:
+        value = float(integer)
+        text = f"{_group_thousands(integer, chr(0x202f))} DH HT"
+    return text, value
+
+def random_date(rng: random.Random) -> Tuple[str, date]:
+    """A random date written in one of the usual formats, with its value"""
+    value = date(2015, 1, 1) + timedelta(days=rng.randrange(4000))
+    style = rng.randrange(5)
+    if style == 0:
+        text = value.strftime("%d/%m/%Y")
+    elif style == 1:
+        text = f"le {value.strftime('%d-%m-%y')} à 10h00"
+    elif style == 2:
+        text = value.isoformat()
+    elif style == 3:
+        day = "1er" if value.day == 1 else str(value.day)
+        text = f"{day} {FRENCH_MONTH_NAMES[value.month - 1]} {value.year}"
+    else:
+        text = f"Date limite: {value.strftime('%d.%m.%Y')}"
+    return text, value
+
+def legacy_parse_amount(amount_string):
+    """Previous per-value parser (largest digit run, separators dropped), kept for comparison"""
+    if not amount_string or amount_string == "Non spécifié":
+        return None
+    numbers = re.findall(r'[\d\s,\.]+', str(amount_string))
+    largest_num = 0
+    for num_str in numbers:
+        cleaned = num_str.replace(" ", "").replace(",", "")
+        if "." in cleaned:
+            cleaned = cleaned.split(".")[0]
+        if cleaned and cleaned.isdigit():
+            largest_num = max(largest_num, int(cleaned))
+    return largest_num or None
+
+def _time(function: Callable, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_benchmark(size: int, seed: int, distinct_ratio: float) -> None:
+    """Time scalar and column parsing of columns of the given size"""
+    rng = random.Random(seed)
+    # Real columns repeat the same values: draw the rows from a pool of distinct values
+    pool_size = max(1, int(size * distinct_ratio))
+    amount_pool = [random_amount(rng)[0] for _ in range(pool_size)]
+    date_pool = [random_date(rng)[0] for _ in range(pool_size)]
+    amount_texts: List[str] = [rng.choice(amount_pool) for _ in range(size)]
+    date_texts: List[str] = [rng.choice(date_pool) for _ in range(size)]
+    amount_series, date_series = pd.Series(amount_texts), pd.Series(date_texts)
+
+    print(f"{size} rows, {pool_size} distinct values per column")
+    timings = {
+        "amounts: legacy per-value parser": _time(lambda: [legacy_parse_amount(t) for t in amount_texts]),
+        "amounts: parse_amount per value": _time(lambda: [parse_amount(t) for t in amount_texts]),
+        "amounts: parse_amount_series": _time(lambda: parse_amount_series(amount_series)),
+        "dates: parse_date per value": _time(lambda: [parse_date(t) for t in date_texts]),
+        "dates: parse_date_series": _time(lambda: parse_date_series(date_series)),
+    }
+    for name, seconds in timings.items():
+        print(f"{name:<36} {seconds * 1000:9.1f} ms  {size / seconds:12,.0f} values/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of utils/normalization")
+    parser.add_argument("--size", type=int, default=100_000, help="Values per benchmarked column")
+    parser.add_argument("--distinct-ratio", type=float, default=0.05,
+                        help="Distinct values / rows in the benchmarked columns (1 = all distinct)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run_benchmark(args.size, args.seed, args.distinct_ratio)
+
+if __name__ == "__main__":
+    main()
@@ -123,13 +123,23 @@ class DatabaseManager:
                 "Modalités de retrait des documents": "document_withdrawal",
                 "Coordonnées de contact": "contact_info",
                 "Date limite de soumission": "submission_deadline",
-                "Profils professionnels requis": "professional_profiles"
+                "Profils professionnels requis": "professional_profiles",
+                # Field names of utils/extraction.py prompts
+                "Référence": "reference",
+                "Date": "publication_date",
+                "Maître d'Ouvrage": "contracting_authority",
+                "Estimation des coûts": "budget",
+                "Montant de la caution": "provisional_deposit",
+                "Objet": "main_objective",
+                "Modalités de retrait": "document_withdrawal",
+                "Contact": "contact_info"
             }
             
             # Prepare data for insertion
             data = {}
             for field, db_col in mapping.items():
-                data[db_col] = results.get(field, "")
+                if field in results or db_col not in data:
+                    data[db_col] = results.get(field, "")
             
             # Add run_id and creation_date
             data["run_id"] = run_id if run_id else ""
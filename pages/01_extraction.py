@@ -7,7 +7,9 @@ from typing import Dict
 from datetime import datetime
 
 # Import improved extraction module
-from utils.extraction import extract_field_information, clear_old_sessions, map_extraction_to_database
+from utils.extraction import map_extraction_to_database, process_uploaded_files, prompts
+from utils.session_store import get_session_store
+from utils.jobs import POLL_INTERVAL_SECONDS, JobQueue, ensure_workers
 
 # Import gestion utilities for database operations
 from utils.gestion import save_to_database
@@ -35,6 +37,68 @@ def create_output_document(results: Dict[str, str], output_path: str) -> None:
     
     doc.save(output_path)
 
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """Job queue shared by all sessions of the app"""
+    return JobQueue()
+
+def clear_job():
+    """Forget the extraction job of this session"""
+    st.session_state.pop("extraction_job_id", None)
+    st.experimental_set_query_params()
+
+def show_job_status(job_id: str):
+    """
+    Show the status and partial results of an extraction job.
+    The page polls the job until it finishes; the job itself runs in a worker process.
+    """
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    
+    if job is None:
+        st.warning("Tâche d'extraction introuvable.")
+        clear_job()
+        return
+    
+    if job["status"] == "done":
+        # Store in session state
+        st.session_state.document_data = job["results"]
+        st.session_state.document_processed = True
+        for key, path in (job["paths"] or {}).items():
+            st.session_state[key] = path
+        clear_job()
+        st.rerun()
+    
+    if job["status"] == "error":
+        st.error(f"Erreur d'extraction: {job['error']}")
+        if st.button("🔄 Traiter de nouveaux documents"):
+            clear_job()
+            st.rerun()
+        return
+    
+    # Queued or running: make sure a worker will pick the job up
+    ensure_workers(queue)
+    if job["status"] == "queued":
+        st.info("⏳ Extraction en attente d'un worker...")
+    else:
+        st.info("⚙️ Extraction en cours... Vous pouvez actualiser la page, le traitement continue.")
+    st.progress(min(1.0, job["progress"] or 0.0))
+    
+    with st.expander("Journal du traitement", expanded=False):
+        for message in job["messages"]:
+            st.write(message)
+    
+    # Fields already extracted, in the order of the prompts
+    partial_results = job["partial_results"] or {}
+    if partial_results:
+        st.subheader("📋 Informations déjà extraites")
+        for field in prompts:
+            if field in partial_results:
+                st.markdown(f"**{field}**: {partial_results[field]}")
+    
+    time.sleep(POLL_INTERVAL_SECONDS)
+    st.rerun()
+
 def main():
     st.title("Génération de la fiche de dépouillement")
     st.markdown("""
@@ -42,8 +106,8 @@ def main():
     les informations importantes et générer une fiche de dépouillement.
     """)
     
-    # Clean up old sessions
-    clear_old_sessions()
+    # Keep the document cache within its disk quota (LRU eviction, in a background thread)
+    get_session_store().start_gc()
     
     # Check if we already have processed documents
     if st.session_state.get('document_processed', False):
@@ -154,6 +218,13 @@ def main():
         
         return
     
+    # Extraction job of this session; kept in the URL so it survives a browser refresh
+    job_id = st.session_state.get("extraction_job_id") or st.experimental_get_query_params().get("job", [None])[0]
+    if job_id:
+        st.session_state.extraction_job_id = job_id
+        show_job_status(job_id)
+        return
+    
     # File uploaders
     col1, col2, col3 = st.columns(3)
     
@@ -176,50 +247,17 @@ def main():
             run_id = f"extraction_{int(time.time())}"
             st.session_state.run_id = run_id
             
-            with st.spinner("Traitement des documents en cours..."):
-                # Extract information using session-isolated approach
-                results = extract_field_information(upload)
-                
-                # Validate results
-                if not results:
-                    st.error("L'extraction n'a pas retourné de résultats.")
-                    return
-                
-                if "Error" in results:
-                    st.error(f"Erreur d'extraction: {results['Error']}")
-                    return
-                
-                # Store in session state
-                st.session_state.document_data = results
-                st.session_state.document_processed = True
-                
-                # Display results
-                st.subheader("📋 Informations Extraites")
-                
-                # Organize results in a nice format
-                col1, col2 = st.columns(2)
-                
-                fields_left = ["Référence", "Objet", "Maître d'Ouvrage", "Date", "Estimation des coûts", "Montant de la caution"]
-                fields_right = ["Contact", "Contenu Dossier", "Modalités de retrait", "Offre Financière", "Offre Technique"]
-                
-                with col1:
-                    st.markdown("### 📊 Informations Principales")
-                    for field in fields_left:
-                        if field in results:
-                            st.markdown(f"**{field}**: {results[field]}")
-                
-                with col2:
-                    st.markdown("### 📋 Informations Complémentaires")
-                    for field in fields_right:
-                        if field in results:
-                            st.markdown(f"**{field}**: {results[field]}")
-
-                # Show success message
-                st.success("✅ Extraction terminée avec succès!")
-                st.info("💡 Utilisez les boutons ci-dessus pour télécharger la fiche ou sauvegarder vers la base de données")
-                
-                # Auto-scroll to top to show the action buttons
-                st.rerun()
+            with st.spinner("Enregistrement des documents..."):
+                _, saved_files = process_uploaded_files(upload)
+            
+            # Extraction runs in a worker process; the page only polls the job
+            queue = get_job_queue()
+            job_id = queue.submit(saved_files)
+            ensure_workers(queue)
+            
+            st.session_state.extraction_job_id = job_id
+            st.experimental_set_query_params(job=job_id)
+            st.rerun()
 
         except Exception as e:
             st.error(f"Une erreur s'est produite: {e}")
@@ -1,19 +1,26 @@
 import os
 import streamlit as st
-from openai import OpenAI
-from llama_index.core import load_index_from_storage, StorageContext
-from llama_index.core.query_engine import RetrieverQueryEngine
+from utils.answer_cache import get_answer_cache, is_standalone_question
+from utils.backends import get_chat_client
+from utils.context_packing import get_context_budget, pack_context
+from utils.chat_memory import ConversationMemory
+from utils.embedding_cache import configure_embeddings, get_embed_model
+from utils.llm_cache import stream_chat_completion
+from utils.index_registry import get_index_registry
 
 # Hardcoded API key (for testing phase only)
 OPENAI_KEY = ""
 DEFAULT_MODEL = ""
+STREAM_CURSOR = "▌"
+ERROR_PREFIX = "Erreur lors de la génération de la réponse"
+CHAT_TOP_K = 4  # Chunks retrieved per question; those fitting the model's token budget are sent
 
 # Set keys
 os.environ["OPENAI_API_KEY"] = OPENAI_KEY
 
-def initialize_query_engine():
+def initialize_retriever():
     """
-    Initialize the query engine from the stored index if available
+    Initialize the retriever from the stored index if available
     """
     if not st.session_state.get('index_path'):
         st.error("Aucun document traité. Veuillez d'abord extraire les données dans l'onglet principal.")
@@ -26,14 +33,11 @@ def initialize_query_engine():
             st.error(f"Index non trouvé: {index_path}")
             return None
             
-        storage_context = StorageContext.from_defaults(persist_dir=index_path)
-        index = load_index_from_storage(storage_context)
+        # Query embeddings must come from the model the index was built with
+        configure_embeddings()
         
-        # Create the query engine
-        retriever = index.as_retriever(similarity_top_k=3)
-        query_engine = RetrieverQueryEngine.from_args(retriever=retriever)
-        
-        return query_engine
+        # Loaded once per process and shared by every rerun and session on the same tender
+        return get_index_registry().get_retriever(index_path, similarity_top_k=CHAT_TOP_K)
     except Exception as e:
         st.error(f"Erreur lors du chargement de l'index: {e}")
         return None
@@ -51,53 +55,50 @@ def check_session():
         return False
     return True
 
-def get_rag_response(query_engine, user_query, chat_history):
+def stream_rag_response(retriever, user_query, chat_history, memory: ConversationMemory):
     """
-    Generate a response using RAG query engine and chat history
+    Generate a response from the retrieved chunks and chat history, in a single LLM call
+    (the chunks are passed as-is, labelled with their document type, page and section)
+    chat_history holds the previous messages (without user_query); the memory keeps
+    the recent ones verbatim and summarizes the older ones
+    Yields the pieces of the answer as they are generated; errors are raised to the caller
     """
-    try:
-        # Get RAG context from the query engine
-        response = query_engine.query(user_query)
-        rag_context = response.response
-        
-        # Initialize OpenAI client
-        client = OpenAI(api_key=OPENAI_KEY)
-        
-        # Build message history
-        messages = [
-            {"role": "system", "content": f"""
-            Tu es un assistant spécialisé dans les appels d'offres marocains.
-            Ton objectif est de répondre aux questions concernant les documents d'appels d'offres qui ont été traités.
-            
-            Règles:
-            1. Réponds uniquement en te basant sur les documents fournis et ton contexte
-            2. Si l'information n'est pas disponible dans le contexte, dis-le clairement
-            3. Sois précis et factuel, cite les sections spécifiques si possible
-            4. Exprime-toi de manière professionnelle et concise
-            
-            CONTEXTE EXTRAIT DES DOCUMENTS:
-            {rag_context}
-            """}
-        ]
-        
-        # Add chat history
-        for msg in chat_history:
-            messages.append({"role": "user" if msg["is_user"] else "assistant", "content": msg["content"]})
-        
-        # Add current query
-        messages.append({"role": "user", "content": user_query})
-        
-        # Get completion from OpenAI
-        chat_response = client.chat.completions.create(
-            model=DEFAULT_MODEL,
-            messages=messages,
-            temperature=0.3
-        )
+    # Raw retrieved chunks, best first, within the token budget of the model
+    rag_context = pack_context(retriever.retrieve(user_query), get_context_budget(DEFAULT_MODEL), model=DEFAULT_MODEL)
+    
+    # Initialize OpenAI client
+    client = get_chat_client(OPENAI_KEY)
+    
+    # Build message history
+    messages = [
+        {"role": "system", "content": f"""
+        Tu es un assistant spécialisé dans les appels d'offres marocains.
+        Ton objectif est de répondre aux questions concernant les documents d'appels d'offres qui ont été traités.
         
-        return chat_response.choices[0].message.content
+        Règles:
+        1. Réponds uniquement en te basant sur les documents fournis et ton contexte
+        2. Si l'information n'est pas disponible dans le contexte, dis-le clairement
+        3. Sois précis et factuel, cite tes sources (document, page, article) telles qu'indiquées entre crochets
+        4. Exprime-toi de manière professionnelle et concise
         
-    except Exception as e:
-        return f"Erreur lors de la génération de la réponse: {str(e)}"
+        CONTEXTE EXTRAIT DES DOCUMENTS:
+        {rag_context}
+        """}
+    ]
+    
+    # Add chat history (recent turns and summary of the older ones)
+    messages.extend(memory.build_messages(chat_history, client, DEFAULT_MODEL))
+    
+    # Add current query
+    messages.append({"role": "user", "content": user_query})
+    
+    # Stream the completion from OpenAI (through the response cache)
+    yield from stream_chat_completion(
+        client,
+        model=DEFAULT_MODEL,
+        messages=messages,
+        temperature=0.3
+    )
 
 def main():
     st.title("Chat avec les Documents d'Appel d'Offres")
@@ -109,6 +110,8 @@ def main():
     # Initialize chat history if it doesn't exist
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
+    if "chat_memory" not in st.session_state:
+        st.session_state.chat_memory = ConversationMemory()
     
     # Check if we have processed documents
     if not check_session():
@@ -124,9 +127,9 @@ def main():
         else:
             st.write("Aucune information disponible sur les documents.")
     
-    # Initialize query engine
-    query_engine = initialize_query_engine()
-    if not query_engine:
+    # Initialize retriever
+    retriever = initialize_retriever()
+    if not retriever:
         return
     
     # Display chat messages
@@ -136,27 +139,70 @@ def main():
     
     # Chat input
     if user_query := st.chat_input("Posez une question sur les documents..."):
-        # Add user message to chat history
-        st.session_state.chat_history.append({"content": user_query, "is_user": True})
-        
-        # Display user message
+        # Display user message (stored with the answer once it is complete: a new message
+        # reruns the script in the middle of the stream, which must not leave an unanswered turn)
         with st.chat_message("user"):
             st.markdown(user_query)
         
-        # Generate response
-        with st.spinner("Génération de la réponse..."):
-            response = get_rag_response(query_engine, user_query, st.session_state.chat_history)
-        
-        # Add assistant response to chat history
-        st.session_state.chat_history.append({"content": response, "is_user": False})
+        # Same question (or a close paraphrase) already answered on this tender: reuse the answer.
+        # Not for follow-ups ("et pour le lot 2 ?"), whose answer depends on the conversation
+        index_path = st.session_state.get('index_path')
+        answer_cache = get_answer_cache()
+        standalone = is_standalone_question(user_query)
+        question_embedding = None
+        cached = None
+        if standalone:
+            question_embedding = get_embed_model().get_query_embedding(user_query)
+            cached = answer_cache.get(index_path, question_embedding)
+        else:
+            answer_cache.skip()
         
-        # Display assistant response
+        # Display the assistant response as it is generated
         with st.chat_message("assistant"):
-            st.markdown(response)
+            if cached is not None:
+                response = cached["answer"]
+                st.markdown(response)
+                st.caption(f"Réponse reprise d'une question similaire: « {cached['question']} »")
+            else:
+                placeholder = st.empty()
+                placeholder.markdown("_Recherche dans les documents..._")
+                response = ""
+                failed = False
+                pieces = stream_rag_response(
+                    retriever, user_query, st.session_state.chat_history, st.session_state.chat_memory
+                )
+                try:
+                    for piece in pieces:
+                        response += piece
+                        placeholder.markdown(response + STREAM_CURSOR)
+                except Exception as e:
+                    failed = True
+                    response += f"\n\n{ERROR_PREFIX}: {str(e)}" if response else f"{ERROR_PREFIX}: {str(e)}"
+                finally:
+                    # A new message reruns the script in the middle of the stream: stop the generation
+                    pieces.close()
+                placeholder.markdown(response)
+                
+                if standalone and response and not failed:
+                    answer_cache.put(index_path, user_query, question_embedding, response)
+        
+        # Add the question and its response to chat history once complete
+        st.session_state.chat_history.append({"content": user_query, "is_user": True})
+        st.session_state.chat_history.append({"content": response, "is_user": False})
+    
+    # Answer cache metrics of this server process
+    stats = get_answer_cache().stats()
+    if stats["hits"] + stats["misses"] + stats["skipped"]:
+        st.sidebar.caption(
+            f"Cache de réponses: {stats['hit_rate']:.0%} de réponses réutilisées "
+            f"({stats['hits']}/{stats['hits'] + stats['misses']}), {stats['skipped']} questions de suivi "
+            f"non cherchées, {stats['entries']} réponses en cache"
+        )
     
     # Option to clear chat history
     if st.button("Effacer l'historique de chat"):
         st.session_state.chat_history = []
+        st.session_state.chat_memory.clear()
         st.rerun()
 
 if __name__ == "__main__":
@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, date
+from datetime import date
 import json
 
+from utils.normalization import parse_amount, parse_date
+
 # Import gestion utilities
 from utils.gestion import (
     check_extraction_data,
@@ -165,32 +167,7 @@ with col1:
     if has_extraction and data_source == "Données extraites":
         # Helper function to safely parse monetary amounts from text
         def safe_parse_amount(amount_text):
-            if not amount_text or amount_text == "Non spécifié":
-                return 0.0
-            try:
-                # If already a number, return it
-                if isinstance(amount_text, (int, float)):
-                    return float(amount_text)
-                
-                # Remove common text and keep only numbers
-                import re
-                # Extract all numbers from the text
-                numbers = re.findall(r'[\d\s,\.]+', str(amount_text))
-                if numbers:
-                    # Take the largest number found (usually the actual amount)
-                    largest_num = ""
-                    for num_str in numbers:
-                        # Clean the number string
-                        cleaned = num_str.replace(" ", "").replace(",", "")
-                        if cleaned and len(cleaned) > len(largest_num):
-                            largest_num = cleaned
-                    
-                    if largest_num:
-                        return float(largest_num)
-                
-                return 0.0
-            except:
-                return 0.0
+            return parse_amount(amount_text) or 0.0
         
         # Show extracted data as read-only with safe parsing
         ref_ao = st.text_input("Référence AO", value=extraction_data.get("Référence", ""))
@@ -215,12 +192,7 @@ with col1:
         )
         
         # Parse date if available
-        date_pub = None
-        if extraction_data.get("Date"):
-            try:
-                date_pub = datetime.strptime(extraction_data["Date"], "%d/%m/%Y").date()
-            except:
-                pass
+        date_pub = parse_date(extraction_data.get("Date"))
         date_publication = st.date_input("Date de publication", value=date_pub)
         
     else:
@@ -0,0 +1,81 @@
+"""
+Property tests of utils/normalization.
+
+Random amounts and dates are written in the formats found in tenders and forms
+(see benchmarks/normalization_benchmark.py) and must parse back to their value;
+the column functions must agree with the scalar ones.
+"""
+
+import random
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.normalization_benchmark import random_amount, random_date
+from utils.normalization import parse_amount, parse_amount_series, parse_date, parse_date_series
+
+# Constants
+SAMPLES = 2000
+SEEDS = (0, 1, 2)
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_random_amounts_round_trip(seed):
+    rng = random.Random(seed)
+    for _ in range(SAMPLES):
+        text, value = random_amount(rng)
+        parsed = parse_amount(text)
+        assert parsed is not None and abs(parsed - value) < 0.005, f"{text!r}: {parsed} != {value}"
+
+@pytest.mark.parametrize("text, value", [
+    ("1 234 567,89 DH", 1234567.89),
+    ("1.250.000,00 dirhams", 1250000.0),
+    ("1,250,000.00 MAD", 1250000.0),
+    ("2,5 millions de dirhams", 2.5e6),
+    ("1,5 MDH", 1.5e6),
+    ("300 mille DH", 300e3),
+    ("1,2 milliard de dirhams", 1.2e9),
+    ("Caution: 5 000 DH, estimation: 1 200 000 DH", 1.2e6),
+])
+def test_french_and_english_amounts(text, value):
+    assert parse_amount(text) == pytest.approx(value)
+
+@pytest.mark.parametrize("value", [None, "", "Non spécifié", True, float("nan")])
+def test_missing_amounts(value):
+    assert parse_amount(value) is None
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_random_dates_round_trip(seed):
+    rng = random.Random(seed)
+    for _ in range(SAMPLES):
+        text, value = random_date(rng)
+        assert parse_date(text) == value, f"{text!r}: {parse_date(text)} != {value}"
+
+@pytest.mark.parametrize("text, value", [
+    ("13/06/2024", date(2024, 6, 13)),
+    ("13-06-24", date(2024, 6, 13)),
+    ("2024-06-13", date(2024, 6, 13)),
+    ("1er juin 2024", date(2024, 6, 1)),
+    ("le 15 Août 2023 à 10h", date(2023, 8, 15)),
+])
+def test_date_formats(text, value):
+    assert parse_date(text) == value
+
+@pytest.mark.parametrize("value", [None, "31/02/2024", "Non spécifié", ""])
+def test_invalid_dates(value):
+    assert parse_date(value) is None
+
+def test_amount_series_matches_scalar():
+    rng = random.Random(0)
+    column = [random_amount(rng)[0] for _ in range(SAMPLES)] + [1234.5, 42, None, "Non spécifié", ""]
+    scalar = np.array([np.nan if v is None else v for v in map(parse_amount, column)], dtype=float)
+    vectorized = parse_amount_series(pd.Series(column, dtype=object)).to_numpy()
+    assert np.allclose(scalar, vectorized, equal_nan=True)
+
+def test_date_series_matches_scalar():
+    rng = random.Random(0)
+    column = [random_date(rng)[0] for _ in range(SAMPLES)] + [date(2024, 1, 2), None, "31/02/2024", "Non spécifié"]
+    scalar = pd.to_datetime(pd.Series([parse_date(v) for v in column], dtype=object))
+    vectorized = parse_date_series(pd.Series(column, dtype=object))
+    assert scalar.equals(vectorized)
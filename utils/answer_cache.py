@@ -0,0 +1,253 @@
+"""
+Semantic cache of chatbot answers, per tender index.
+
+Analysts working on the same tender ask the same questions in different words
+("quelle est la caution ?", "montant de la caution provisoire ?"). Answers are
+stored in SQLite with the embedding of their question and the version of the
+tender index they were computed from; a new question whose embedding is close
+enough to a stored one gets the stored answer without retrieval or LLM calls.
+Answers computed from a previous version of an index (the tender was rebuilt)
+are discarded, and the answers of a tender are dropped as soon as its index is
+rebuilt or its cache entry deleted. Only standalone questions are looked up and
+stored, at any point of a conversation: a follow-up ("et pour le lot 2 ?", "elle
+est remboursable ?") depends on the previous turns, and is recognized by cheap
+markers (leading conjunction, anaphoric pronoun, ellipsis).
+"""
+
+import os
+import re
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.index_registry import index_version
+
+# Constants
+ANSWER_CACHE_PATH = "data/answer_cache.db"
+SIMILARITY_THRESHOLD = 0.92  # Cosine similarity above which two questions get the same answer
+MAX_ANSWERS_PER_INDEX = 500
+# Markers of a question that only makes sense after the previous turns
+FOLLOW_UP_RE = re.compile(
+    r"^\s*(?:et|mais|ou|alors|donc|puis|sinon)\b"
+    r"|(?<!-)\bil\b"  # Not the impersonal "y a-t-il", "faut-il"
+    r"|\b(?:ils|elle|elles|celui|celle|ceux|celles|cela|ceci|ça|lui|leurs?|ce\s+dernier|cette\s+derni[eè]re"
+    r"|le\s+m[eê]me|la\s+m[eê]me|lequel|laquelle|pr[ée]c[ée]dente?|idem|aussi)\b"
+    r"|(?:\.\.\.|…)",
+    re.IGNORECASE
+)
+
+def is_standalone_question(question: str) -> bool:
+    """
+    Whether a question can be answered without the conversation (and its answer shared).
+
+    Args:
+        question (str): Question
+
+    Returns:
+        bool: False for follow-ups (leading conjunction, anaphoric pronoun, ellipsis)
+    """
+    return not FOLLOW_UP_RE.search(question)
+
+def _normalize(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class SemanticAnswerCache:
+    """
+    SQLite-backed semantic cache of answers, with the question embeddings of each
+    index kept in memory as a matrix. Safe to share between threads.
+    """
+
+    def __init__(self, db_path: str = ANSWER_CACHE_PATH, threshold: float = SIMILARITY_THRESHOLD,
+                 max_answers_per_index: int = MAX_ANSWERS_PER_INDEX):
+        """
+        Initialize the answer cache.
+
+        Args:
+            db_path (str): Path to SQLite database
+            threshold (float): Minimum cosine similarity between questions for a hit
+            max_answers_per_index (int): Answers kept per index (least recently used are dropped)
+        """
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        self.threshold = threshold
+        self.max_answers_per_index = max_answers_per_index
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0  # Follow-up questions, not looked up
+        self._lock = threading.Lock()
+        # (index path, index version) -> (row ids, normalized question embeddings)
+        self._matrices: Dict[Tuple[str, float], Tuple[List[int], np.ndarray]] = {}
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the answers table if it doesn't exist."""
+        with self._lock:
+            self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                index_path TEXT,
+                index_version REAL,
+                question TEXT,
+                embedding BLOB,
+                answer TEXT,
+                hits INTEGER,
+                created_at REAL,
+                last_access REAL
+            )
+            ''')
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_index ON answers(index_path, index_version)")
+            self.conn.commit()
+
+    def _matrix(self, key: Tuple[str, float]) -> Tuple[List[int], np.ndarray]:
+        """Question embeddings of an index version; answers of older versions are deleted. Lock held."""
+        if key not in self._matrices:
+            path, version = key
+            cursor = self.conn.execute(
+                "DELETE FROM answers WHERE index_path = ? AND index_version != ?", (path, version)
+            )
+            if cursor.rowcount:
+                self.conn.commit()
+            for stale in [k for k in self._matrices if k[0] == path]:
+                del self._matrices[stale]
+
+            rows = self.conn.execute(
+                "SELECT id, embedding FROM answers WHERE index_path = ? AND index_version = ? ORDER BY id",
+                (path, version)
+            ).fetchall()
+            ids = [row[0] for row in rows]
+            matrix = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows]) if rows else None
+            self._matrices[key] = (ids, matrix)
+        return self._matrices[key]
+
+    def get(self, index_dir: str, question_embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """
+        Look up the answer of a similar question asked on the same index version.
+
+        Args:
+            index_dir (str): Index directory of the tender
+            question_embedding (List[float]): Embedding of the question
+
+        Returns:
+            Optional[Dict[str, Any]]: answer, question it was computed for and similarity; None on miss
+        """
+        key = index_version(index_dir)
+        query = _normalize(question_embedding)
+        with self._lock:
+            ids, matrix = self._matrix(key)
+            if matrix is None or matrix.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            row = self.conn.execute("SELECT question, answer FROM answers WHERE id = ?", (ids[best],)).fetchone()
+            if row is None:
+                # Deleted by another process
+                del self._matrices[key]
+                self.misses += 1
+                return None
+            self.conn.execute(
+                "UPDATE answers SET hits = hits + 1, last_access = ? WHERE id = ?", (time.time(), ids[best])
+            )
+            self.conn.commit()
+            self.hits += 1
+            return {"answer": row[1], "question": row[0], "similarity": float(similarities[best])}
+
+    def put(self, index_dir: str, question: str, question_embedding: List[float], answer: str) -> None:
+        """
+        Store the answer to a question.
+
+        Args:
+            index_dir (str): Index directory of the tender
+            question (str): Question
+            question_embedding (List[float]): Embedding of the question
+            answer (str): Complete answer
+        """
+        key = index_version(index_dir)
+        vector = _normalize(question_embedding)
+        now = time.time()
+        with self._lock:
+            ids, matrix = self._matrix(key)
+            cursor = self.conn.execute(
+                "INSERT INTO answers (index_path, index_version, question, embedding, answer, hits, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+                (key[0], key[1], question, vector.tobytes(), answer, now, now)
+            )
+            count = self.conn.execute(
+                "SELECT COUNT(*) FROM answers WHERE index_path = ? AND index_version = ?", key
+            ).fetchone()[0]
+            if count > self.max_answers_per_index:
+                self.conn.execute(
+                    "DELETE FROM answers WHERE id IN (SELECT id FROM answers WHERE index_path = ? AND index_version = ? "
+                    "ORDER BY last_access LIMIT ?)",
+                    (key[0], key[1], count - self.max_answers_per_index)
+                )
+                # Reload the matrix on next use
+                self._matrices.pop(key, None)
+            elif matrix is None or matrix.shape[1] == vector.shape[0]:
+                self._matrices[key] = (ids + [cursor.lastrowid],
+                                       vector[None, :] if matrix is None else np.vstack([matrix, vector]))
+            self.conn.commit()
+
+    def invalidate(self, index_dir: str) -> None:
+        """
+        Drop every answer of a tender index (after rebuilding or deleting it).
+
+        Args:
+            index_dir (str): Index directory of the tender, or a directory containing it
+        """
+        path = os.path.abspath(index_dir)
+        prefix = path + os.sep
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM answers WHERE index_path = ? OR substr(index_path, 1, ?) = ?", (path, len(prefix), prefix)
+            )
+            self.conn.commit()
+            for key in [k for k in self._matrices if k[0] == path or k[0].startswith(prefix)]:
+                del self._matrices[key]
+
+    def skip(self) -> None:
+        """Count a question not looked up (follow-up depending on the conversation)."""
+        with self._lock:
+            self.skipped += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters of this process.
+
+        Returns:
+            Dict[str, Any]: hits, misses, skipped, hit_rate (of the lookups) and number of stored answers
+        """
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Process-wide answer cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticAnswerCache()
+        return _cache
@@ -0,0 +1,501 @@
+"""
+Pluggable LLM / embedding / parsing backends.
+
+The backend is selected with the TENDERAI_BACKEND environment variable:
+- "openai" (default): OpenAI chat completions and embeddings, LlamaParse
+- "offline": deterministic local stand-ins (replayed or rule-based chat answers,
+  hashing embedder, PyMuPDF-based parser), so the whole pipeline can be run,
+  benchmarked and load-tested without API keys or network access
+
+Offline calls can be slowed down to mimic the real services with
+TENDERAI_OFFLINE_LATENCY_MS (or the per-service TENDERAI_OFFLINE_CHAT_LATENCY_MS,
+TENDERAI_OFFLINE_EMBED_LATENCY_MS and TENDERAI_OFFLINE_PARSE_LATENCY_MS), and the
+generation time per answer token with TENDERAI_OFFLINE_TOKEN_LATENCY_MS.
+
+The openai backend appends its chat answers, embeddings and LlamaParse outputs to
+TENDERAI_RECORD_FILE (JSONL) when it is set; the offline backend replays them from
+TENDERAI_REPLAY_FILE. Recorded parses and embeddings reproduce the same chunks and
+prompts, so recorded answers are found again. Requests missing from the recording
+fall back to the offline stand-ins and are counted (replay_stats).
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import hashlib
+import threading
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from llama_index.core import Document, Settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.llms import MockLLM
+
+# Constants
+BACKEND_ENV_VAR = "TENDERAI_BACKEND"
+OFFLINE_EMBED_DIM = 256
+OFFLINE_CHAT_MODEL = "offline-chat"
+REPLAY_KINDS = ("chat", "embedding", "parse")
+
+def get_backend() -> str:
+    """Name of the selected backend ("openai" or "offline")"""
+    return os.environ.get(BACKEND_ENV_VAR, "openai").strip().lower()
+
+def is_offline() -> bool:
+    """Whether the offline stand-in backend is selected"""
+    return get_backend() == "offline"
+
+def get_embed_model_name(model_name: str) -> str:
+    """
+    Name of the embedding model the selected backend uses in place of an OpenAI model.
+
+    Args:
+        model_name (str): OpenAI embedding model (openai backend)
+
+    Returns:
+        str: Embedding model name
+    """
+    if not is_offline():
+        return model_name
+    if _replay_dimension(model_name):
+        return f"offline-replay-{model_name}"
+    return f"offline-hashing-{OFFLINE_EMBED_DIM}"
+
+def cache_namespace(embed_model_name: str) -> str:
+    """
+    Namespace of cached artefacts: answers, parses and embeddings of different
+    backends (or embedding models) must never be served in place of each other.
+
+    Args:
+        embed_model_name (str): OpenAI embedding model (openai backend)
+
+    Returns:
+        str: Backend and embedding model in use
+    """
+    return f"{get_backend()}:{get_embed_model_name(embed_model_name)}"
+
+def _latency(kind: str) -> float:
+    """Injected latency in seconds for an offline service"""
+    value = os.environ.get(f"TENDERAI_OFFLINE_{kind}_LATENCY_MS", os.environ.get("TENDERAI_OFFLINE_LATENCY_MS", "0"))
+    try:
+        return max(0.0, float(value) / 1000)
+    except ValueError:
+        return 0.0
+
+def _token_latency() -> float:
+    """Injected generation time per answer token in seconds (offline chat)"""
+    try:
+        return max(0.0, float(os.environ.get("TENDERAI_OFFLINE_TOKEN_LATENCY_MS", "0")) / 1000)
+    except ValueError:
+        return 0.0
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)"""
+    return max(1, len(text) // 4)
+
+def request_key(model: str, messages: List[Dict[str, str]]) -> str:
+    """Key of a chat request in a replay file"""
+    payload = json.dumps({"model": model, "messages": messages}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def embedding_key(model: str, text: str) -> str:
+    """Key of an embedded text in a replay file"""
+    payload = json.dumps({"model": model, "text": text}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def parse_key(path: str) -> str:
+    """Key of a parsed PDF in a replay file: hash of its content"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+# ---------------------------------------------------------------------------
+# Record / replay
+# ---------------------------------------------------------------------------
+
+_record_lock = threading.Lock()
+_replay_counts = {kind: {"hits": 0, "misses": 0} for kind in REPLAY_KINDS}
+_replay_counts_lock = threading.Lock()
+
+@lru_cache(maxsize=4)
+def _load_replay_file(path: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Load a recording: kind -> key -> recorded value.
+    One JSON object per line: kind ("chat" when absent), key and content
+    (answer, parse markdown, or embedding with its model).
+    """
+    records = {kind: {} for kind in REPLAY_KINDS}
+    if not path or not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                records[record.get("kind", "chat")][record["key"]] = record
+            except (ValueError, KeyError):
+                continue
+    return records
+
+def _replay_records(kind: str) -> Dict[str, Any]:
+    """Recorded values of one kind from TENDERAI_REPLAY_FILE"""
+    return _load_replay_file(os.environ.get("TENDERAI_REPLAY_FILE"))[kind]
+
+def _count_replay(kind: str, hit: bool) -> None:
+    """Count a replay lookup (only when a replay file is set)"""
+    if os.environ.get("TENDERAI_REPLAY_FILE"):
+        with _replay_counts_lock:
+            _replay_counts[kind]["hits" if hit else "misses"] += 1
+
+def replay_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Replay hits and misses of this process, per kind of request.
+
+    Returns:
+        Dict[str, Dict[str, int]]: kind ("chat", "embedding", "parse") -> hits, misses
+    """
+    with _replay_counts_lock:
+        return {kind: dict(counts) for kind, counts in _replay_counts.items()}
+
+def _record(record: Dict[str, Any]) -> None:
+    """Append a record to TENDERAI_RECORD_FILE"""
+    with _record_lock, open(os.environ["TENDERAI_RECORD_FILE"], "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def _replay_dimension(model_name: str) -> Optional[int]:
+    """Dimension of the embeddings recorded for a model, None if there are none"""
+    for record in _replay_records("embedding").values():
+        if record.get("model") == model_name:
+            return len(record["content"])
+    return None
+
+# ---------------------------------------------------------------------------
+# Chat completions
+# ---------------------------------------------------------------------------
+
+def _words(text: str) -> set:
+    return set(re.findall(r"\w{3,}", text.lower()))
+
+def _best_sentence(question: str, context: str) -> str:
+    """Sentence of the context sharing the most words with the question"""
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?:])\s+|\n+", context) if len(s.strip()) > 3]
+    if not sentences:
+        return "Non spécifié"
+    question_words = _words(question)
+    best = max(sentences, key=lambda s: len(question_words & _words(s)))
+    return best if question_words & _words(best) else "Non spécifié"
+
+def _rule_based_answer(messages: List[Dict[str, str]], json_mode: bool) -> str:
+    """Deterministic answer built from the context found in the messages"""
+    user_content = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    context = "\n".join(m["content"] for m in messages)
+    if "Contexte:" in user_content:
+        context = user_content.split("Contexte:", 1)[1].split("Instructions:", 1)[0]
+
+    if json_mode:
+        # Structured extraction: one answer per listed field
+        fields = re.findall(r'^- "([^"]+)": (.*)$', user_content, flags=re.MULTILINE)
+        return json.dumps({field: _best_sentence(instructions, context) for field, instructions in fields},
+                          ensure_ascii=False)
+
+    question = user_content
+    if "Instructions:" in user_content:
+        question = user_content.split("Instructions:", 1)[1]
+    return _best_sentence(question, context)
+
+def _completion(content: str, model: str, prompt_tokens: int):
+    """Object shaped like an OpenAI chat completion"""
+    completion_tokens = _estimate_tokens(content)
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(index=0, finish_reason="stop",
+                                 message=SimpleNamespace(role="assistant", content=content))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                              total_tokens=prompt_tokens + completion_tokens)
+    )
+
+def _stream_chunks(content: str, model: str):
+    """Chunks shaped like an OpenAI streamed chat completion"""
+    token_latency = _token_latency()
+    for token in re.findall(r"\S+\s*", content):
+        time.sleep(token_latency)
+        yield SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=token))])
+
+class _OfflineCompletions:
+    def __init__(self, replies: Dict[str, Any]):
+        self._replies = replies
+
+    def create(self, model: str = OFFLINE_CHAT_MODEL, messages: Optional[List[Dict[str, str]]] = None,
+               stream: bool = False, response_format: Optional[Dict[str, str]] = None, **kwargs: Any):
+        messages = messages or []
+        time.sleep(_latency("CHAT"))
+
+        record = self._replies.get(request_key(model, messages))
+        _count_replay("chat", record is not None)
+        content = record["content"] if record is not None else None
+        if content is None:
+            json_mode = bool(response_format and response_format.get("type") == "json_object")
+            content = _rule_based_answer(messages, json_mode)
+
+        if stream:
+            return _stream_chunks(content, model)
+        time.sleep(_token_latency() * len(re.findall(r"\S+\s*", content)))
+        prompt_tokens = sum(_estimate_tokens(m.get("content", "")) for m in messages)
+        return _completion(content, model, prompt_tokens)
+
+class OfflineChatClient:
+    """Stand-in for the OpenAI client (client.chat.completions.create)"""
+
+    def __init__(self, replay_file: Optional[str] = None):
+        self.chat = SimpleNamespace(completions=_OfflineCompletions(
+            _load_replay_file(replay_file or os.environ.get("TENDERAI_REPLAY_FILE"))["chat"]
+        ))
+
+class _RecordingCompletions:
+    """Proxy of chat.completions that appends every answer to a replay file"""
+
+    def __init__(self, completions):
+        self._completions = completions
+
+    def create(self, model: str, messages: List[Dict[str, str]], **kwargs: Any):
+        response = self._completions.create(model=model, messages=messages, **kwargs)
+        if kwargs.get("stream"):
+            return response
+        _record({"kind": "chat", "key": request_key(model, messages), "content": response.choices[0].message.content})
+        return response
+
+def get_chat_client(api_key: Optional[str] = None):
+    """
+    Get the chat-completion client of the selected backend.
+
+    Args:
+        api_key (Optional[str]): OpenAI API key (openai backend)
+
+    Returns:
+        Client exposing chat.completions.create
+    """
+    if is_offline():
+        return OfflineChatClient()
+
+    from openai import OpenAI
+    client = OpenAI(api_key=api_key) if api_key else OpenAI()
+    if os.environ.get("TENDERAI_RECORD_FILE"):
+        client.chat = SimpleNamespace(completions=_RecordingCompletions(client.chat.completions))
+    return client
+
+# ---------------------------------------------------------------------------
+# Embeddings
+# ---------------------------------------------------------------------------
+
+class HashingEmbedding(BaseEmbedding):
+    """
+    Deterministic local embedder: hashed word unigrams and bigrams, L2-normalized.
+    """
+
+    embed_dim: int = OFFLINE_EMBED_DIM
+
+    def __init__(self, embed_dim: int = OFFLINE_EMBED_DIM, **kwargs: Any):
+        super().__init__(model_name=f"offline-hashing-{embed_dim}", embed_dim=embed_dim, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashingEmbedding"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.embed_dim, dtype=np.float32)
+        words = re.findall(r"\w+", text.lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.embed_dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        time.sleep(_latency("EMBED"))
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        # One injected latency per batch, like one embedding request
+        time.sleep(_latency("EMBED"))
+        return [self._embed(text) for text in texts]
+
+class ReplayEmbedding(BaseEmbedding):
+    """
+    Offline embedder returning the embeddings recorded for a model; texts that
+    were not recorded get a hashing embedding of the same dimension.
+    """
+
+    embed_dim: int = OFFLINE_EMBED_DIM
+    _recorded_model: str = PrivateAttr()
+    _fallback: HashingEmbedding = PrivateAttr()
+
+    def __init__(self, recorded_model: str, embed_dim: int, **kwargs: Any):
+        super().__init__(model_name=f"offline-replay-{recorded_model}", embed_dim=embed_dim, **kwargs)
+        self._recorded_model = recorded_model
+        self._fallback = HashingEmbedding(embed_dim=embed_dim)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ReplayEmbedding"
+
+    def _lookup(self, text: str) -> List[float]:
+        record = _replay_records("embedding").get(embedding_key(self._recorded_model, text))
+        _count_replay("embedding", record is not None)
+        return record["content"] if record is not None else self._fallback._embed(text)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        time.sleep(_latency("EMBED"))
+        return self._lookup(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(_latency("EMBED"))
+        return [self._lookup(text) for text in texts]
+
+class _RecordingEmbedding(BaseEmbedding):
+    """Proxy of an embedding model that appends every embedding to the record file"""
+
+    _inner: BaseEmbedding = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, **kwargs: Any):
+        super().__init__(model_name=inner.model_name, embed_batch_size=inner.embed_batch_size, **kwargs)
+        self._inner = inner
+
+    @property
+    def dimensions(self) -> Optional[int]:
+        return getattr(self._inner, "dimensions", None)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RecordingEmbedding"
+
+    def _record(self, texts: List[str], embeddings: List[List[float]]) -> List[List[float]]:
+        for text, embedding in zip(texts, embeddings):
+            _record({"kind": "embedding", "key": embedding_key(self.model_name, text),
+                     "model": self.model_name, "content": embedding})
+        return embeddings
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._record([query], [self._inner.get_query_embedding(query)])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._record(texts, self._inner.get_text_embedding_batch(texts))
+
+def get_base_embed_model(model_name: str) -> BaseEmbedding:
+    """
+    Get the (uncached) embedding model of the selected backend.
+
+    Args:
+        model_name (str): OpenAI embedding model (openai backend)
+
+    Returns:
+        BaseEmbedding: Embedding model
+    """
+    if is_offline():
+        dimension = _replay_dimension(model_name)
+        return ReplayEmbedding(model_name, dimension) if dimension else HashingEmbedding()
+
+    from llama_index.embeddings.openai import OpenAIEmbedding
+    embed_model = OpenAIEmbedding(model=model_name)
+    if os.environ.get("TENDERAI_RECORD_FILE"):
+        return _RecordingEmbedding(embed_model)
+    return embed_model
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+class OfflineParser:
+    """Stand-in for LlamaParse: recorded markdown, or PyMuPDF text with one markdown section per page"""
+
+    def load_data(self, file_paths) -> List[Document]:
+        import fitz  # PyMuPDF
+
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+
+        documents = []
+        for path in file_paths:
+            time.sleep(_latency("PARSE"))
+            record = _replay_records("parse").get(parse_key(path)) if os.environ.get("TENDERAI_REPLAY_FILE") else None
+            _count_replay("parse", record is not None)
+            if record is not None:
+                documents.append(Document(text=record["content"], metadata={"file_path": path}))
+                continue
+            with fitz.open(path) as doc:
+                pages = [f"## Page {i + 1}\n\n{page.get_text('text', sort=True).strip()}"
+                         for i, page in enumerate(doc)]
+            documents.append(Document(text="\n\n".join(pages), metadata={"file_path": path}))
+        return documents
+
+class _RecordingParser:
+    """Proxy of LlamaParse that appends the markdown of every parsed PDF to the record file"""
+
+    def __init__(self, parser):
+        self._parser = parser
+
+    def load_data(self, file_paths) -> List[Document]:
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+        documents = self._parser.load_data(file_paths)
+        # Documents can only be attributed to their PDF when there is one per file
+        if len(documents) == len(file_paths):
+            for path, document in zip(file_paths, documents):
+                _record({"kind": "parse", "key": parse_key(path), "content": document.text})
+        return documents
+
+def get_parser(api_key: Optional[str] = None):
+    """
+    Get the markdown parser of the selected backend.
+
+    Args:
+        api_key (Optional[str]): LlamaParse API key (openai backend)
+
+    Returns:
+        Parser exposing load_data(list of paths)
+    """
+    if is_offline():
+        return OfflineParser()
+
+    from llama_parse import LlamaParse
+    parser = LlamaParse(api_key=api_key, result_type="markdown")
+    if os.environ.get("TENDERAI_RECORD_FILE"):
+        return _RecordingParser(parser)
+    return parser
+
+def get_llama_index_llm(model: str):
+    """
+    Get the llama-index LLM of the selected backend (query-engine synthesis).
+
+    Args:
+        model (str): OpenAI model (openai backend)
+    """
+    if is_offline():
+        return MockLLM(max_tokens=256)
+
+    from llama_index.llms.openai import OpenAI as LlamaIndexOpenAI
+    return LlamaIndexOpenAI(model=model)
+
+# Query engines fall back on the global LLM: never reach OpenAI when offline
+if is_offline():
+    Settings.llm = MockLLM(max_tokens=256)
@@ -0,0 +1,203 @@
+"""
+Local BM25 keyword index and reciprocal-rank fusion.
+
+Tender questions often hinge on exact tokens (article numbers, "caution
+provisoire", reference codes such as 12/2024) that dense retrieval handles
+poorly. The BM25 index is an inverted index stored as flat NumPy arrays: the
+postings of each term are contiguous, with their BM25 weight precomputed at
+build time, so scoring a query is a few vectorized additions. It is built and
+persisted next to the vector index, and both rankings are merged with
+reciprocal-rank fusion.
+"""
+
+import os
+import re
+import json
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Constants
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60  # Reciprocal-rank fusion constant (score = sum of 1 / (RRF_K + rank))
+ARRAYS_FILE = "bm25.npz"
+VOCABULARY_FILE = "bm25_vocabulary.json"  # Written last: its presence means the index is complete
+
+# Keeps codes such as 12/2024, 05-CR-2024 or 3.2.1 as single tokens
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[/.-][a-z0-9]+)*")
+STOPWORDS = frozenset("""
+a au aux avec ce ces dans de des du elle en et il ils je la le les leur lui ma mais me meme mes moi mon ne
+nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos votre vous
+c d j l m n s t y est sont ete etre avoir a ont cette cet quel quelle quels quelles
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into BM25 terms (lowercase, accents removed, French stopwords dropped).
+
+    Args:
+        text (str): Text
+
+    Returns:
+        List[str]: Terms
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [token for token in TOKEN_RE.findall(text) if token not in STOPWORDS]
+
+def has_bm25_index(index_dir: str) -> bool:
+    """Check whether a complete BM25 index exists in a directory"""
+    return os.path.exists(os.path.join(index_dir, VOCABULARY_FILE)) and os.path.exists(os.path.join(index_dir, ARRAYS_FILE))
+
+class BM25Index:
+    """
+    Inverted index with precomputed BM25 weights.
+    Read-only once built; safe to share between threads.
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], indptr: np.ndarray, doc_ids: np.ndarray,
+                 weights: np.ndarray, doc_count: int):
+        """
+        Args:
+            vocabulary (Dict[str, int]): Term -> term id
+            indptr (np.ndarray): Postings of term i are doc_ids[indptr[i]:indptr[i + 1]]
+            doc_ids (np.ndarray): Document (row) of each posting
+            weights (np.ndarray): BM25 weight of each posting
+            doc_count (int): Number of documents
+        """
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.doc_count = doc_count
+
+    @classmethod
+    def build(cls, texts: Sequence[str], k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        """
+        Index documents.
+
+        Args:
+            texts (Sequence[str]): Document texts, one per row of the vector index
+            k1 (float): Term frequency saturation
+            b (float): Document length normalization
+
+        Returns:
+            BM25Index: Index
+        """
+        term_counts = [Counter(tokenize(text)) for text in texts]
+        doc_lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        average_length = float(doc_lengths.mean()) if len(texts) and doc_lengths.mean() > 0 else 1.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_id, counts in enumerate(term_counts):
+            for term, frequency in counts.items():
+                postings.setdefault(term, []).append((doc_id, frequency))
+
+        vocabulary = {term: term_id for term_id, term in enumerate(sorted(postings))}
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        doc_ids = np.empty(sum(len(p) for p in postings.values()), dtype=np.int32)
+        frequencies = np.empty(len(doc_ids), dtype=np.float32)
+        position = 0
+        for term, term_id in vocabulary.items():
+            term_postings = postings[term]
+            doc_ids[position:position + len(term_postings)] = [doc_id for doc_id, _ in term_postings]
+            frequencies[position:position + len(term_postings)] = [frequency for _, frequency in term_postings]
+            position += len(term_postings)
+            indptr[term_id + 1] = position
+
+        # Weight of each posting: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / average length))
+        document_frequency = np.diff(indptr).astype(np.float32)
+        idf = np.log1p((len(texts) - document_frequency + 0.5) / (document_frequency + 0.5))
+        posting_idf = np.repeat(idf, np.diff(indptr))
+        norm = k1 * (1 - b + b * doc_lengths[doc_ids] / average_length)
+        weights = (posting_idf * frequencies * (k1 + 1) / (frequencies + norm)).astype(np.float32)
+        return cls(vocabulary, indptr, doc_ids, weights, len(texts))
+
+    def persist(self, index_dir: str) -> None:
+        """
+        Write the index to a directory.
+
+        Args:
+            index_dir (str): Index directory
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        arrays_path = os.path.join(index_dir, ARRAYS_FILE)
+        vocabulary_path = os.path.join(index_dir, VOCABULARY_FILE)
+
+        # Write to temporary files first so a concurrent reader never sees a partial index
+        tmp_arrays = f"{arrays_path}.{os.getpid()}.tmp"
+        tmp_vocabulary = f"{vocabulary_path}.{os.getpid()}.tmp"
+        with open(tmp_arrays, "wb") as f:
+            np.savez(f, indptr=self.indptr, doc_ids=self.doc_ids, weights=self.weights)
+        with open(tmp_vocabulary, "w", encoding="utf-8") as f:
+            json.dump({"doc_count": self.doc_count, "terms": sorted(self.vocabulary, key=self.vocabulary.get)},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_arrays, arrays_path)
+        os.replace(tmp_vocabulary, vocabulary_path)
+
+    @classmethod
+    def load(cls, index_dir: str) -> "BM25Index":
+        """
+        Open a persisted index.
+
+        Args:
+            index_dir (str): Index directory
+
+        Returns:
+            BM25Index: Index
+        """
+        with open(os.path.join(index_dir, VOCABULARY_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        with np.load(os.path.join(index_dir, ARRAYS_FILE)) as arrays:
+            indptr, doc_ids, weights = arrays["indptr"], arrays["doc_ids"], arrays["weights"]
+        vocabulary = {term: term_id for term_id, term in enumerate(data["terms"])}
+        return cls(vocabulary, indptr, doc_ids, weights, data["doc_count"])
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """
+        Documents with the highest BM25 score for a query.
+
+        Args:
+            query (str): Query text
+            top_k (int): Number of results
+
+        Returns:
+            List[Tuple[int, float]]: (row, score) of the documents matching at least one term, best first
+        """
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        for term, count in Counter(tokenize(query)).items():
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            # A term has at most one posting per document
+            scores[self.doc_ids[start:end]] += count * self.weights[start:end]
+
+        matching = np.flatnonzero(scores)
+        if not len(matching) or top_k <= 0:
+            return []
+        top_k = min(top_k, len(matching))
+        top = matching[np.argpartition(-scores[matching], top_k - 1)[:top_k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(row), float(scores[row])) for row in top]
+
+def reciprocal_rank_fusion(rankings: List[List[Tuple[int, float]]], top_k: int, k: int = RRF_K) -> List[Tuple[int, float]]:
+    """
+    Merge rankings with reciprocal-rank fusion: each row scores sum(1 / (k + rank)).
+
+    Args:
+        rankings (List[List[Tuple[int, float]]]): (row, score) lists, best first
+        top_k (int): Number of results
+        k (int): Fusion constant (larger values flatten the rank differences)
+
+    Returns:
+        List[Tuple[int, float]]: (row, fused score), best first
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (row, _) in enumerate(ranking, start=1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: (-item[1], item[0]))[:top_k]
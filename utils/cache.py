@@ -0,0 +1,196 @@
+"""
+Content-addressed cache for parsed documents and vector indices.
+
+Each uploaded PDF is stored under the SHA-256 of its bytes, together with the
+markdown produced by PyMuPDF/LlamaParse. A tender (set of RC/CPS/Avis) is stored
+under a key derived from its document hashes and holds the combined markdown and
+the persisted index, so a repeat upload skips parsing and embedding entirely.
+Accesses and sizes of the entries are recorded in the session store manifest,
+which enforces the disk quota (utils/session_store.py). Parses and tenders are
+kept apart per backend and embedding model, so artefacts produced by the offline
+backend are never served to the openai one.
+"""
+
+import os
+import json
+import hashlib
+from typing import Dict, Optional, Tuple
+
+from utils.backends import get_backend
+from utils.mmap_index import has_mmap_index
+from utils.session_store import CACHE_DIR, get_session_store
+
+# Constants
+DOCUMENTS_DIR = os.path.join(CACHE_DIR, "documents")
+TENDERS_DIR = os.path.join(CACHE_DIR, "tenders")
+PARSED_MARKER = "parsed.json"
+PARTIAL_MARKER = "partial"  # Tender built without the LlamaParse markdown of some documents
+
+def hash_bytes(data: bytes) -> str:
+    """
+    Compute the content hash used as cache key.
+
+    Args:
+        data (bytes): File content
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def tender_key(document_hashes: Dict[str, str], namespace: str = "") -> str:
+    """
+    Build the cache key of a tender from the hashes of its documents.
+
+    Args:
+        document_hashes (Dict[str, str]): Document type -> content hash
+        namespace (str): Backend and embedding model the tender is indexed with (see cache_namespace)
+
+    Returns:
+        str: SHA-256 hex digest identifying the tender
+    """
+    signature = "|".join(f"{doc_type}:{doc_hash}" for doc_type, doc_hash in sorted(document_hashes.items()))
+    if namespace:
+        signature = f"{namespace}|{signature}"
+    return hashlib.sha256(signature.encode("utf-8")).hexdigest()
+
+def _backend_file_name(file_name: str) -> str:
+    """Name of a parse file for the selected backend (openai files keep their plain names)"""
+    backend = get_backend()
+    return file_name if backend == "openai" else f"{backend}.{file_name}"
+
+def document_dir(doc_hash: str) -> str:
+    """Directory holding the PDF and parsed markdown of one document"""
+    return os.path.join(DOCUMENTS_DIR, doc_hash)
+
+def tender_dir(key: str) -> str:
+    """Directory holding the combined markdown and index of one tender"""
+    return os.path.join(TENDERS_DIR, key)
+
+def touch(entry_dir: str) -> None:
+    """
+    Record an access to a cache entry (used for LRU eviction).
+
+    Args:
+        entry_dir (str): Cache entry directory
+    """
+    os.makedirs(entry_dir, exist_ok=True)
+    get_session_store().touch(entry_dir)
+
+def record_write(entry_dir: str) -> None:
+    """
+    Record that files were added to a cache entry (updates its size for the quota).
+
+    Args:
+        entry_dir (str): Cache entry directory
+    """
+    get_session_store().update_size(entry_dir)
+
+def store_document(data: bytes) -> Tuple[str, str]:
+    """
+    Store a PDF in the cache if it isn't there yet.
+
+    Args:
+        data (bytes): PDF content
+
+    Returns:
+        Tuple[str, str]: Content hash and path of the cached PDF
+    """
+    doc_hash = hash_bytes(data)
+    entry_dir = document_dir(doc_hash)
+    pdf_path = os.path.join(entry_dir, "source.pdf")
+
+    if not os.path.exists(pdf_path):
+        os.makedirs(entry_dir, exist_ok=True)
+        # Write to a temporary file first so a concurrent reader never sees a partial PDF
+        tmp_path = f"{pdf_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, pdf_path)
+        record_write(entry_dir)
+    else:
+        touch(entry_dir)
+    return doc_hash, pdf_path
+
+def load_parsed_document(entry_dir: str) -> Optional[Dict[str, str]]:
+    """
+    Load the markdown cached for a document.
+
+    Args:
+        entry_dir (str): Document cache directory
+
+    Returns:
+        Optional[Dict[str, str]]: Parsing method -> markdown path, None if not parsed yet
+    """
+    marker = os.path.join(entry_dir, _backend_file_name(PARSED_MARKER))
+    if not os.path.exists(marker):
+        return None
+    try:
+        with open(marker, "r", encoding="utf-8") as f:
+            methods = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    paths = {method: os.path.join(entry_dir, file_name) for method, file_name in methods.items()}
+    if not all(os.path.exists(path) for path in paths.values()):
+        return None
+
+    touch(entry_dir)
+    return paths
+
+def parsed_document_path(entry_dir: str, method: str) -> str:
+    """Path of the markdown produced by a parsing method for a document"""
+    return os.path.join(entry_dir, _backend_file_name(f"{method}.md"))
+
+def save_parsed_document(entry_dir: str, markdown: Dict[str, Optional[str]]) -> Dict[str, str]:
+    """
+    Cache the markdown produced for a document.
+
+    Args:
+        entry_dir (str): Document cache directory
+        markdown (Dict[str, Optional[str]]): Parsing method -> markdown text, or None
+            when the markdown was already written (streamed) to parsed_document_path
+
+    Returns:
+        Dict[str, str]: Parsing method -> markdown path
+    """
+    os.makedirs(entry_dir, exist_ok=True)
+    methods = {}
+    for method, text in markdown.items():
+        md_path = parsed_document_path(entry_dir, method)
+        if text is not None:
+            with open(md_path, "w", encoding="utf-8") as f:
+                f.write(text)
+        methods[method] = os.path.basename(md_path)
+
+    # The marker is written last: its presence means the entry is complete
+    with open(os.path.join(entry_dir, _backend_file_name(PARSED_MARKER)), "w", encoding="utf-8") as f:
+        json.dump(methods, f)
+
+    record_write(entry_dir)
+    return {method: os.path.join(entry_dir, file_name) for method, file_name in methods.items()}
+
+def set_partial(entry_dir: str, partial: bool) -> None:
+    """
+    Mark a tender cache entry as built from incomplete parses (or clear the mark).
+    A partial entry is rebuilt on the next upload of the same documents.
+
+    Args:
+        entry_dir (str): Tender cache directory
+        partial (bool): Whether some documents could not be parsed completely
+    """
+    marker = os.path.join(entry_dir, PARTIAL_MARKER)
+    if partial:
+        os.makedirs(entry_dir, exist_ok=True)
+        with open(marker, "w", encoding="utf-8"):
+            pass
+    elif os.path.exists(marker):
+        os.remove(marker)
+
+def is_partial(entry_dir: str) -> bool:
+    """Check whether a tender cache entry was built from incomplete parses"""
+    return os.path.exists(os.path.join(entry_dir, PARTIAL_MARKER))
+
+def has_index(index_dir: str) -> bool:
+    """Check whether a persisted index exists in a tender cache entry"""
+    return has_mmap_index(index_dir)
@@ -0,0 +1,110 @@
+"""
+Bounded conversation memory for the chatbot.
+
+The last turns are sent verbatim within a token budget; older turns are folded
+into a running summary (one short LLM call through the response cache, every
+few turns) that is kept with the conversation. The history part of the prompt
+therefore stays roughly constant however long the session gets.
+"""
+
+from typing import Dict, List
+
+from utils.context_packing import count_tokens, truncate_to_tokens
+from utils.llm_cache import cached_chat_completion
+
+# Constants
+RECENT_TURNS = 4  # Question/answer pairs kept verbatim
+HISTORY_TOKEN_BUDGET = 1500  # Tokens of verbatim history
+SUMMARY_TOKEN_BUDGET = 300  # Tokens of the running summary
+FOLD_EVERY_TURNS = 2  # Older turns are summarized in batches to avoid a summary call on every turn
+
+SUMMARY_PROMPT = """Tu résumes une conversation sur des documents d'appel d'offres marocains.
+Mets à jour le résumé existant avec les nouveaux échanges. Garde les questions posées, les réponses obtenues
+et les chiffres, dates et références cités. Réponds uniquement avec le résumé, en moins de {words} mots."""
+
+def _role(message: Dict) -> str:
+    return "user" if message["is_user"] else "assistant"
+
+class ConversationMemory:
+    """
+    Recent turns verbatim plus a running summary of the older ones.
+    Kept in the Streamlit session state, one per conversation.
+    """
+
+    def __init__(self, recent_turns: int = RECENT_TURNS, history_budget: int = HISTORY_TOKEN_BUDGET,
+                 summary_budget: int = SUMMARY_TOKEN_BUDGET, fold_every_turns: int = FOLD_EVERY_TURNS):
+        """
+        Initialize an empty memory.
+
+        Args:
+            recent_turns (int): Question/answer pairs kept verbatim
+            history_budget (int): Maximum tokens of verbatim history
+            summary_budget (int): Maximum tokens of the summary
+            fold_every_turns (int): Number of older turns folded into the summary at once
+        """
+        self.recent_turns = recent_turns
+        self.history_budget = history_budget
+        self.summary_budget = summary_budget
+        self.fold_every_turns = fold_every_turns
+        self.summary = ""
+        self.summarized = 0  # Number of history messages already folded into the summary
+
+    def clear(self) -> None:
+        """Forget the summary (the chat history was cleared)."""
+        self.summary = ""
+        self.summarized = 0
+
+    def _recent_start(self, history: List[Dict], model: str) -> int:
+        """Index of the first message kept verbatim: last turns, within the token budget"""
+        start = max(0, len(history) - 2 * self.recent_turns)
+        used = 0
+        for i in range(len(history) - 1, start - 1, -1):
+            used += count_tokens(history[i]["content"], model)
+            if used > self.history_budget:
+                return i + 1
+        return start
+
+    def _fold(self, client, model: str, messages: List[Dict]) -> None:
+        """Merge messages into the running summary"""
+        exchanges = "\n".join(f"{_role(m)}: {m['content']}" for m in messages)
+        summary = cached_chat_completion(
+            client,
+            model=model,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT.format(words=self.summary_budget * 3 // 4)},
+                {"role": "user", "content": f"Résumé existant:\n{self.summary or '(vide)'}\n\nNouveaux échanges:\n{exchanges}"}
+            ],
+            temperature=0
+        )
+        self.summary = truncate_to_tokens(summary.strip(), self.summary_budget, model)
+
+    def build_messages(self, history: List[Dict], client, model: str) -> List[Dict[str, str]]:
+        """
+        Chat messages representing the conversation so far, within the budgets.
+
+        Args:
+            history (List[Dict]): Previous messages ({"content", "is_user"}), without the current question
+            client: OpenAI client (for the summary calls)
+            model (str): Chat model
+
+        Returns:
+            List[Dict[str, str]]: Summary message (if any) followed by the recent messages
+        """
+        if len(history) < self.summarized:
+            # History was cleared or replaced
+            self.clear()
+
+        recent_start = self._recent_start(history, model)
+        # Older messages not summarized yet stay verbatim until there are enough of them to fold,
+        # unless they no longer fit in the budget
+        pending = history[self.summarized:recent_start]
+        over_budget = sum(count_tokens(m["content"], model) for m in history[self.summarized:]) > self.history_budget
+        if pending and (len(pending) >= 2 * self.fold_every_turns or over_budget):
+            self._fold(client, model, pending)
+            self.summarized = recent_start
+
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Résumé de la conversation précédente:\n{self.summary}"})
+        messages.extend({"role": _role(m), "content": m["content"]} for m in history[self.summarized:])
+        return messages
@@ -0,0 +1,250 @@
+"""
+Section-aware chunking of tender documents.
+
+RC and CPS are organised in titles, chapters, articles and annexes. The parser
+detects these headings (plain text from PyMuPDF or markdown headings from
+LlamaParse) and cuts the documents along them: a chunk never spans two
+articles, and each chunk carries the path of its section (e.g. "Chapitre II >
+Article 5 - Caution provisoire") in its metadata. Sections longer than the
+chunk size are split on paragraph, then line boundaries.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.node_parser import NodeParser
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import BaseNode
+
+from utils.context_packing import count_tokens
+
+# Constants
+SECTION_CHUNK_TOKENS = 1024  # Maximum size of a chunk; longer sections are split
+MIN_CHUNK_TOKENS = 64  # Pieces of a split section smaller than this are merged with their neighbour
+HEADING_MAX_CHARS = 150  # Longer lines are body text, even if they start like a heading
+SECTION_SEPARATOR = " > "
+
+# Heading levels: titles/parts > chapters/annexes > articles (markdown headings without keyword: article level)
+TITLE_LEVEL = 1
+CHAPTER_LEVEL = 2
+ARTICLE_LEVEL = 3
+
+_NUMBER = r"(?:n[°º]\s*)?(?P<number>\d+(?:\.\d+)*|[IVXLC]+|premier|premiere|première|1er|unique)"
+_TITLE = r"\s*(?:$|[:.\-–—]\s*(?P<title>.*)$)"
+KEYWORD_HEADING_RE = re.compile(
+    r"^(?P<keyword>titre|partie|chapitre|annexe|article|art\.)\s+" + _NUMBER + _TITLE,
+    re.IGNORECASE
+)
+MARKDOWN_HEADING_RE = re.compile(r"^(?P<hashes>#{1,6})\s+(?P<text>.+?)\s*#*$")
+PAGE_HEADING_RE = re.compile(r"^page\s+\d+$", re.IGNORECASE)  # Page markers added by the parsers
+LINE_DECORATION_RE = re.compile(r"^[\s*_>|]+|[\s*_|]+$")  # Bold/italic markers and table pipes around a heading
+
+KEYWORD_LEVELS = {
+    "titre": TITLE_LEVEL,
+    "partie": TITLE_LEVEL,
+    "chapitre": CHAPTER_LEVEL,
+    "annexe": CHAPTER_LEVEL,
+    "article": ARTICLE_LEVEL,
+    "art.": ARTICLE_LEVEL,
+}
+
+@dataclass
+class Heading:
+    """A section heading found in a document"""
+    start: int  # Character offset of the heading line
+    level: int
+    label: str  # e.g. "Article 5 - Caution provisoire"
+
+def _heading_label(keyword: str, number: str, title: Optional[str]) -> str:
+    keyword = "Article" if keyword.lower() == "art." else keyword.capitalize()
+    label = f"{keyword} {number}"
+    title = (title or "").strip(" *_:-–—")
+    return f"{label} - {title}" if title else label
+
+def parse_heading(line: str) -> Optional[Tuple[int, str]]:
+    """
+    Recognize a heading line.
+
+    Args:
+        line (str): Line of a document
+
+    Returns:
+        Optional[Tuple[int, str]]: (level, label) of the heading, None for body text
+    """
+    markdown = MARKDOWN_HEADING_RE.match(line.strip())
+    text = markdown.group("text") if markdown else line
+    text = LINE_DECORATION_RE.sub("", text)
+    if not text or len(text) > HEADING_MAX_CHARS or PAGE_HEADING_RE.match(text):
+        return None
+
+    keyword = KEYWORD_HEADING_RE.match(text)
+    if keyword:
+        level = KEYWORD_LEVELS[keyword.group("keyword").lower()]
+        return level, _heading_label(keyword.group("keyword"), keyword.group("number"), keyword.group("title"))
+    if markdown:
+        return ARTICLE_LEVEL, text
+    return None
+
+def find_headings(text: str) -> List[Heading]:
+    """
+    Find the section headings of a document.
+
+    Args:
+        text (str): Document text (markdown)
+
+    Returns:
+        List[Heading]: Headings in document order
+    """
+    headings = []
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        heading = parse_heading(line.strip())
+        if heading:
+            headings.append(Heading(offset, *heading))
+        offset += len(line)
+    return headings
+
+def section_spans(text: str) -> List[Tuple[int, int, List[str]]]:
+    """
+    Cut a document into sections.
+
+    Args:
+        text (str): Document text (markdown)
+
+    Returns:
+        List[Tuple[int, int, List[str]]]: (start, end, section path) of each non-empty section;
+            text before the first heading has an empty path
+    """
+    headings = find_headings(text)
+    boundaries = [heading.start for heading in headings] + [len(text)]
+
+    spans = []
+    if not headings or headings[0].start > 0:
+        spans.append((0, boundaries[0], []))
+
+    stack: List[Heading] = []
+    for heading, end in zip(headings, boundaries[1:]):
+        while stack and stack[-1].level >= heading.level:
+            stack.pop()
+        stack.append(heading)
+        spans.append((heading.start, end, [h.label for h in stack]))
+
+    # A heading directly followed by a sub-heading (e.g. "CHAPITRE II" then "Article 5") has no body
+    # of its own: it is merged into its first subsection, whose path already includes it
+    merged = []
+    for start, end, path in reversed(spans):
+        if merged and path and "\n" not in text[start:end].strip():
+            next_start, next_end, next_path = merged[-1]
+            if next_path[:len(path)] == path and next_start == end:
+                merged[-1] = (start, next_end, next_path)
+                continue
+        merged.append((start, end, path))
+    return [(start, end, path) for start, end, path in reversed(merged) if text[start:end].strip()]
+
+def _split_on(text: str, start: int, end: int, pattern: str) -> List[Tuple[int, int]]:
+    """Spans of text[start:end] cut after each match of pattern (separators stay with the preceding piece)"""
+    pieces = []
+    cursor = start
+    for match in re.compile(pattern).finditer(text, start, end):
+        if match.end() > cursor:
+            pieces.append((cursor, match.end()))
+            cursor = match.end()
+    if cursor < end:
+        pieces.append((cursor, end))
+    return pieces
+
+def split_span(text: str, start: int, end: int, max_tokens: int) -> List[Tuple[int, int]]:
+    """
+    Split a section into spans of at most max_tokens tokens, on paragraph then line boundaries.
+
+    Args:
+        text (str): Document text
+        start (int): Start offset of the section
+        end (int): End offset of the section
+        max_tokens (int): Maximum tokens per span
+
+    Returns:
+        List[Tuple[int, int]]: Spans covering the section
+    """
+    if count_tokens(text[start:end]) <= max_tokens:
+        return [(start, end)]
+
+    pieces = []
+    for piece in _split_on(text, start, end, r"\n\s*\n"):
+        if count_tokens(text[piece[0]:piece[1]]) <= max_tokens:
+            pieces.append(piece)
+            continue
+        for line in _split_on(text, piece[0], piece[1], r"\n"):
+            if count_tokens(text[line[0]:line[1]]) <= max_tokens:
+                pieces.append(line)
+            else:
+                # A single line longer than a chunk (tables, OCR without line breaks): cut on words
+                pieces.extend(_cut_by_tokens(text, line[0], line[1], max_tokens))
+
+    # Pack consecutive pieces up to the chunk size
+    spans = []
+    current_start, current_tokens = pieces[0][0], 0
+    current_end = current_start
+    for piece_start, piece_end in pieces:
+        tokens = count_tokens(text[piece_start:piece_end])
+        if current_tokens and current_tokens + tokens > max_tokens:
+            spans.append((current_start, current_end))
+            current_start, current_tokens = piece_start, 0
+        current_end = piece_end
+        current_tokens += tokens
+    spans.append((current_start, current_end))
+
+    # Avoid a tiny last piece: give it to the previous span
+    if len(spans) > 1 and count_tokens(text[spans[-1][0]:spans[-1][1]]) < MIN_CHUNK_TOKENS:
+        spans[-2:] = [(spans[-2][0], spans[-1][1])]
+    return spans
+
+def _cut_by_tokens(text: str, start: int, end: int, max_tokens: int) -> List[Tuple[int, int]]:
+    """Cut a span on whitespace into pieces of at most max_tokens tokens"""
+    pieces = []
+    cursor = start
+    while cursor < end:
+        # Grow the piece word by word from a character estimate, then shrink until it fits
+        stop = min(end, cursor + max_tokens * 4)
+        space = text.rfind(" ", cursor + 1, stop) if stop < end else -1
+        stop = space + 1 if space > cursor else stop
+        while stop - cursor > 1 and count_tokens(text[cursor:stop]) > max_tokens:
+            stop = cursor + (stop - cursor) * 3 // 4
+        pieces.append((cursor, stop))
+        cursor = stop
+    return pieces
+
+class SectionNodeParser(NodeParser):
+    """
+    Node parser emitting section-aligned chunks with their section path in the metadata
+    ("section"), the article number ("article") when inside an article.
+    """
+
+    chunk_size: int = Field(default=SECTION_CHUNK_TOKENS, description="Maximum tokens per chunk", gt=0)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SectionNodeParser"
+
+    def _parse_nodes(self, nodes: Sequence[BaseNode], show_progress: bool = False, **kwargs: Any) -> List[BaseNode]:
+        all_nodes: List[BaseNode] = []
+        for document in nodes:
+            text = document.get_content()
+            spans = []
+            for start, end, path in section_spans(text):
+                for chunk_start, chunk_end in split_span(text, start, end, self.chunk_size):
+                    if text[chunk_start:chunk_end].strip():
+                        spans.append((chunk_start, chunk_end, path))
+
+            chunks = build_nodes_from_splits([text[start:end] for start, end, _ in spans], document)
+            for chunk, (start, end, path) in zip(chunks, spans):
+                chunk.start_char_idx, chunk.end_char_idx = start, end
+                if path:
+                    chunk.metadata["section"] = SECTION_SEPARATOR.join(path)
+                    article = next((label for label in reversed(path) if label.startswith("Article ")), None)
+                    if article:
+                        chunk.metadata["article"] = article.split(" ")[1]
+            all_nodes.extend(chunks)
+        return all_nodes
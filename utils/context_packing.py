@@ -0,0 +1,186 @@
+"""
+Token-budgeted context packing for extraction prompts.
+
+Retrieved chunks are ranked by retrieval score, deduplicated and added to the
+prompt context until the token budget of the model is reached. Tokens are
+counted with the tiktoken encoding of the chat model (the one OpenAI bills);
+if it can't be loaded (its BPE file is downloaded once, then cached), a
+4-characters-per-token estimate is used instead.
+"""
+
+import re
+import hashlib
+import logging
+import threading
+from typing import List, Optional
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_ENCODING = "cl100k_base"  # Models unknown to tiktoken, and chunking (model-independent)
+CHARS_PER_TOKEN = 4  # Estimate used when no tokenizer is available
+DEFAULT_CONTEXT_BUDGET = 3000  # Tokens of retrieved context per prompt
+MODEL_CONTEXT_BUDGETS = {
+    # Longest prefix wins
+    "gpt-3.5-turbo": 3000,
+    "gpt-4": 4000,
+    "gpt-4-turbo": 8000,
+    "gpt-4o": 8000,
+    "gpt-4o-mini": 6000,
+}
+MIN_TRUNCATED_TOKENS = 200  # A chunk that doesn't fit is cut only if this many tokens still fit
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+def _encoding_name(model: Optional[str]) -> str:
+    """tiktoken encoding of a chat model"""
+    if model:
+        try:
+            return tiktoken.encoding_name_for_model(model)
+        except KeyError:
+            pass
+    return DEFAULT_ENCODING
+
+def _get_encoding(model: Optional[str] = None):
+    """Load the encoding of a model once, None if its BPE file can't be loaded"""
+    name = _encoding_name(model)
+    with _encodings_lock:
+        if name not in _encodings:
+            try:
+                _encodings[name] = tiktoken.get_encoding(name)
+            except Exception as e:
+                logger.warning("Encoding %s unavailable, estimating token counts: %s", name, e)
+                _encodings[name] = None
+        return _encodings[name]
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count the tokens of a text.
+
+    Args:
+        text (str): Text
+        model (Optional[str]): Chat model whose tokenizer is used (default encoding if None)
+
+    Returns:
+        int: Number of tokens
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """
+    Cut a text to at most max_tokens tokens.
+
+    Args:
+        text (str): Text
+        max_tokens (int): Maximum number of tokens
+        model (Optional[str]): Chat model whose tokenizer is used (default encoding if None)
+
+    Returns:
+        str: Beginning of the text
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    token_ids = encoding.encode(text, disallowed_special=())
+    if len(token_ids) <= max_tokens:
+        return text
+    return encoding.decode(token_ids[:max_tokens])
+
+def get_context_budget(model: Optional[str]) -> int:
+    """
+    Token budget of the retrieved context for a model.
+
+    Args:
+        model (Optional[str]): Chat model
+
+    Returns:
+        int: Context budget in tokens
+    """
+    matches = [prefix for prefix in MODEL_CONTEXT_BUDGETS if model and model.startswith(prefix)]
+    if not matches:
+        return DEFAULT_CONTEXT_BUDGET
+    return MODEL_CONTEXT_BUDGETS[max(matches, key=len)]
+
+def _content_key(text: str) -> str:
+    """Hash of a chunk text ignoring case and whitespace (duplicate detection)"""
+    return hashlib.sha256(re.sub(r"\s+", " ", text).strip().lower().encode("utf-8")).hexdigest()
+
+def pack_context(nodes_with_scores: List, budget: int, rank_by_score: bool = True,
+                 model: Optional[str] = None) -> str:
+    """
+    Pack retrieved chunks into a context block within a token budget.
+    Each chunk is labelled with its document type (and page and section when known).
+
+    Args:
+        nodes_with_scores (List): Retrieved chunks (NodeWithScore)
+        budget (int): Maximum number of tokens of the context
+        rank_by_score (bool): Sort chunks by retrieval score first; otherwise keep the given order
+        model (Optional[str]): Chat model the context is sent to (its tokenizer counts the budget)
+
+    Returns:
+        str: Context block
+    """
+    candidates = list(nodes_with_scores)
+    if rank_by_score:
+        candidates.sort(key=lambda n: n.score if n.score is not None else 0.0, reverse=True)
+
+    blocks = []
+    used = 0
+    seen = set()
+    separator_tokens = count_tokens(CHUNK_SEPARATOR, model)
+    for node_with_score in candidates:
+        node = node_with_score.node
+        content = node.get_content().strip()
+        key = _content_key(content)
+        if not content or node.node_id in seen or key in seen:
+            continue
+        seen.update((node.node_id, key))
+
+        label = f"[Document: {node.metadata.get('type', 'inconnu')}"
+        if node.metadata.get("page") is not None:
+            label += f", page {node.metadata['page']}"
+        if node.metadata.get("section"):
+            label += f", {node.metadata['section']}"
+        header = f"{label}]\n"
+
+        cost = count_tokens(header + content, model) + (separator_tokens if blocks else 0)
+        if used + cost <= budget:
+            blocks.append(header + content)
+            used += cost
+            continue
+
+        # Cut the chunk if a meaningful part of it still fits; otherwise a smaller one may still fit
+        remaining = budget - used - count_tokens(header, model) - (separator_tokens if blocks else 0)
+        if remaining >= MIN_TRUNCATED_TOKENS:
+            blocks.append(header + truncate_to_tokens(content, remaining, model))
+            used = budget
+
+        if budget - used < MIN_TRUNCATED_TOKENS:
+            break
+
+    return CHUNK_SEPARATOR.join(blocks)
+
+def interleave_by_rank(result_lists: List[List]) -> List:
+    """
+    Merge several retrieval results rank by rank (first chunk of each query, then the second...),
+    so every query gets its best chunk in the context before any query gets a second one.
+
+    Args:
+        result_lists (List[List]): Retrieved chunks of each query, best first
+
+    Returns:
+        List: Merged chunks
+    """
+    merged = []
+    for rank in range(max((len(results) for results in result_lists), default=0)):
+        for results in result_lists:
+            if rank < len(results):
+                merged.append(results[rank])
+    return merged
@@ -8,6 +8,8 @@ import os
 from supabase import create_client
 from dotenv import load_dotenv
 
+from utils.normalization import parse_amount_series, parse_date_series
+
 # Load environment variables
 load_dotenv()
 
@@ -87,7 +89,13 @@ def prepare_data(df):
         date_columns = ['Date de publication', 'Date de soumission', 'Date de décision']
         for col in date_columns:
             if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
+                df[col] = parse_date_series(df[col])
+        
+        # Amounts may be stored as text ("1 200 000 DH")
+        amount_columns = ['Montant estimé (MAD)', 'Caution demandée (MAD)', 'Montant offert (MAD)']
+        for col in amount_columns:
+            if col in df.columns:
+                df[col] = parse_amount_series(df[col])
         
         # Helper function to safely convert to numeric
         def safe_numeric_conversion(series):
@@ -98,7 +106,6 @@ def prepare_data(df):
         
         # Convert numeric columns to proper numeric types
         numeric_columns = [
-            'Montant estimé (MAD)', 'Caution demandée (MAD)', 'Montant offert (MAD)',
             'Temps de traitement (jours)', 'Écart montant (%)', 'Durée du marché (mois)',
             'Complexité perçue (1-5)', 'Score technique (si dispo)', 'Nombre de concurrents (si dispo)'
         ]
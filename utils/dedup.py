@@ -0,0 +1,113 @@
+"""
+Near-duplicate chunk elimination between parsing and indexing.
+
+Each tender document is parsed by both PyMuPDF and LlamaParse, so most chunks
+exist twice. Chunks are compared with MinHash signatures over word shingles
+(bucketed with LSH) and, for each group of near-duplicates of the same document
+type, only the best formatted variant is kept.
+"""
+
+import re
+import zlib
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Constants
+SHINGLE_SIZE = 5  # Words per shingle
+NUM_PERM = 64  # MinHash signature length
+LSH_BANDS = 16  # NUM_PERM must be a multiple of LSH_BANDS
+SIMILARITY_THRESHOLD = 0.7  # Estimated Jaccard similarity above which chunks are duplicates
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(42)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+def _words(text: str) -> List[str]:
+    """Lowercase words without accents, markdown markup or punctuation"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"\w+", text)
+
+def minhash_signature(text: str, shingle_size: int = SHINGLE_SIZE) -> Optional[np.ndarray]:
+    """
+    Compute the MinHash signature of a text.
+
+    Args:
+        text (str): Chunk text
+        shingle_size (int): Number of words per shingle
+
+    Returns:
+        Optional[np.ndarray]: Signature of NUM_PERM values, None if the text is too short
+    """
+    words = _words(text)
+    if len(words) < shingle_size:
+        return None
+
+    shingles = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+    # a * x + b stays below 2**64 because a, b and x are 32-bit values
+    permuted = (hashes[:, None] * _PERM_A + _PERM_B) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=0)
+
+def formatting_score(node) -> float:
+    """
+    Score how well formatted a chunk is; higher is better.
+    LlamaParse markdown is preferred, then chunks with more markdown structure.
+    """
+    text = node.get_content()
+    structure = len(re.findall(r"^\s*(#{1,6} |[-*] |\d+[.)] |\|)", text, flags=re.MULTILINE))
+    score = structure / max(1, len(text.splitlines()))
+    if node.metadata.get("method") == "llama":
+        score += 1.0
+    return score
+
+def deduplicate_nodes(nodes: List, threshold: float = SIMILARITY_THRESHOLD) -> List:
+    """
+    Remove near-duplicate chunks, keeping the best formatted variant.
+
+    Args:
+        nodes (List): Chunk nodes (from a node parser)
+        threshold (float): Estimated Jaccard similarity above which two chunks are duplicates
+
+    Returns:
+        List: Kept nodes, in their original order
+    """
+    rows = NUM_PERM // LSH_BANDS
+    signatures = [minhash_signature(node.get_content()) for node in nodes]
+
+    # Best formatted chunks first, so they are the ones kept
+    order = sorted(range(len(nodes)), key=lambda i: formatting_score(nodes[i]), reverse=True)
+
+    buckets: Dict[tuple, List[int]] = {}
+    kept = set()
+    for i in order:
+        signature = signatures[i]
+        if signature is None:
+            kept.add(i)
+            continue
+
+        doc_type = nodes[i].metadata.get("type")
+        band_keys = [(doc_type, band, signature[band * rows:(band + 1) * rows].tobytes())
+                     for band in range(LSH_BANDS)]
+
+        # Candidates share at least one band with an already kept chunk
+        candidates = {j for key in band_keys for j in buckets.get(key, [])}
+        duplicate_of = next(
+            (j for j in candidates if np.mean(signatures[j] == signature) >= threshold),
+            None
+        )
+
+        if duplicate_of is None:
+            kept.add(i)
+            for key in band_keys:
+                buckets.setdefault(key, []).append(i)
+        elif "page" in nodes[i].metadata and "page" not in nodes[duplicate_of].metadata:
+            # Keep the page reference of the dropped PyMuPDF variant
+            nodes[duplicate_of].metadata["page"] = nodes[i].metadata["page"]
+
+    return [node for i, node in enumerate(nodes) if i in kept]
@@ -0,0 +1,376 @@
+"""
+Local embedding store shared across sessions and indices.
+
+Embeddings are keyed by (embedding model, hash of the normalized chunk text) and
+stored per model as float32 shards (one .npy matrix and the JSON list of its
+keys per flush), memory-mapped and merged into one index on load.
+CachedEmbedding wraps the backend embedding model and only sends the chunks
+that are not in the store, so boilerplate repeated across dossiers (CCAG
+clauses, standard RC articles) is embedded once.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import atexit
+import hashlib
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from llama_index.core import Settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from utils.backends import get_base_embed_model
+
+try:
+    import fcntl
+except ImportError:  # Windows: shards are never merged
+    fcntl = None
+
+# Constants
+EMBEDDING_CACHE_DIR = "data/embeddings"
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+QUERY_FLUSH_THRESHOLD = 32  # Query embeddings are written to disk in groups
+SHARD_PREFIX = "shard-"
+MAX_SHARDS = 64  # Beyond this, the shards of a store are merged into one
+COMPACTION_LOCK = "compaction.lock"
+LEGACY_VECTORS_FILE = "vectors.npy"  # Single-matrix layout of earlier versions
+LEGACY_INDEX_FILE = "index.json"
+
+def embedding_dimension(embed_model: BaseEmbedding) -> Optional[int]:
+    """
+    Dimension of the vectors of an embedding model, when it can be known without a call.
+
+    Args:
+        embed_model (BaseEmbedding): Embedding model
+
+    Returns:
+        Optional[int]: Dimension, None if unknown
+    """
+    return getattr(embed_model, "embed_dim", None) or getattr(embed_model, "dimensions", None)
+
+def normalize_text(text: str) -> str:
+    """Normalize chunk text before hashing (unicode form and whitespace)"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+def _text_key(text: str, kind: str) -> str:
+    """Cache key of a text; queries and documents are kept apart"""
+    return hashlib.sha256(f"{kind}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class EmbeddingStore:
+    """
+    Append-only embedding store for one embedding model.
+    Each flush writes its new vectors to a shard of their own (shard-*.npy with
+    the keys of its rows in shard-*.json), so processes sharing the store never
+    rewrite each other's vectors. Shards written by other processes are picked
+    up on refresh, and small shards are merged once there are too many of them.
+    Safe to share between threads.
+    """
+
+    def __init__(self, model_name: str, base_dir: str = EMBEDDING_CACHE_DIR):
+        """
+        Initialize the store, loading existing vectors memory-mapped.
+
+        Args:
+            model_name (str): Embedding model the vectors come from
+            base_dir (str): Root directory of the embedding stores
+        """
+        self.model_name = model_name
+        self.store_dir = os.path.join(base_dir, re.sub(r"[^\w.-]", "_", model_name))
+
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[int, int]] = {}  # key -> (shard, row)
+        self._shards: List[np.ndarray] = []
+        self._shard_names: Dict[str, int] = {}
+        self._pending: List[np.ndarray] = []
+        self._pending_keys: Dict[str, int] = {}
+        with self._lock:
+            self._migrate_legacy()
+            self._refresh()
+            if len(self._shard_names) > MAX_SHARDS:
+                self._compact()
+
+    def _migrate_legacy(self) -> None:
+        """Turn a store written as a single vectors.npy/index.json into a shard. Lock held."""
+        vectors_path = os.path.join(self.store_dir, LEGACY_VECTORS_FILE)
+        index_path = os.path.join(self.store_dir, LEGACY_INDEX_FILE)
+        if not (os.path.exists(vectors_path) and os.path.exists(index_path)):
+            return
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            vectors = np.load(vectors_path)
+        except (OSError, ValueError):
+            return
+        if len(index) == vectors.shape[0]:
+            self._write_shard(sorted(index, key=index.get), vectors)
+        for path in (index_path, vectors_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _shard_paths(self, name: str) -> Tuple[str, str]:
+        """Vectors and keys files of a shard"""
+        return os.path.join(self.store_dir, f"{name}.npy"), os.path.join(self.store_dir, f"{name}.json")
+
+    def _add_shard(self, name: str, keys: List[str], vectors: np.ndarray) -> None:
+        """Register a loaded shard. Lock held."""
+        shard = len(self._shards)
+        self._shards.append(vectors)
+        self._shard_names[name] = shard
+        for row, key in enumerate(keys):
+            self._index.setdefault(key, (shard, row))
+
+    def _refresh(self) -> None:
+        """Load the shards written since the last refresh (by any process). Lock held."""
+        try:
+            file_names = os.listdir(self.store_dir)
+        except OSError:
+            return
+        # The keys file is written last: its presence means the shard is complete
+        names = sorted(name[:-len(".json")] for name in file_names
+                       if name.startswith(SHARD_PREFIX) and name.endswith(".json"))
+        for name in names:
+            if name in self._shard_names:
+                continue
+            vectors_path, keys_path = self._shard_paths(name)
+            try:
+                with open(keys_path, "r", encoding="utf-8") as f:
+                    keys = json.load(f)
+                vectors = np.load(vectors_path, mmap_mode="r")
+            except (OSError, ValueError):
+                # Merged away by another process in the meantime
+                continue
+            # Ignore a shard whose files are out of sync
+            if len(keys) == vectors.shape[0]:
+                self._add_shard(name, keys, vectors)
+
+    def _write_shard(self, keys: List[str], vectors: np.ndarray) -> str:
+        """Write a new shard to disk and return its name. Lock held."""
+        os.makedirs(self.store_dir, exist_ok=True)
+        name = f"{SHARD_PREFIX}{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        vectors_path, keys_path = self._shard_paths(name)
+        # Write to temporary files first so a concurrent reader never sees a partial shard
+        with open(f"{vectors_path}.tmp", "wb") as f:
+            np.save(f, vectors)
+        os.replace(f"{vectors_path}.tmp", vectors_path)
+        with open(f"{keys_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(keys, f)
+        os.replace(f"{keys_path}.tmp", keys_path)
+        return name
+
+    def _compact(self) -> None:
+        """Merge the loaded shards into one (one process at a time). Lock held."""
+        if fcntl is None:
+            return
+        os.makedirs(self.store_dir, exist_ok=True)
+        with open(os.path.join(self.store_dir, COMPACTION_LOCK), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # Another process is merging
+                return
+            try:
+                self._refresh()
+                old_names = list(self._shard_names)
+                keys, blocks = [], []
+                rows_by_shard: Dict[int, List[Tuple[str, int]]] = {}
+                for key, (shard, row) in self._index.items():
+                    rows_by_shard.setdefault(shard, []).append((key, row))
+                for shard, entries in rows_by_shard.items():
+                    keys.extend(key for key, _ in entries)
+                    blocks.append(np.asarray(self._shards[shard][[row for _, row in entries]]))
+                if not blocks:
+                    return
+                name = self._write_shard(keys, np.vstack(blocks))
+
+                self._index, self._shards, self._shard_names = {}, [], {}
+                self._add_shard(name, keys, np.load(self._shard_paths(name)[0], mmap_mode="r"))
+                for old_name in old_names:
+                    for path in reversed(self._shard_paths(old_name)):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return len(self._index) + len(self._pending_keys)
+
+    def refresh(self) -> None:
+        """Pick up the embeddings written by other processes since the last refresh."""
+        with self._lock:
+            self._refresh()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        """
+        Look up an embedding.
+
+        Args:
+            key (str): Text key
+
+        Returns:
+            Optional[List[float]]: Embedding, None if not stored
+        """
+        with self._lock:
+            location = self._index.get(key)
+            if location is not None:
+                shard, row = location
+                return self._shards[shard][row].tolist()
+            pending_row = self._pending_keys.get(key)
+            if pending_row is not None:
+                return self._pending[pending_row].tolist()
+        return None
+
+    def put(self, key: str, embedding: List[float]) -> None:
+        """
+        Add an embedding (kept in memory until flush).
+
+        Args:
+            key (str): Text key
+            embedding (List[float]): Embedding
+        """
+        with self._lock:
+            if key in self._index or key in self._pending_keys:
+                return
+            self._pending_keys[key] = len(self._pending)
+            self._pending.append(np.asarray(embedding, dtype=np.float32))
+
+    def flush(self, min_pending: int = 1) -> None:
+        """
+        Write pending embeddings to disk, as a new shard.
+
+        Args:
+            min_pending (int): Only write if at least this many embeddings are pending
+        """
+        with self._lock:
+            if not self._pending or len(self._pending) < min_pending:
+                return
+
+            keys = list(self._pending_keys)
+            vectors = np.vstack(self._pending)
+            # Kept in memory: another process may merge the new shard away at any time
+            self._add_shard(self._write_shard(keys, vectors), keys, vectors)
+            self._pending = []
+            self._pending_keys = {}
+
+            self._refresh()
+            if len(self._shard_names) > MAX_SHARDS:
+                self._compact()
+
+_stores: Dict[str, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+@atexit.register
+def _flush_stores() -> None:
+    """Write embeddings still pending when the process exits"""
+    for store in list(_stores.values()):
+        store.flush()
+
+def get_embedding_store(model_name: str) -> EmbeddingStore:
+    """Process-wide embedding store of a model"""
+    with _stores_lock:
+        if model_name not in _stores:
+            _stores[model_name] = EmbeddingStore(model_name)
+        return _stores[model_name]
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Embedding model consulting the local embedding store before the wrapped model.
+    """
+
+    _inner: BaseEmbedding = PrivateAttr()
+    _store: EmbeddingStore = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, store: Optional[EmbeddingStore] = None, **kwargs: Any):
+        """
+        Args:
+            inner (BaseEmbedding): Embedding model called on cache misses
+            store (Optional[EmbeddingStore]): Store to use, the model's shared store by default
+        """
+        super().__init__(model_name=inner.model_name, embed_batch_size=inner.embed_batch_size, **kwargs)
+        self._inner = inner
+        self._store = store or get_embedding_store(inner.model_name)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def embed_dim(self) -> Optional[int]:
+        """Dimension of the vectors of the wrapped model, None if it isn't known without a call"""
+        return embedding_dimension(self._inner)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        key = _text_key(query, "query")
+        embedding = self._store.get(key)
+        if embedding is None:
+            embedding = self._inner.get_query_embedding(query)
+            self._store.put(key, embedding)
+            self._store.flush(min_pending=QUERY_FLUSH_THRESHOLD)
+        return embedding
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        keys = [_text_key(text, "text") for text in texts]
+        embeddings = [self._store.get(key) for key in keys]
+        if any(embedding is None for embedding in embeddings):
+            # Another process may have embedded them since the store was loaded
+            self._store.refresh()
+            embeddings = [embedding if embedding is not None else self._store.get(key)
+                          for key, embedding in zip(keys, embeddings)]
+
+        # Only embed the texts that are not in the store (once per distinct text)
+        missing = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(keys[i], texts[i])
+        if missing:
+            new_embeddings = self._inner.get_text_embedding_batch(list(missing.values()))
+            for key, embedding in zip(missing, new_embeddings):
+                self._store.put(key, embedding)
+            self._store.flush()
+            computed = dict(zip(missing, new_embeddings))
+            embeddings = [embedding if embedding is not None else computed[key]
+                          for key, embedding in zip(keys, embeddings)]
+
+        return embeddings
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._get_text_embeddings(texts)
+
+_embed_models: Dict[str, CachedEmbedding] = {}
+_embed_models_lock = threading.Lock()
+
+def get_embed_model(model_name: str = DEFAULT_EMBEDDING_MODEL) -> CachedEmbedding:
+    """
+    Get the process-wide cached embedding model.
+
+    Args:
+        model_name (str): OpenAI embedding model (ignored by the offline backend)
+
+    Returns:
+        CachedEmbedding: Embedding model backed by the local store
+    """
+    with _embed_models_lock:
+        if model_name not in _embed_models:
+            _embed_models[model_name] = CachedEmbedding(get_base_embed_model(model_name))
+        return _embed_models[model_name]
+
+def configure_embeddings(model_name: str = DEFAULT_EMBEDDING_MODEL) -> None:
+    """Use the cached embedding model for every index (global llama-index settings)"""
+    Settings.embed_model = get_embed_model(model_name)
@@ -1,20 +1,89 @@
 import os
 import glob
 import time
+import json
+import bisect
+import logging
 import shutil
 import fitz  # PyMuPDF
-import streamlit as st
-from typing import Dict
-from openai import OpenAI
-from llama_parse import LlamaParse
-from llama_index.core import VectorStoreIndex, Document
-from llama_index.core.node_parser import SentenceSplitter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Annotated, Dict, List, Optional, Tuple
+from pydantic import BeforeValidator, Field, StringConstraints, ValidationError, create_model
+from llama_index.core import Document
+from utils.answer_cache import get_answer_cache
+from utils.backends import cache_namespace, get_chat_client, get_parser
+from utils.chunking import SectionNodeParser
+from utils.context_packing import get_context_budget, interleave_by_rank, pack_context, truncate_to_tokens
+from utils.dedup import deduplicate_nodes
+from utils.index_registry import get_index_registry
+from utils.mmap_index import IncompatibleIndexError, MmapRetriever, MmapVectorIndex
+from utils.normalization import parse_amount, parse_date
+from utils.rules import confident_fields
+from utils.embedding_cache import DEFAULT_EMBEDDING_MODEL, configure_embeddings
+from utils.profiling import record_duration, stage
+from utils.progress import ProgressReporter, StreamlitProgress
+from utils.llm_cache import cached_chat_completion, get_llm_cache
+from utils.cache import (
+    has_index,
+    is_partial,
+    load_parsed_document,
+    parsed_document_path,
+    record_write,
+    save_parsed_document,
+    set_partial,
+    store_document,
+    tender_dir,
+    tender_key,
+    touch,
+)
+
+logger = logging.getLogger(__name__)
 
 # Hardcoded API keys (for testing phase only)
 OPENAI_KEY = ""
 LLAMA_PARSE_API_KEY = ""
 DEFAULT_MODEL = ""
 
+# Maximum number of fields extracted at the same time (each field = retrieval + LLM calls)
+MAX_CONCURRENT_FIELDS = 6
+
+# Number of worker processes used for PyMuPDF text extraction
+PARSE_WORKERS = 3
+
+# Extraction modes: "per_field" asks one LLM call per field,
+# "structured" asks all fields at once as a single JSON object
+EXTRACTION_MODE = "per_field"
+
+# Number of chunks retrieved per field when building the merged context (structured mode).
+# Retrieval is hybrid (vector + BM25), which finds exact tokens with fewer chunks
+STRUCTURED_TOP_K = 2
+
+# The structured call answers every field: its context budget is this multiple of the per-field one
+STRUCTURED_BUDGET_FACTOR = 2
+
+# Retrieval-only context: pass the raw retrieved chunks to the extraction call
+# instead of a query-engine synthesized answer (which costs a hidden LLM call).
+# FIELD_TOP_K chunks are candidates; only those fitting the model's token budget are sent
+RETRIEVAL_ONLY = True
+FIELD_TOP_K = 3
+
+# Sections (heading paths, see utils/chunking.py) where each field is usually found:
+# their chunks are boosted in the retrieval of the field (regular expressions, case-insensitive)
+FIELD_SECTIONS = {
+    "Objet": r"\bobjet\b",
+    "Estimation des coûts": r"estimation|co[uû]t",
+    "Montant de la caution": r"caution",
+    "Maître d'Ouvrage": r"ma[iî]tre\s+d['’]\s*ouvrage",
+    "Contenu Dossier": r"(?:composition|contenu)\s+du\s+dossier",
+    "Modalités de retrait": r"retrait",
+    "Offre Financière": r"offre\s+financi[eè]re|dossiers?\s+des\s+concurrents",
+    "Offre Technique": r"offre\s+technique|dossiers?\s+des\s+concurrents",
+}
+
+# Rule-based fast path: regular fields (reference, date, amounts, contact) found
+# with enough confidence by utils/rules.py are not sent to the LLM
+RULE_FAST_PATH = True
+
 # Set keys
 os.environ["OPENAI_API_KEY"] = OPENAI_KEY
 os.environ["LLAMA_CLOUD_API_KEY"] = LLAMA_PARSE_API_KEY
@@ -77,10 +146,23 @@ prompts = {
     )
 }
 
-def simple_openai_check():
-    """Check if OpenAI API is working"""
+# System prompt used for every field extraction
+SYSTEM_TEMPLATE = """
+        Tu es un expert en extraction d'informations des appels d'offres marocains.
+        Examine attentivement le contexte fourni pour trouver l'information demandée.
+        
+        Règles:
+        1. Réponds UNIQUEMENT par l'information demandée, sans phrases introductives
+        2. Si l'information n'est pas explicitement mentionnée, réponds "Non spécifié"
+        3. Pour le "Maître d'Ouvrage", si le document concerne la "Délégation Interministérielle aux Droits de l'Homme", c'est probablement le maître d'ouvrage
+        4. Ne confonds jamais les noms de fichiers ou les en-têtes de document avec le contenu réel
+        """
+
+def simple_openai_check(progress: Optional[ProgressReporter] = None):
+    """Check if OpenAI API (or the selected backend) is working"""
+    progress = progress or StreamlitProgress()
     try:
-        client = OpenAI(api_key=OPENAI_KEY)
+        client = get_chat_client(OPENAI_KEY)
         client.chat.completions.create(
             model=DEFAULT_MODEL,
             messages=[{"role": "user", "content": "Test"}],
@@ -88,304 +170,554 @@ def simple_openai_check():
         )
         return True
     except Exception as e:
-        st.error(f"Erreur API OpenAI: {e}")
+        progress.error(f"Erreur API OpenAI: {e}")
         return False
 
 def process_uploaded_files(uploaded_files):
     """
-    Process uploaded files to a clean temporary directory
-    This ensures each upload session is independent
+    Store uploaded files in the content-addressed cache
+    The session directory is keyed by the hashes of the documents, so
+    uploading the same RC/CPS/Avis again reuses the same session.
+    Files are upload objects (with read()) or paths to PDFs on disk.
     """
-    # Create a session-specific directory with timestamp
-    session_dir = f"data/session_{int(time.time())}"
-    os.makedirs(session_dir, exist_ok=True)
-    
-    # Save each file with a simple, consistent name
+    # Store each PDF under the hash of its content
     saved_files = {}
-    for doc_type, uploaded_file in uploaded_files.items():
-        if uploaded_file is None:
-            continue
+    document_hashes = {}
+    with stage("save"):
+        for doc_type, uploaded_file in uploaded_files.items():
+            if uploaded_file is None:
+                continue
             
-        # Save file with clear naming convention (avis.pdf, rc.pdf, cps.pdf)
-        file_path = os.path.join(session_dir, f"{doc_type}.pdf")
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.read())
-        
-        saved_files[doc_type] = file_path
+            if isinstance(uploaded_file, str):
+                with open(uploaded_file, 'rb') as f:
+                    content = f.read()
+            else:
+                content = uploaded_file.read()
+            doc_hash, file_path = store_document(content)
+            document_hashes[doc_type] = doc_hash
+            saved_files[doc_type] = file_path
+    
+    # Session directory of this set of documents, for the backend and embedding model in use
+    session_dir = tender_dir(tender_key(document_hashes, cache_namespace(DEFAULT_EMBEDDING_MODEL)))
+    touch(session_dir)
     
     return session_dir, saved_files
 
-def parse_pdfs_to_markdown(session_dir, saved_files):
+def iter_pdf_pages(pdf_path):
+    """
+    Yield (page number, text) for each page of a PDF, one page at a time
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        for page_num in range(len(doc)):
+            page = doc.load_page(page_num)
+            yield page_num + 1, page.get_text("text", sort=True)
+    finally:
+        doc.close()
+
+def page_offsets_path(md_path):
+    """Path of the page-offset table written next to a PyMuPDF markdown file"""
+    return os.path.splitext(md_path)[0] + ".pages.json"
+
+def load_page_offsets(pages_path):
+    """
+    Load a page-offset table (see page_offsets_path)
+    Returns the character offset at which each page starts (page 1 first)
+    """
+    try:
+        with open(pages_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def page_for_offset(page_offsets, char_idx):
+    """Page number (1-based) containing a character offset, None if unknown"""
+    if not page_offsets or char_idx is None:
+        return None
+    return max(1, bisect.bisect_right(page_offsets, char_idx))
+
+def _extract_pdf_text(pdf_path, md_path):
+    """
+    Extract the text of a PDF with PyMuPDF, streaming pages to md_path
+    Writes the page-offset table next to the markdown and returns the number
+    of characters written (0 if the PDF has no text) and the time spent
+    Module-level so it can run in a worker process (CPU-bound)
+    """
+    start = time.perf_counter()
+    page_offsets = []
+    position = 0
+    has_text = False
+    tmp_path = f"{md_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for _, text in iter_pdf_pages(pdf_path):
+            page_offsets.append(position)
+            f.write(text)
+            f.write("\n\n")
+            position += len(text) + 2
+            has_text = has_text or bool(text.strip())
+    
+    if not has_text:
+        os.remove(tmp_path)
+        return 0, time.perf_counter() - start
+    
+    os.replace(tmp_path, md_path)
+    with open(page_offsets_path(md_path), 'w', encoding='utf-8') as f:
+        json.dump(page_offsets, f)
+    return position, time.perf_counter() - start
+
+def _parse_with_llama(pdf_paths):
+    """
+    Submit all PDFs to LlamaParse at once
+    Returns one markdown text (or None) per PDF, in the same order
+    """
+    with stage("llamaparse"):
+        parser = get_parser(LLAMA_PARSE_API_KEY)
+        llama_docs = parser.load_data(list(pdf_paths))
+        if len(llama_docs) == len(pdf_paths):
+            return [llama_doc.text for llama_doc in llama_docs]
+        
+        # A file failed or was split: parse them one by one to keep results aligned
+        with ThreadPoolExecutor(max_workers=len(pdf_paths)) as executor:
+            per_file = list(executor.map(lambda path: parser.load_data([path]), pdf_paths))
+        return [docs[0].text if docs else None for docs in per_file]
+
+def _parse_documents_concurrently(pdf_paths):
+    """
+    Parse documents concurrently: PyMuPDF in a process pool, LlamaParse in a single batch
+    
+    Args:
+        pdf_paths (Dict[str, str]): Document type -> PDF path
+    
+    Returns:
+        Tuple: (markdown per document type, warnings per document type,
+        document types whose LlamaParse call failed)
+        PyMuPDF markdown is streamed to the document cache, so its value is None
+    """
+    markdown = {doc_type: {} for doc_type in pdf_paths}
+    warnings = {doc_type: [] for doc_type in pdf_paths}
+    llama_failed = set()
+    doc_types = list(pdf_paths)
+    
+    with ProcessPoolExecutor(max_workers=max(1, min(PARSE_WORKERS, len(doc_types)))) as process_pool, \
+            ThreadPoolExecutor(max_workers=1) as llama_pool:
+        llama_future = llama_pool.submit(_parse_with_llama, [pdf_paths[doc_type] for doc_type in doc_types])
+        pymupdf_futures = {
+            doc_type: process_pool.submit(
+                _extract_pdf_text,
+                pdf_paths[doc_type],
+                parsed_document_path(os.path.dirname(pdf_paths[doc_type]), "pymupdf")
+            )
+            for doc_type in doc_types
+        }
+        
+        # 1. PyMuPDF (more reliable)
+        for doc_type, future in pymupdf_futures.items():
+            try:
+                char_count, elapsed = future.result()
+                record_duration("pymupdf", elapsed)
+                if char_count:
+                    markdown[doc_type]["pymupdf"] = None
+            except Exception as e:
+                warnings[doc_type].append(f"Échec PyMuPDF pour {doc_type}: {str(e)}")
+        
+        # 2. LlamaParse (optional)
+        try:
+            llama_texts = llama_future.result()
+            for doc_type, llama_text in zip(doc_types, llama_texts):
+                if llama_text is None:
+                    llama_failed.add(doc_type)
+                    warnings[doc_type].append(f"Échec LlamaParse pour {doc_type}")
+                elif llama_text.strip():
+                    markdown[doc_type]["llama"] = llama_text
+        except Exception as e:
+            llama_failed.update(doc_types)
+            for doc_type in doc_types:
+                warnings[doc_type].append(f"Échec LlamaParse pour {doc_type}: {str(e)}")
+    
+    return markdown, warnings, llama_failed
+
+def parse_pdfs_to_markdown(session_dir, saved_files, progress: Optional[ProgressReporter] = None):
     """
     Parse PDFs to markdown files with session isolation
-    Only processes files from the current upload session
+    Only processes files from the current upload session; documents
+    already parsed in a previous session are read back from the cache.
+    Documents that need parsing are parsed concurrently, and markdown is
+    written to disk incrementally instead of being accumulated in memory.
+    Documents whose LlamaParse call failed are used with their PyMuPDF text
+    but not cached as parsed, and the session is marked partial so that it
+    is parsed and indexed again on the next upload.
     """
+    progress = progress or ProgressReporter()
+    
     # Create markdown directory for this session
     md_dir = os.path.join(session_dir, "markdown")
     os.makedirs(md_dir, exist_ok=True)
     
     # Track extracted content
-    all_text = ""
     all_documents = []
     
     # Process only the files from this session
-    for doc_type, pdf_path in saved_files.items():
-        if not pdf_path or not os.path.exists(pdf_path):
-            continue
+    pdf_paths = {
+        doc_type: pdf_path for doc_type, pdf_path in saved_files.items()
+        if pdf_path and os.path.exists(pdf_path)
+    }
+    
+    # Cached PDFs live in their own directory, next to their parsed markdown
+    md_paths = {}
+    from_cache = set()
+    for doc_type, pdf_path in pdf_paths.items():
+        cached_paths = load_parsed_document(os.path.dirname(pdf_path))
+        if cached_paths is not None:
+            md_paths[doc_type] = cached_paths
+            from_cache.add(doc_type)
+    
+    # Parse the remaining documents all at once
+    to_parse = {doc_type: pdf_path for doc_type, pdf_path in pdf_paths.items() if doc_type not in from_cache}
+    warnings = {}
+    llama_failed = set()
+    if to_parse:
+        parsed, warnings, llama_failed = _parse_documents_concurrently(to_parse)
+        for doc_type, doc_markdown in parsed.items():
+            md_paths[doc_type] = {}
+            if not doc_markdown:
+                continue
+            entry_dir = os.path.dirname(to_parse[doc_type])
+            if doc_type in llama_failed:
+                # Transient LlamaParse failure: don't cache the PyMuPDF-only parse as final
+                md_paths[doc_type] = {method: parsed_document_path(entry_dir, method) for method in doc_markdown}
+            else:
+                md_paths[doc_type] = save_parsed_document(entry_dir, doc_markdown)
+    set_partial(session_dir, bool(llama_failed))
+    
+    # Report and collect documents in upload order; the combined text is
+    # written document by document without holding it in memory
+    with open(os.path.join(md_dir, "all_text.md"), 'w', encoding='utf-8') as all_text_file:
+        for doc_type in pdf_paths:
+            progress.status(f"Traitement de {doc_type}...")
+            for warning in warnings.get(doc_type, []):
+                progress.warning(warning)
             
-        file_base = os.path.basename(pdf_path)
-        st.write(f"Traitement de {doc_type}...")
-        
-        # 1. Extract with PyMuPDF (more reliable)
-        try:
-            doc = fitz.open(pdf_path)
-            text_content = ""
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text = page.get_text("text", sort=True)
-                text_content += text + "\n\n"
-            doc.close()
+            doc_md_paths = md_paths.get(doc_type, {})
+            cache_label = " (cache)" if doc_type in from_cache else ""
             
-            if text_content.strip():
-                md_path = os.path.join(md_dir, f"{doc_type}_pymupdf.md")
-                with open(md_path, 'w', encoding='utf-8') as f:
-                    f.write(text_content)
+            if "pymupdf" in doc_md_paths:
+                md_path = doc_md_paths["pymupdf"]
+                all_text_file.write(f"\n\n### DOCUMENT {doc_type} ###\n\n")
+                with open(md_path, 'r', encoding='utf-8') as f:
+                    shutil.copyfileobj(f, all_text_file)
+                    f.seek(0)
+                    text_content = f.read()
                 
-                all_text += f"\n\n### DOCUMENT {doc_type} ###\n\n" + text_content
-                doc_obj = Document(text=text_content, metadata={"type": doc_type})
+                # The page-offset table path lets later stages map chunks to pages
+                doc_obj = Document(
+                    text=text_content,
+                    metadata={"type": doc_type, "pages_path": page_offsets_path(md_path)},
+                    excluded_embed_metadata_keys=["pages_path"],
+                    excluded_llm_metadata_keys=["pages_path"]
+                )
                 all_documents.append(doc_obj)
-                st.write(f"✓ Extraction PyMuPDF: {len(text_content)} caractères")
-        except Exception as e:
-            st.warning(f"Échec PyMuPDF pour {doc_type}: {str(e)}")
-        
-        # 2. Try LlamaParse if enabled (optional)
-        try:
-            parser = LlamaParse(api_key=LLAMA_PARSE_API_KEY, result_type="markdown")
-            llama_docs = parser.load_data([pdf_path])
+                progress.status(f"✓ Extraction PyMuPDF{cache_label}: {len(text_content)} caractères")
             
-            if llama_docs and llama_docs[0].text.strip():
-                llama_text = llama_docs[0].text
-                md_path = os.path.join(md_dir, f"{doc_type}_llama.md")
-                with open(md_path, 'w', encoding='utf-8') as f:
-                    f.write(llama_text)
-                
+            if "llama" in doc_md_paths:
+                with open(doc_md_paths["llama"], 'r', encoding='utf-8') as f:
+                    llama_text = f.read()
                 doc_obj = Document(text=llama_text, metadata={"type": doc_type, "method": "llama"})
                 all_documents.append(doc_obj)
-                st.write(f"✓ Extraction LlamaParse: {len(llama_text)} caractères")
-        except Exception as e:
-            st.warning(f"Échec LlamaParse pour {doc_type}: {str(e)}")
-    
-    # Fallback if no documents were processed
-    if not all_documents and all_text.strip():
-        doc_obj = Document(text=all_text, metadata={"source": "combined_text"})
-        all_documents.append(doc_obj)
+                progress.status(f"✓ Extraction LlamaParse{cache_label}: {len(llama_text)} caractères")
     
     # Check if we have any usable documents
     if not all_documents:
-        st.error("Échec d'extraction sur tous les documents")
+        progress.error("Échec d'extraction sur tous les documents")
         return None, None
     
-    # Save the combined text
-    with open(os.path.join(md_dir, "all_text.md"), 'w', encoding='utf-8') as f:
-        f.write(all_text)
-    
     return md_dir, all_documents
 
-def extract_field_information(uploaded_files: Dict) -> Dict[str, str]:
+def _annotate_pages(nodes):
     """
-    Extract information from uploaded files with session isolation
+    Add the page number to chunks coming from PyMuPDF documents,
+    using the page-offset table of their source markdown
     """
+    offsets_by_path = {}
+    for node in nodes:
+        pages_path = node.metadata.get("pages_path")
+        if not pages_path:
+            continue
+        if pages_path not in offsets_by_path:
+            offsets_by_path[pages_path] = load_page_offsets(pages_path)
+        page = page_for_offset(offsets_by_path[pages_path], node.start_char_idx)
+        if page is not None:
+            node.metadata["page"] = page
+    return nodes
+
+def _build_context_source(index, retrieval_only: bool = RETRIEVAL_ONLY):
+    """
+    Build the retriever (or query engine) once; it is shared by all field workers
+    """
+    if retrieval_only:
+        return index.as_retriever(similarity_top_k=FIELD_TOP_K)
+    return index.as_query_engine(similarity_top_k=FIELD_TOP_K)
+
+def _extract_single_field(client, context_source, field, prompt):
+    """
+    Extract one field: retrieve its context, then ask OpenAI for the answer.
+    context_source is either a retriever (raw chunks) or a query engine (synthesized answer).
+    The context is packed within the token budget of the model.
+    Runs in a worker thread, so it must not touch Streamlit elements.
+    """
+    budget = get_context_budget(DEFAULT_MODEL)
+    with stage("retrieval"):
+        if isinstance(context_source, MmapRetriever):
+            # Raw top-k chunks, no synthesis call; best scored first, the field's section boosted
+            retriever = context_source.with_section(FIELD_SECTIONS.get(field))
+            context = pack_context(retriever.retrieve(prompt), budget, model=DEFAULT_MODEL)
+        else:
+            response = context_source.query(prompt)
+            context = truncate_to_tokens(response.response if hasattr(response, 'response') else str(response), budget,
+                                         DEFAULT_MODEL)
+    
+    # Extract with OpenAI (through the response cache)
+    answer = cached_chat_completion(
+        client,
+        model=DEFAULT_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_TEMPLATE},
+            {"role": "user", "content": f"Information à extraire: {field}\n\nContexte:\n\n{context}\n\nInstructions: {prompt}"}
+        ],
+        temperature=0.2
+    )
+    
+    return answer.strip()
+
+def _join_list_value(value):
+    """Accept list answers (e.g. documents of the DAO) by joining them into text"""
+    if isinstance(value, list):
+        return "\n".join(f"- {item}" for item in value)
+    return value
+
+# Each field must be a non-empty string; aliases keep the original field names
+FieldValue = Annotated[str, BeforeValidator(_join_list_value), StringConstraints(strip_whitespace=True, min_length=1)]
+TenderFields = create_model(
+    "TenderFields",
+    **{f"field_{i}": (FieldValue, Field(alias=field)) for i, field in enumerate(prompts)}
+)
+
+def _validate_structured_reply(reply: str, fields: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Validate a JSON reply against the TenderFields schema
+    Returns the valid fields (among the requested ones) and the list of fields that must be re-asked
+    """
+    try:
+        data = json.loads(reply)
+    except (TypeError, json.JSONDecodeError):
+        return {}, list(fields)
+    if not isinstance(data, dict):
+        return {}, list(fields)
+    
+    try:
+        TenderFields.model_validate(data)
+        failed = set()
+    except ValidationError as e:
+        failed = {error["loc"][0] for error in e.errors() if error["loc"]}
+    
+    valid = {}
+    for field in fields:
+        if field in failed or field not in data:
+            continue
+        value = _join_list_value(data[field]).strip()
+        if value:
+            valid[field] = value
+    return valid, [field for field in fields if field not in valid]
+
+def _extract_all_fields_structured(client, index, fields: List[str]):
+    """
+    Extract the given fields with a single LLM call returning one JSON object
+    The context merges the top chunks retrieved for each field prompt,
+    rank by rank so that each field gets its best chunk within the budget
+    """
+    retriever = index.as_retriever(similarity_top_k=STRUCTURED_TOP_K)
+    
+    retrieved = []
+    for field in fields:
+        with stage("retrieval"):
+            retrieved.append(retriever.with_section(FIELD_SECTIONS.get(field)).retrieve(prompts[field]))
+    # Duplicates across fields are dropped by the packer
+    context = pack_context(
+        interleave_by_rank(retrieved),
+        get_context_budget(DEFAULT_MODEL) * STRUCTURED_BUDGET_FACTOR,
+        rank_by_score=False,
+        model=DEFAULT_MODEL
+    )
+    
+    fields_description = "\n".join(f'- "{field}": {prompts[field]}' for field in fields)
+    reply = cached_chat_completion(
+        client,
+        model=DEFAULT_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_TEMPLATE + "\n        Réponds avec un unique objet JSON dont les clés sont exactement les noms des informations demandées."},
+            {"role": "user", "content": f"Informations à extraire:\n{fields_description}\n\nContexte:\n\n{context}"}
+        ],
+        temperature=0.2,
+        response_format={"type": "json_object"}
+    )
+    
+    return _validate_structured_reply(reply, fields)
+
+def run_extraction(uploaded_files: Dict, progress: Optional[ProgressReporter] = None,
+                   max_concurrency: int = MAX_CONCURRENT_FIELDS,
+                   mode: str = EXTRACTION_MODE,
+                   done_fields: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, str], Optional[Dict[str, str]]]:
+    """
+    Extract information from tender documents, independently of any UI
+    Fields are extracted concurrently, at most max_concurrency at a time.
+    In "structured" mode, all fields are asked in one call and only the
+    fields failing validation are re-asked individually.
+    
+    Args:
+        uploaded_files (Dict): Document type -> upload object (with read()) or PDF path
+        progress (Optional[ProgressReporter]): Receives status messages and progress
+        max_concurrency (int): Maximum number of fields extracted at the same time
+        mode (str): "per_field" or "structured"
+        done_fields (Optional[Dict[str, str]]): Fields already extracted (resumed job), not asked again
+    
+    Returns:
+        Tuple[Dict[str, str], Optional[Dict[str, str]]]: Results by field (or an "Error" entry)
+        and the session paths (session_dir, md_dir, index_path), None on error
+    """
+    progress = progress or ProgressReporter()
+    
     # Verify OpenAI API is working
-    if not simple_openai_check():
-        return {"Error": "Erreur de connexion à l'API OpenAI"}
+    if not simple_openai_check(progress):
+        return {"Error": "Erreur de connexion à l'API OpenAI"}, None
     
-    results = {}
     try:
         # Process uploaded files to session directory
-        with st.spinner("Traitement des fichiers téléversés..."):
+        with progress.step("Traitement des fichiers téléversés..."):
             session_dir, saved_files = process_uploaded_files(uploaded_files)
             
             # Check if we have any files
             if not saved_files:
-                return {"Error": "Aucun fichier valide n'a été téléversé"}
+                return {"Error": "Aucun fichier valide n'a été téléversé"}, None
             
             # Show which files were processed
-            st.write("Fichiers traités:", list(saved_files.keys()))
+            progress.status(f"Fichiers traités: {list(saved_files.keys())}")
         
-        # Parse PDFs to markdown
-        with st.spinner("Extraction du texte des PDFs..."):
-            md_dir, documents = parse_pdfs_to_markdown(session_dir, saved_files)
-            if not documents:
-                return {"Error": "Échec de l'analyse des PDFs"}
+        # Embeddings go through the local store shared across sessions
+        configure_embeddings()
         
-        # Load the combined text
+        md_dir = os.path.join(session_dir, "markdown")
+        index_storage_path = os.path.join(session_dir, "index")
         all_text_path = os.path.join(md_dir, "all_text.md")
-        all_text = ""
-        if os.path.exists(all_text_path):
-            with open(all_text_path, 'r', encoding='utf-8') as f:
-                all_text = f.read()
         
-        # Create vector index
-        with st.spinner("Création de l'index pour recherche..."):
-            node_parser = SentenceSplitter(chunk_size=2048)
-            index = VectorStoreIndex.from_documents(
-                documents, 
-                transformations=[node_parser]
-            )
+        index = None
+        if has_index(index_storage_path) and os.path.exists(all_text_path) and not is_partial(session_dir):
+            # Same documents already processed: skip parsing and embedding
+            with progress.step("Chargement de l'index depuis le cache..."):
+                try:
+                    with stage("index_load"):
+                        index = get_index_registry().get_index(index_storage_path)
+                    progress.status("✓ Documents déjà traités, index chargé depuis le cache")
+                except IncompatibleIndexError as e:
+                    # Built with another embedding model: rebuilt below
+                    progress.warning(f"Index en cache incompatible, reconstruction: {e}")
+        
+        if index is None:
+            # Parse PDFs to markdown
+            with progress.step("Extraction du texte des PDFs..."):
+                md_dir, documents = parse_pdfs_to_markdown(session_dir, saved_files, progress)
+                if not documents:
+                    return {"Error": "Échec de l'analyse des PDFs"}, None
+            
+            # Create vector index
+            with progress.step("Création de l'index pour recherche..."):
+                with stage("chunking"):
+                    # Chunks follow the article/chapter structure of the RC and CPS
+                    node_parser = SectionNodeParser()
+                    nodes = _annotate_pages(node_parser.get_nodes_from_documents(documents))
+                    
+                    # PyMuPDF and LlamaParse variants of the same passage are embedded only once
+                    unique_nodes = deduplicate_nodes(nodes)
+                progress.status(f"✓ Déduplication: {len(nodes) - len(unique_nodes)} passages en double supprimés")
+                with stage("embedding"):
+                    index = MmapVectorIndex.build(unique_nodes)
+            
+            # Persist the index in the cache right away so it is reused even if extraction fails
+            index.persist(index_storage_path)
+            record_write(session_dir)
+            # Chatbot answers computed from the previous index are stale
+            get_answer_cache().invalidate(index_storage_path)
         
         # Initialize OpenAI client
-        client = OpenAI(api_key=OPENAI_KEY)
+        client = get_chat_client(OPENAI_KEY)
         
-        # Progress bar for extraction
-        progress_bar = st.progress(0)
+        # Retriever (or query engine) built once and shared by all fields
+        context_source = _build_context_source(index)
         
-        # System prompt
-        system_template = """
-        Tu es un expert en extraction d'informations des appels d'offres marocains.
-        Examine attentivement le contexte fourni pour trouver l'information demandée.
+        progress.progress(0)
         
-        Règles:
-        1. Réponds UNIQUEMENT par l'information demandée, sans phrases introductives
-        2. Si l'information n'est pas explicitement mentionnée, réponds "Non spécifié"
-        3. Pour le "Maître d'Ouvrage", si le document concerne la "Délégation Interministérielle aux Droits de l'Homme", c'est probablement le maître d'ouvrage
-        4. Ne confonds jamais les noms de fichiers ou les en-têtes de document avec le contenu réel
-        """
+        field_results = {field: value for field, value in (done_fields or {}).items() if field in prompts}
         
-        # Process each field
-        for i, (field, prompt) in enumerate(prompts.items()):
-            # Update progress
-            progress_bar.progress((i + 1) / len(prompts))
-            
-            # Query the vector index
-            query_engine = index.as_query_engine(similarity_top_k=5)
-            response = query_engine.query(prompt)
-            context = response.response if hasattr(response, 'response') else str(response)
-            
-            # Add complete text for better context (if needed)
-            if all_text:
-                context += f"\n\nTEXTE COMPLET:\n{all_text[:5000]}"
-            
-            # Extract with OpenAI
-            chat_response = client.chat.completions.create(
-                model=DEFAULT_MODEL,
-                messages=[
-                    {"role": "system", "content": system_template},
-                    {"role": "user", "content": f"Information à extraire: {field}\n\nContexte:\n\n{context}\n\nInstructions: {prompt}"}
-                ],
-                temperature=0.2
-            )
-            
-            # Store result
-            results[field] = chat_response.choices[0].message.content.strip()
+        # Regular fields are first extracted with rules over the parsed markdown
+        if RULE_FAST_PATH and os.path.exists(all_text_path):
+            with stage("rules"):
+                with open(all_text_path, 'r', encoding='utf-8') as f:
+                    rule_results = confident_fields(f.read())
+            for field, value in rule_results.items():
+                if field in prompts and field not in field_results:
+                    field_results[field] = value
+                    progress.field_done(field, value)
+            progress.status(f"✓ Règles: {len(rule_results)} champs extraits sans appel LLM")
+        pending_fields = [field for field in prompts if field not in field_results]
         
-        # Complete progress
-        progress_bar.progress(1.0)
+        # Structured mode: one call for the remaining fields, then re-ask the invalid ones
+        if mode == "structured" and pending_fields and not done_fields:
+            structured_results, pending_fields = _extract_all_fields_structured(client, index, pending_fields)
+            for field, value in structured_results.items():
+                field_results[field] = value
+                progress.field_done(field, value)
+        progress.progress(len(field_results) / len(prompts))
         
-        # Store index and paths in session state
-        index_storage_path = os.path.join(session_dir, "index")
-        os.makedirs(index_storage_path, exist_ok=True)
-        index.storage_context.persist(persist_dir=index_storage_path)
+        # Run remaining fields concurrently; progress is reported from this thread
+        # because Streamlit elements can't be updated from worker threads
+        if pending_fields:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(pending_fields)))) as executor:
+                futures = {
+                    executor.submit(_extract_single_field, client, context_source, field, prompts[field]): field
+                    for field in pending_fields
+                }
+                try:
+                    for future in as_completed(futures):
+                        field = futures[future]
+                        field_results[field] = future.result()
+                        progress.field_done(field, field_results[field])
+                        progress.progress(len(field_results) / len(prompts))
+                except Exception:
+                    # Don't start the remaining fields if one of them failed
+                    for future in futures:
+                        future.cancel()
+                    raise
         
-        st.session_state.session_dir = session_dir
-        st.session_state.md_dir = md_dir
-        st.session_state.index_path = index_storage_path
+        # Keep the results in the same order as the prompts
+        results = {field: field_results[field] for field in prompts}
         
-        return results
-    
-    except Exception as e:
-        st.error(f"Erreur: {e}")
-        return {"Error": f"Erreur d'extraction: {str(e)}"}
-
-def clear_old_sessions(max_age_hours=24):
-    """
-    Clean up old session directories to free up space
-    Only keeps sessions from the last 24 hours
-    """
-    try:
-        base_dir = "data"
-        if not os.path.exists(base_dir):
-            return
-            
-        current_time = time.time()
-        max_age_seconds = max_age_hours * 3600
+        # Complete progress
+        progress.progress(1.0)
+        logger.info("LLM response cache: %s", get_llm_cache().stats())
         
-        for item in os.listdir(base_dir):
-            if item.startswith("session_"):
-                path = os.path.join(base_dir, item)
-                if os.path.isdir(path):
-                    # Get directory creation time
-                    try:
-                        dir_time = int(item.split("_")[1])
-                        age = current_time - dir_time
-                        
-                        # Remove if older than max age
-                        if age > max_age_seconds:
-                            shutil.rmtree(path)
-                    except (IndexError, ValueError):
-                        # Can't parse timestamp from directory name
-                        pass
+        paths = {"session_dir": session_dir, "md_dir": md_dir, "index_path": index_storage_path}
+        return results, paths
+    
     except Exception as e:
-        # Don't fail if cleanup has issues
-        pass
+        progress.error(f"Erreur: {e}")
+        return {"Error": f"Erreur d'extraction: {str(e)}"}, None
 
 def map_extraction_to_database(extraction_results):
     """
     Map extraction results to database format for direct saving
     """
-    from datetime import datetime, date
-    
-    # Helper function to parse dates
-    def parse_date(date_string):
-        if not date_string or date_string == "Non spécifié":
-            return None
-        try:
-            # Try different date formats
-            for fmt in ["%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d"]:
-                try:
-                    return datetime.strptime(date_string, fmt).date()
-                except ValueError:
-                    continue
-            return None
-        except:
-            return None
-    
-    # Helper function to parse monetary amounts
-    def parse_amount(amount_string):
-        if not amount_string or amount_string == "Non spécifié":
-            return None
-        try:
-            # If already a number, return it
-            if isinstance(amount_string, (int, float)):
-                return int(amount_string)
-            
-            # Remove common text and extract numbers
-            import re
-            # Extract all sequences of digits, spaces, commas, and dots
-            numbers = re.findall(r'[\d\s,\.]+', str(amount_string))
-            if numbers:
-                # Find the largest number (usually the actual amount)
-                largest_num = 0
-                for num_str in numbers:
-                    try:
-                        # Clean the number string
-                        cleaned = num_str.replace(" ", "").replace(",", "")
-                        # Handle decimal points - take only the integer part
-                        if "." in cleaned:
-                            cleaned = cleaned.split(".")[0]
-                        
-                        if cleaned and cleaned.isdigit():
-                            num = int(cleaned)
-                            if num > largest_num:
-                                largest_num = num
-                    except:
-                        continue
-                
-                if largest_num > 0:
-                    return largest_num
-            
-            return None
-        except:
-            return None
+    # Amounts are stored as whole dirhams
+    def parse_amount_int(amount_string):
+        amount = parse_amount(amount_string)
+        return int(amount) if amount else None
     
     # Extract variables to avoid f-string backslash issues
     reference = extraction_results.get("Référence", "")
@@ -398,8 +730,8 @@ def map_extraction_to_database(extraction_results):
         "Objet de l'appel d'offre": extraction_results.get("Objet", ""),
         "Organisme émetteur": maitre_ouvrage,
         "Date de publication": parse_date(extraction_results.get("Date")),
-        "Montant estimé (MAD)": parse_amount(extraction_results.get("Estimation des coûts")),
-        "Caution demandée (MAD)": parse_amount(extraction_results.get("Montant de la caution")),
+        "Montant estimé (MAD)": parse_amount_int(extraction_results.get("Estimation des coûts")),
+        "Caution demandée (MAD)": parse_amount_int(extraction_results.get("Montant de la caution")),
         
         # Company decision fields - set to None (to be filled in gestion page)
         "GO / NO GO": None,
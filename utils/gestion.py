@@ -6,6 +6,8 @@ import os
 from supabase import create_client
 from dotenv import load_dotenv
 
+from utils.normalization import parse_date, parse_date_series
+
 # Load environment variables
 load_dotenv()
 
@@ -93,12 +95,10 @@ def calculate_derived_fields(date_publication, date_soumission, date_decision,
     try:
         # Calculate processing time in days
         if date_publication and date_soumission:
-            if isinstance(date_publication, str):
-                date_publication = datetime.strptime(date_publication, "%Y-%m-%d").date()
-            if isinstance(date_soumission, str):
-                date_soumission = datetime.strptime(date_soumission, "%Y-%m-%d").date()
+            date_publication = parse_date(date_publication)
+            date_soumission = parse_date(date_soumission)
             
-            if date_soumission > date_publication:
+            if date_publication and date_soumission and date_soumission > date_publication:
                 derived["temps_traitement"] = (date_soumission - date_publication).days
         
         # Calculate amount difference percentage
@@ -414,7 +414,7 @@ def export_to_excel(data_list):
         date_columns = ["date_publication", "date_soumission", "date_decision"]
         for col in date_columns:
             if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
+                df[col] = parse_date_series(df[col])
         
         # Format currency columns
         currency_columns = ["montant_estime", "montant_offert", "caution"]
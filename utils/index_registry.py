@@ -0,0 +1,157 @@
+"""
+Process-wide registry of loaded vector indices.
+
+Streamlit reruns the page script on every interaction, so the chatbot used to
+reload the tender index on every message. Loaded indices (and the retrievers
+built on them) are kept here, keyed by index directory and modification time
+of the persisted files, and shared by every session of the process. Least
+recently used indices are dropped beyond a count and memory cap.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from llama_index.core import Settings
+
+from utils.mmap_index import EMBEDDINGS_FILE, NODES_FILE, MmapVectorIndex
+
+# Constants
+MAX_LOADED_INDICES = 8
+MAX_LOADED_BYTES = 512 * 1024 * 1024  # Estimated memory of the loaded indices (512MB)
+
+def index_version(index_dir: str) -> Tuple[str, float]:
+    """
+    Key of a persisted index: its directory and the modification time of its files.
+
+    Args:
+        index_dir (str): Index directory
+
+    Returns:
+        Tuple[str, float]: Normalized path and modification time (changes when the index is rebuilt)
+    """
+    path = os.path.abspath(index_dir)
+    mtime = max(os.path.getmtime(os.path.join(path, name)) for name in (NODES_FILE, EMBEDDINGS_FILE))
+    return path, mtime
+
+def estimate_index_bytes(index: MmapVectorIndex) -> int:
+    """
+    Approximate memory used by a loaded index.
+    Mapped embeddings are counted at their full size: searching touches every page.
+
+    Args:
+        index (MmapVectorIndex): Index
+
+    Returns:
+        int: Bytes
+    """
+    text_bytes = sum(len(record["text"]) for record in index.records)
+    bm25 = index.bm25
+    bm25_bytes = bm25.indptr.nbytes + bm25.doc_ids.nbytes + bm25.weights.nbytes if bm25 is not None else 0
+    return index.embeddings.nbytes + text_bytes + bm25_bytes
+
+class IndexRegistry:
+    """
+    LRU cache of loaded indices and of the objects built on them.
+    Safe to share between threads.
+    """
+
+    def __init__(self, max_indices: int = MAX_LOADED_INDICES, max_bytes: int = MAX_LOADED_BYTES):
+        """
+        Initialize the registry.
+
+        Args:
+            max_indices (int): Maximum number of loaded indices
+            max_bytes (int): Maximum estimated memory of the loaded indices
+        """
+        self.max_indices = max_indices
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, float], Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+
+    def _evict(self) -> None:
+        """Drop least recently used indices beyond the caps (the most recent one is always kept)"""
+        while len(self._entries) > 1 and (len(self._entries) > self.max_indices or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry["bytes"]
+
+    def _entry(self, index_dir: str) -> Dict[str, Any]:
+        """Registry entry of an index, loading it on first use"""
+        key = index_version(index_dir)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            # A rebuilt index replaces the previous version of the same directory
+            for old_key in [k for k in self._entries if k[0] == key[0]]:
+                self._bytes -= self._entries.pop(old_key)["bytes"]
+
+            # Queries are embedded with the global model: the index must come from the same one
+            index = MmapVectorIndex.load(index_dir, Settings.embed_model)
+            entry = {"index": index, "bytes": estimate_index_bytes(index), "engines": {}}
+            self._entries[key] = entry
+            self._bytes += entry["bytes"]
+            self._evict()
+            return entry
+
+    def get_index(self, index_dir: str) -> MmapVectorIndex:
+        """
+        Loaded index of a directory.
+
+        Args:
+            index_dir (str): Index directory
+
+        Returns:
+            MmapVectorIndex: Index
+
+        Raises:
+            IncompatibleIndexError: The index was built with another embedding model than the global one
+        """
+        return self._entry(index_dir)["index"]
+
+    def get_retriever(self, index_dir: str, similarity_top_k: int):
+        """
+        Retriever over an index, built once per (index, top-k).
+
+        Args:
+            index_dir (str): Index directory
+            similarity_top_k (int): Number of chunks returned
+
+        Returns:
+            MmapRetriever: Retriever
+        """
+        entry = self._entry(index_dir)
+        with self._lock:
+            key = ("retriever", similarity_top_k)
+            if key not in entry["engines"]:
+                entry["engines"][key] = entry["index"].as_retriever(similarity_top_k=similarity_top_k)
+            return entry["engines"][key]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Registry statistics.
+
+        Returns:
+            Dict[str, Any]: hits, misses, loaded indices and their estimated memory
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "indices": len(self._entries), "bytes": self._bytes}
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_index_registry() -> IndexRegistry:
+    """Process-wide index registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = IndexRegistry()
+        return _registry
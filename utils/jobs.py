@@ -0,0 +1,448 @@
+"""
+Local extraction job queue.
+
+Extraction jobs are stored in SQLite (no external broker) and executed by
+worker processes, outside the Streamlit script thread: the page submits a job
+and polls its status, progress messages and partial results. Workers send a
+heartbeat while they run a job; the job of a worker that died is put back in
+the queue and resumed, keeping the fields already extracted.
+
+Workers are started on demand by the extraction page, or manually:
+    python -m utils.jobs --workers 2
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+import subprocess
+import multiprocessing
+from typing import Any, Dict, List, Optional
+
+from utils.progress import ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+# Constants
+JOBS_DB_PATH = "data/jobs.db"
+HEARTBEAT_INTERVAL_SECONDS = 5
+STALE_AFTER_SECONDS = 60  # A running job without heartbeat for this long is requeued
+MAX_ATTEMPTS = 3
+POLL_INTERVAL_SECONDS = 1.0
+JOB_RETENTION_SECONDS = 7 * 24 * 3600  # Finished jobs are kept 7 days
+DEFAULT_WORKERS = 2
+AUTO_WORKER_IDLE_SECONDS = 900  # Workers started by the app stop after 15 minutes without jobs
+WORKER_SPAWN_TIMEOUT_SECONDS = 60  # Workers being started are waited for this long before starting others
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class JobQueue:
+    """
+    SQLite-backed queue of extraction jobs.
+    Each process opens its own connection; safe to share between threads.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB_PATH):
+        """
+        Initialize the job queue.
+
+        Args:
+            db_path (str): Path to SQLite database
+        """
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the job and worker tables if they don't exist."""
+        with self._lock:
+            self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT,
+                documents TEXT,
+                mode TEXT,
+                progress REAL,
+                messages TEXT,
+                partial_results TEXT,
+                results TEXT,
+                paths TEXT,
+                error TEXT,
+                attempts INTEGER,
+                worker_id TEXT,
+                created_at REAL,
+                updated_at REAL,
+                heartbeat REAL
+            )
+            ''')
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+            self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS workers (
+                worker_id TEXT PRIMARY KEY,
+                pid INTEGER,
+                heartbeat REAL
+            )
+            ''')
+            # Single row: when the app last started workers (they take a while to send a heartbeat)
+            self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS worker_spawn (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                started_at REAL
+            )
+            ''')
+            self.conn.commit()
+
+    def submit(self, documents: Dict[str, str], mode: Optional[str] = None) -> str:
+        """
+        Add an extraction job to the queue.
+
+        Args:
+            documents (Dict[str, str]): Document type -> PDF path
+            mode (Optional[str]): Extraction mode, the default one if None
+
+        Returns:
+            str: Job ID
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO jobs (id, status, documents, mode, progress, messages, partial_results, "
+                "attempts, created_at, updated_at) VALUES (?, 'queued', ?, ?, 0, '[]', '{}', 0, ?, ?)",
+                (job_id, json.dumps(documents), mode, now, now)
+            )
+            # Forget old finished jobs
+            self.conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'error') AND updated_at < ?",
+                (now - JOB_RETENTION_SECONDS,)
+            )
+            self.conn.commit()
+        return job_id
+
+    @staticmethod
+    def _row_to_job(cursor, row) -> Dict[str, Any]:
+        job = {description[0]: value for description, value in zip(cursor.description, row)}
+        for key in ("documents", "messages", "partial_results", "results", "paths"):
+            if job.get(key):
+                job[key] = json.loads(job[key])
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a job.
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            Optional[Dict[str, Any]]: Job (status, progress, messages, partial_results, results...), None if unknown
+        """
+        with self._lock:
+            cursor = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            return self._row_to_job(cursor, row) if row else None
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Take the oldest queued job.
+
+        Args:
+            worker_id (str): Worker taking the job
+
+        Returns:
+            Optional[Dict[str, Any]]: Claimed job, None if the queue is empty
+        """
+        now = time.time()
+        with self._lock:
+            # A single UPDATE is atomic: two workers can't claim the same job
+            self.conn.execute(
+                "UPDATE jobs SET status = 'running', worker_id = ?, attempts = attempts + 1, "
+                "heartbeat = ?, updated_at = ? "
+                "WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1) "
+                "AND status = 'queued'",
+                (worker_id, now, now)
+            )
+            self.conn.commit()
+            cursor = self.conn.execute(
+                "SELECT * FROM jobs WHERE status = 'running' AND worker_id = ? ORDER BY updated_at DESC LIMIT 1",
+                (worker_id,)
+            )
+            row = cursor.fetchone()
+            return self._row_to_job(cursor, row) if row else None
+
+    def heartbeat(self, job_id: str) -> None:
+        """Record that the worker of a job is still alive"""
+        with self._lock:
+            self.conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time(), job_id))
+            self.conn.commit()
+
+    def update_progress(self, job_id: str, progress: Optional[float] = None, message: Optional[str] = None,
+                        field: Optional[str] = None, value: Optional[str] = None) -> None:
+        """
+        Record the progress of a running job.
+
+        Args:
+            job_id (str): Job ID
+            progress (Optional[float]): Fraction of the fields extracted
+            message (Optional[str]): Status message to append
+            field (Optional[str]): Field just extracted
+            value (Optional[str]): Extracted value of the field
+        """
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT messages, partial_results FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            messages, partial_results = json.loads(row[0] or "[]"), json.loads(row[1] or "{}")
+            if message is not None:
+                messages.append(message)
+            if field is not None:
+                partial_results[field] = value
+
+            self.conn.execute(
+                "UPDATE jobs SET progress = COALESCE(?, progress), messages = ?, partial_results = ?, "
+                "heartbeat = ?, updated_at = ? WHERE id = ?",
+                (progress, json.dumps(messages, ensure_ascii=False), json.dumps(partial_results, ensure_ascii=False),
+                 now, now, job_id)
+            )
+            self.conn.commit()
+
+    def complete(self, job_id: str, results: Dict[str, str], paths: Optional[Dict[str, str]]) -> None:
+        """Mark a job as done with its results and session paths"""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'done', progress = 1, results = ?, paths = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(results, ensure_ascii=False), json.dumps(paths), time.time(), job_id)
+            )
+            self.conn.commit()
+
+    def fail(self, job_id: str, error: str) -> None:
+        """Mark a job as failed"""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'error', error = ?, updated_at = ? WHERE id = ?",
+                (error, time.time(), job_id)
+            )
+            self.conn.commit()
+
+    def requeue_stale(self, stale_after: float = STALE_AFTER_SECONDS) -> int:
+        """
+        Put back in the queue the running jobs whose worker stopped sending heartbeats.
+        Jobs that already failed MAX_ATTEMPTS times are marked as failed instead.
+
+        Args:
+            stale_after (float): Seconds without heartbeat after which a worker is considered dead
+
+        Returns:
+            int: Number of requeued jobs
+        """
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'error', error = 'Nombre maximal de tentatives atteint', updated_at = ? "
+                "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+                (now, now - stale_after, MAX_ATTEMPTS)
+            )
+            cursor = self.conn.execute(
+                "UPDATE jobs SET status = 'queued', worker_id = NULL, updated_at = ? "
+                "WHERE status = 'running' AND heartbeat < ?",
+                (now, now - stale_after)
+            )
+            self.conn.commit()
+            return cursor.rowcount
+
+    def worker_heartbeat(self, worker_id: str) -> None:
+        """Record that a worker process is alive"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO workers (worker_id, pid, heartbeat) VALUES (?, ?, ?)",
+                (worker_id, os.getpid(), time.time())
+            )
+            self.conn.commit()
+
+    def remove_worker(self, worker_id: str) -> None:
+        """Forget a worker that stopped"""
+        with self._lock:
+            self.conn.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+            self.conn.commit()
+
+    def claim_worker_spawn(self, spawn_timeout: float = WORKER_SPAWN_TIMEOUT_SECONDS,
+                           stale_after: float = STALE_AFTER_SECONDS) -> bool:
+        """
+        Decide, across sessions and processes, whether workers must be started.
+        The check and the "spawning" mark are written in one write transaction, so a single
+        caller wins; the mark expires after spawn_timeout if the workers never came up.
+
+        Args:
+            spawn_timeout (float): Seconds to wait for workers being started
+            stale_after (float): Seconds without heartbeat after which a worker is dead
+
+        Returns:
+            bool: True if the caller must start the workers
+        """
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                alive = self.conn.execute(
+                    "SELECT COUNT(*) FROM workers WHERE heartbeat >= ?", (now - stale_after,)
+                ).fetchone()[0]
+                spawning = self.conn.execute(
+                    "SELECT COUNT(*) FROM worker_spawn WHERE started_at >= ?", (now - spawn_timeout,)
+                ).fetchone()[0]
+                claimed = not alive and not spawning
+                if claimed:
+                    self.conn.execute("INSERT OR REPLACE INTO worker_spawn (id, started_at) VALUES (0, ?)", (now,))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            return claimed
+
+    def __del__(self):
+        """Close database connection on object destruction."""
+        if hasattr(self, 'conn') and self.conn:
+            self.conn.close()
+
+class JobProgress(ProgressReporter):
+    """Reports the progress of a running job to the queue"""
+
+    def __init__(self, queue: JobQueue, job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+
+    def status(self, message: str) -> None:
+        self.queue.update_progress(self.job_id, message=message)
+
+    def warning(self, message: str) -> None:
+        self.queue.update_progress(self.job_id, message=f"⚠️ {message}")
+
+    def error(self, message: str) -> None:
+        self.queue.update_progress(self.job_id, message=f"❌ {message}")
+
+    def progress(self, fraction: float) -> None:
+        self.queue.update_progress(self.job_id, progress=fraction)
+
+    def field_done(self, field: str, value: str) -> None:
+        self.queue.update_progress(self.job_id, field=field, value=value)
+
+def _run_job(queue: JobQueue, job: Dict[str, Any], worker_id: str) -> None:
+    """Run one claimed job, sending job and worker heartbeats until it finishes"""
+    from utils.extraction import EXTRACTION_MODE, run_extraction
+
+    stop = threading.Event()
+
+    def send_heartbeats():
+        # The worker stays alive for ensure_workers however long the job runs
+        while not stop.wait(HEARTBEAT_INTERVAL_SECONDS):
+            queue.heartbeat(job["id"])
+            queue.worker_heartbeat(worker_id)
+
+    heartbeat_thread = threading.Thread(target=send_heartbeats, daemon=True)
+    heartbeat_thread.start()
+    try:
+        if job["partial_results"]:
+            queue.update_progress(job["id"], message=f"Reprise du traitement ({len(job['partial_results'])} champs déjà extraits)")
+        results, paths = run_extraction(
+            job["documents"],
+            JobProgress(queue, job["id"]),
+            mode=job["mode"] or EXTRACTION_MODE,
+            done_fields=job["partial_results"]
+        )
+        if "Error" in results:
+            queue.fail(job["id"], results["Error"])
+        else:
+            queue.complete(job["id"], results, paths)
+    except Exception as e:
+        logger.exception("Job %s failed", job["id"])
+        queue.fail(job["id"], f"Erreur d'extraction: {e}")
+    finally:
+        stop.set()
+        heartbeat_thread.join()
+
+def run_worker(db_path: str = JOBS_DB_PATH, idle_timeout: float = 0) -> None:
+    """
+    Process jobs until interrupted.
+
+    Args:
+        db_path (str): Path to the jobs database
+        idle_timeout (float): Stop after this many seconds without jobs (0 = never)
+    """
+    queue = JobQueue(db_path)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    logger.info("Worker %s started", worker_id)
+
+    idle_since = time.monotonic()
+    try:
+        while True:
+            queue.worker_heartbeat(worker_id)
+            queue.requeue_stale()
+
+            job = queue.claim(worker_id)
+            if job is None:
+                if idle_timeout and time.monotonic() - idle_since > idle_timeout:
+                    break
+                time.sleep(POLL_INTERVAL_SECONDS)
+                continue
+
+            logger.info("Worker %s running job %s", worker_id, job["id"])
+            _run_job(queue, job, worker_id)
+            idle_since = time.monotonic()
+    finally:
+        queue.remove_worker(worker_id)
+        logger.info("Worker %s stopped", worker_id)
+
+def start_workers(count: int = DEFAULT_WORKERS, idle_timeout: float = AUTO_WORKER_IDLE_SECONDS) -> None:
+    """
+    Start worker processes detached from the current process.
+    They run in the current directory, where the data/ paths are resolved.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+    subprocess.Popen(
+        [sys.executable, "-m", "utils.jobs", "--workers", str(count), "--idle-timeout", str(idle_timeout)],
+        cwd=os.getcwd(), env=env, start_new_session=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+def ensure_workers(queue: JobQueue, count: int = DEFAULT_WORKERS) -> None:
+    """Start workers if none is alive and no other session is already starting them"""
+    if queue.claim_worker_spawn():
+        start_workers(count)
+
+def main():
+    parser = argparse.ArgumentParser(description="Extraction job workers")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of worker processes")
+    parser.add_argument("--idle-timeout", type=float, default=0, help="Stop after this many idle seconds (0 = never)")
+    parser.add_argument("--db", default=JOBS_DB_PATH, help="Jobs database")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(processName)s %(message)s")
+
+    # Recover the jobs of workers that died before starting new ones
+    JobQueue(args.db).requeue_stale()
+
+    processes: List[multiprocessing.Process] = [
+        multiprocessing.Process(target=run_worker, args=(args.db, args.idle_timeout), name=f"worker-{i + 1}")
+        for i in range(max(1, args.workers))
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+if __name__ == "__main__":
+    main()
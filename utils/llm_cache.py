@@ -0,0 +1,281 @@
+"""
+Persistent cache for OpenAI chat-completion responses.
+
+Responses are stored in SQLite and keyed by (backend, model, temperature, system
+prompt, hash of the other messages and request options), so re-running an extraction
+or a chat question on the same documents does not pay for the call again.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.backends import get_backend
+from utils.profiling import record_duration, record_tokens, stage
+
+# Constants
+LLM_CACHE_PATH = "data/llm_cache.db"
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600  # 7 days
+LLM_CACHE_MAX_ENTRIES = 20000
+
+class LLMResponseCache:
+    """
+    SQLite-backed cache of chat-completion responses with TTL and LRU size eviction.
+    Safe to share between threads.
+    """
+
+    def __init__(self, db_path: str = LLM_CACHE_PATH, ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        """
+        Initialize the response cache.
+
+        Args:
+            db_path (str): Path to SQLite database
+            ttl_seconds (int): Lifetime of an entry (0 disables expiry)
+            max_entries (int): Maximum number of entries kept
+        """
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the cache table if it doesn't exist."""
+        with self._lock:
+            self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT,
+                temperature REAL,
+                system_hash TEXT,
+                messages_hash TEXT,
+                response TEXT,
+                created_at REAL,
+                last_access REAL
+            )
+            ''')
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses(last_access)")
+            self.conn.commit()
+
+    @staticmethod
+    def _hash(value: Any) -> str:
+        """Stable SHA-256 of a JSON-serializable value"""
+        return hashlib.sha256(json.dumps(value, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def make_key(self, model: str, temperature: Optional[float], messages: List[Dict[str, str]],
+                 options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Build the cache key of a request.
+
+        Args:
+            model (str): OpenAI model
+            temperature (Optional[float]): Sampling temperature
+            messages (List[Dict[str, str]]): Chat messages
+            options (Optional[Dict[str, Any]]): Other request options (e.g. response_format)
+
+        Returns:
+            Dict[str, Any]: Key parts, including the combined cache_key
+        """
+        system_prompt = "\n".join(m["content"] for m in messages if m.get("role") == "system")
+        other_messages = [m for m in messages if m.get("role") != "system"]
+        key = {
+            # Answers of the offline backend must never be served as real answers
+            "backend": get_backend(),
+            "model": model,
+            "temperature": temperature,
+            "system_hash": self._hash(system_prompt),
+            "messages_hash": self._hash({"messages": other_messages, "options": options or {}}),
+        }
+        key["cache_key"] = self._hash(key)
+        return key
+
+    def get(self, key: Dict[str, Any]) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key (Dict[str, Any]): Key returned by make_key
+
+        Returns:
+            Optional[str]: Cached response content, None on miss
+        """
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE cache_key = ?",
+                (key["cache_key"],)
+            ).fetchone()
+
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                self.misses += 1
+                return None
+
+            self.conn.execute("UPDATE llm_responses SET last_access = ? WHERE cache_key = ?", (now, key["cache_key"]))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: Dict[str, Any], response: str) -> None:
+        """
+        Store a response and evict expired / least recently used entries.
+
+        Args:
+            key (Dict[str, Any]): Key returned by make_key
+            response (str): Response content
+        """
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_responses "
+                "(cache_key, model, temperature, system_hash, messages_hash, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key["cache_key"], key["model"], key["temperature"], key["system_hash"],
+                 key["messages_hash"], response, now, now)
+            )
+
+            if self.ttl_seconds:
+                self.conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl_seconds,))
+
+            count = self.conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+            if count > self.max_entries:
+                self.conn.execute(
+                    "DELETE FROM llm_responses WHERE cache_key IN "
+                    "(SELECT cache_key FROM llm_responses ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self.conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters of this process.
+
+        Returns:
+            Dict[str, Any]: hits, misses, hit_rate and number of stored entries
+        """
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+    def clear(self) -> None:
+        """Remove every cached response."""
+        with self._lock:
+            self.conn.execute("DELETE FROM llm_responses")
+            self.conn.commit()
+
+    def __del__(self):
+        """Close database connection on object destruction."""
+        if hasattr(self, 'conn') and self.conn:
+            self.conn.close()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMResponseCache:
+    """Process-wide response cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache()
+        return _cache
+
+def cached_chat_completion(client, model: str, messages: List[Dict[str, str]],
+                           temperature: Optional[float] = None, **kwargs) -> str:
+    """
+    Chat completion going through the response cache.
+
+    Args:
+        client: OpenAI client
+        model (str): OpenAI model
+        messages (List[Dict[str, str]]): Chat messages
+        temperature (Optional[float]): Sampling temperature
+        **kwargs: Other options passed to chat.completions.create
+
+    Returns:
+        str: Content of the assistant message
+    """
+    cache = get_llm_cache()
+    key = cache.make_key(model, temperature, messages, kwargs)
+
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    with stage("llm"):
+        chat_response = client.chat.completions.create(model=model, messages=messages, **kwargs)
+    record_tokens(getattr(chat_response, "usage", None))
+    content = chat_response.choices[0].message.content or ""
+
+    if content:
+        cache.set(key, content)
+    return content
+
+def stream_chat_completion(client, model: str, messages: List[Dict[str, str]],
+                           temperature: Optional[float] = None, **kwargs) -> Iterator[str]:
+    """
+    Streamed chat completion going through the response cache.
+    A cached answer is yielded at once; otherwise the pieces of the answer are yielded
+    as they arrive and the full answer is cached when the stream completes.
+    Closing the generator early (e.g. the user sent a new message) closes the stream.
+
+    Args:
+        client: OpenAI client
+        model (str): OpenAI model
+        messages (List[Dict[str, str]]): Chat messages
+        temperature (Optional[float]): Sampling temperature
+        **kwargs: Other options passed to chat.completions.create
+
+    Yields:
+        str: Pieces of the content of the assistant message
+    """
+    cache = get_llm_cache()
+    key = cache.make_key(model, temperature, messages, kwargs)
+
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    start = time.perf_counter()
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+    pieces = []
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            piece = chunk.choices[0].delta.content
+            if piece:
+                if not pieces:
+                    record_duration("llm_first_token", time.perf_counter() - start)
+                pieces.append(piece)
+                yield piece
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+    record_duration("llm", time.perf_counter() - start)
+
+    # Only complete answers are cached
+    content = "".join(pieces)
+    if content:
+        cache.set(key, content)
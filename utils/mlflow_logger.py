@@ -165,10 +165,10 @@ def tracked_openai_chat_completion(messages, model=DEFAULT_MODEL, run_id=None):
         Dict: OpenAI response
     """
     try:
-        from openai import OpenAI
+        from utils.backends import get_chat_client
         
         # Initialize client
-        client = OpenAI()
+        client = get_chat_client()
         
         # Make API call
         response = client.chat.completions.create(
@@ -0,0 +1,332 @@
+"""
+Binary, memory-mapped persistence of vector indices.
+
+An index directory holds the chunk embeddings as one contiguous matrix
+(embeddings.npy, float32 or float16, L2-normalized rows) opened with np.memmap,
+and the chunk texts and metadata in a compact JSON side file (nodes.json).
+Loading only reads the side file and maps the matrix; similarity search is a
+matrix-vector product over the mapped rows, and chunk objects are only built
+for the hits. A BM25 keyword index (utils/bm25.py) is built and persisted in the
+same directory; retrievers fuse both rankings by default. A retriever may also be
+given the section a question is usually answered in (e.g. "caution" for the
+caution amount): the chunks of matching sections are ranked as a third list in
+the fusion, which boosts them without excluding the rest of the document.
+"""
+
+import os
+import re
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core import Settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle, TextNode
+
+from utils.bm25 import BM25Index, has_bm25_index, reciprocal_rank_fusion
+from utils.embedding_cache import embedding_dimension
+
+# Constants
+EMBEDDINGS_FILE = "embeddings.npy"
+NODES_FILE = "nodes.json"  # Written last: its presence means the index is complete
+INDEX_DTYPE = "float32"  # "float16" halves the size on disk, with a small loss of precision
+SEARCH_BLOCK_ROWS = 65536  # Rows converted to float32 at once during search
+RETRIEVAL_MODE = "hybrid"  # "hybrid" (vector + BM25, reciprocal-rank fusion) or "vector"
+HYBRID_CANDIDATES_FACTOR = 4  # Each ranking contributes top_k * factor candidates to the fusion
+FORMAT_VERSION = 1
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so that a dot product is a cosine similarity"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _keyword_text(record: Dict[str, Any]) -> str:
+    """Text indexed by BM25: the chunk with its section path, so every chunk of "Article 5 - Caution" matches"""
+    section = record["metadata"].get("section")
+    return f"{section}\n{record['text']}" if section else record["text"]
+
+def _top_scores(scores: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+    """(position, score) of the top_k highest scores, best first"""
+    top_k = min(top_k, len(scores))
+    top = np.argpartition(-scores, top_k - 1)[:top_k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [(int(i), float(scores[i])) for i in top]
+
+class IncompatibleIndexError(ValueError):
+    """A persisted index was built with another embedding model than the active one"""
+
+class EmptyIndexError(ValueError):
+    """No chunk to index (e.g. scanned PDFs without text)"""
+
+def has_mmap_index(index_dir: str) -> bool:
+    """Check whether a complete memory-mapped index exists in a directory"""
+    return os.path.exists(os.path.join(index_dir, NODES_FILE)) and os.path.exists(os.path.join(index_dir, EMBEDDINGS_FILE))
+
+def _check_embed_model(stored_name: Optional[str], dimension: int, embed_model: BaseEmbedding) -> None:
+    """Raise IncompatibleIndexError if an index can't be searched with the vectors of embed_model"""
+    model_name = getattr(embed_model, "model_name", None)
+    if stored_name and model_name and stored_name != model_name:
+        raise IncompatibleIndexError(f"Index built with {stored_name}, active embedding model is {model_name}")
+    expected = embedding_dimension(embed_model)
+    if expected and expected != dimension:
+        raise IncompatibleIndexError(f"Index vectors have {dimension} dimensions, {model_name} produces {expected}")
+
+class MmapRetriever(BaseRetriever):
+    """
+    Top-k retriever over a MmapVectorIndex: cosine similarity, fused with BM25 in hybrid mode.
+    """
+
+    def __init__(self, index: "MmapVectorIndex", similarity_top_k: int, embed_model: Optional[BaseEmbedding] = None,
+                 mode: str = RETRIEVAL_MODE, section_pattern: Optional[str] = None):
+        """
+        Args:
+            index (MmapVectorIndex): Index to search
+            similarity_top_k (int): Number of chunks returned
+            embed_model (Optional[BaseEmbedding]): Query embedding model, the global one if None
+            mode (str): "hybrid" or "vector"
+            section_pattern (Optional[str]): Regular expression of the sections to boost (see rows_in_section)
+        """
+        super().__init__()
+        self._index = index
+        self._similarity_top_k = similarity_top_k
+        self._embed_model = embed_model or Settings.embed_model
+        self._mode = mode
+        self._section_pattern = section_pattern
+
+    def with_section(self, section_pattern: Optional[str]) -> "MmapRetriever":
+        """
+        Same retriever, boosting the chunks of the sections matching a pattern.
+
+        Args:
+            section_pattern (Optional[str]): Regular expression of the section path, None for no boost
+
+        Returns:
+            MmapRetriever: Retriever
+        """
+        return MmapRetriever(self._index, self._similarity_top_k, self._embed_model, self._mode, section_pattern)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        query_embedding = query_bundle.embedding
+        if query_embedding is None:
+            query_embedding = self._embed_model.get_query_embedding(query_bundle.query_str)
+
+        candidates = self._similarity_top_k * HYBRID_CANDIDATES_FACTOR
+        rankings = []
+        if self._mode == "hybrid" and self._index.bm25 is not None:
+            rankings.append(self._index.bm25.search(query_bundle.query_str, candidates))
+        section_rows = self._index.rows_in_section(self._section_pattern) if self._section_pattern else []
+        if section_rows:
+            rankings.append(self._index.search(query_embedding, candidates, rows=section_rows))
+
+        if rankings:
+            rankings.insert(0, self._index.search(query_embedding, candidates))
+            results = reciprocal_rank_fusion(rankings, self._similarity_top_k)
+        else:
+            results = self._index.search(query_embedding, self._similarity_top_k)
+        return [NodeWithScore(node=self._index.get_node(row), score=score) for row, score in results]
+
+class MmapVectorIndex:
+    """
+    Vector index whose embeddings live in a (memory-mapped) float matrix.
+    Read-only once built; safe to share between threads.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]], embeddings: np.ndarray, embed_model_name: Optional[str] = None,
+                 bm25: Optional[BM25Index] = None):
+        """
+        Args:
+            records (List[Dict[str, Any]]): Chunk records (id, text, metadata...), one per row
+            embeddings (np.ndarray): Normalized embeddings, one row per chunk
+            embed_model_name (Optional[str]): Embedding model the vectors come from
+            bm25 (Optional[BM25Index]): Keyword index of the same chunks, built from the records if None
+        """
+        if len(records) != embeddings.shape[0]:
+            raise ValueError(f"{len(records)} chunks for {embeddings.shape[0]} embeddings")
+        self.records = records
+        self.embeddings = embeddings
+        self.embed_model_name = embed_model_name
+        self.bm25 = bm25 if bm25 is not None else BM25Index.build([_keyword_text(record) for record in records])
+        self._section_rows: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @classmethod
+    def build(cls, nodes: List[TextNode], embed_model: Optional[BaseEmbedding] = None) -> "MmapVectorIndex":
+        """
+        Embed chunks and build an in-memory index.
+
+        Args:
+            nodes (List[TextNode]): Chunks
+            embed_model (Optional[BaseEmbedding]): Embedding model, the global one if None
+
+        Returns:
+            MmapVectorIndex: Index (persist it with persist())
+
+        Raises:
+            EmptyIndexError: No chunk to index
+        """
+        if not nodes:
+            raise EmptyIndexError("Aucun texte exploitable dans les documents (PDF scanné sans texte ?)")
+        embed_model = embed_model or Settings.embed_model
+        # Same text as a llama-index VectorStoreIndex embeds (content + embed metadata)
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        embeddings = np.asarray(embed_model.get_text_embedding_batch(texts), dtype=np.float32)
+
+        records = [
+            {
+                "id": node.node_id,
+                "text": node.get_content(metadata_mode=MetadataMode.NONE),
+                "metadata": node.metadata,
+                "excluded_embed": node.excluded_embed_metadata_keys,
+                "excluded_llm": node.excluded_llm_metadata_keys,
+                "start": node.start_char_idx,
+                "end": node.end_char_idx,
+            }
+            for node in nodes
+        ]
+        return cls(records, _normalize_rows(embeddings), getattr(embed_model, "model_name", None))
+
+    def persist(self, index_dir: str, dtype: str = INDEX_DTYPE) -> None:
+        """
+        Write the index to a directory.
+
+        Args:
+            index_dir (str): Index directory
+            dtype (str): Storage type of the embeddings ("float32" or "float16")
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        embeddings_path = os.path.join(index_dir, EMBEDDINGS_FILE)
+        nodes_path = os.path.join(index_dir, NODES_FILE)
+
+        # Write to temporary files first so a concurrent reader never sees a partial index
+        tmp_embeddings = f"{embeddings_path}.{os.getpid()}.tmp"
+        tmp_nodes = f"{nodes_path}.{os.getpid()}.tmp"
+        with open(tmp_embeddings, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.embeddings, dtype=dtype))
+        with open(tmp_nodes, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": FORMAT_VERSION, "embed_model": self.embed_model_name, "nodes": self.records},
+                f, ensure_ascii=False, separators=(",", ":")
+            )
+        self.bm25.persist(index_dir)
+        os.replace(tmp_embeddings, embeddings_path)
+        os.replace(tmp_nodes, nodes_path)
+
+    @classmethod
+    def load(cls, index_dir: str, embed_model: Optional[BaseEmbedding] = None) -> "MmapVectorIndex":
+        """
+        Open a persisted index; the embeddings are memory-mapped, not read.
+
+        Args:
+            index_dir (str): Index directory
+            embed_model (Optional[BaseEmbedding]): Embedding model the index will be queried with;
+                when given, the index must have been built with the same model
+
+        Returns:
+            MmapVectorIndex: Index
+
+        Raises:
+            IncompatibleIndexError: The index was built with another model or dimension (rebuild it)
+        """
+        with open(os.path.join(index_dir, NODES_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        if embed_model is not None:
+            _check_embed_model(data.get("embed_model"), embeddings.shape[1], embed_model)
+        # Indices persisted before the keyword index existed get it rebuilt in memory
+        bm25 = BM25Index.load(index_dir) if has_bm25_index(index_dir) else None
+        return cls(data["nodes"], embeddings, data.get("embed_model"), bm25)
+
+    def get_node(self, row: int) -> TextNode:
+        """
+        Chunk stored at a row of the index.
+
+        Args:
+            row (int): Row
+
+        Returns:
+            TextNode: Chunk
+        """
+        record = self.records[row]
+        return TextNode(
+            id_=record["id"],
+            text=record["text"],
+            metadata=record["metadata"],
+            excluded_embed_metadata_keys=record["excluded_embed"],
+            excluded_llm_metadata_keys=record["excluded_llm"],
+            start_char_idx=record["start"],
+            end_char_idx=record["end"],
+        )
+
+    def rows_in_section(self, pattern: str) -> List[int]:
+        """
+        Rows of the chunks whose section path matches a pattern (e.g. r"Article 5\b", "caution").
+        Computed once per pattern.
+
+        Args:
+            pattern (str): Regular expression, case-insensitive
+
+        Returns:
+            List[int]: Rows in document order
+        """
+        rows = self._section_rows.get(pattern)
+        if rows is None:
+            section_re = re.compile(pattern, re.IGNORECASE)
+            rows = [
+                row for row, record in enumerate(self.records)
+                if section_re.search(record["metadata"].get("section") or "")
+            ]
+            self._section_rows[pattern] = rows
+        return rows
+
+    def search(self, query_embedding: List[float], top_k: int,
+               rows: Optional[Sequence[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Rows most similar to a query embedding (cosine similarity).
+
+        Args:
+            query_embedding (List[float]): Query embedding
+            top_k (int): Number of results
+            rows (Optional[Sequence[int]]): Only search these rows (e.g. the chunks of a section)
+
+        Returns:
+            List[Tuple[int, float]]: (row, score), best first
+        """
+        count = len(self.records)
+        if not count or top_k <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        if rows is not None:
+            if not len(rows):
+                return []
+            subset = np.asarray(rows, dtype=np.int64)
+            scores = np.asarray(self.embeddings[subset], dtype=np.float32) @ query
+            return [(int(subset[i]), score) for i, score in _top_scores(scores, top_k)]
+
+        if self.embeddings.dtype == np.float32:
+            scores = self.embeddings @ query
+        else:
+            # float16 rows are converted block by block (no half-precision BLAS)
+            scores = np.empty(count, dtype=np.float32)
+            for start in range(0, count, SEARCH_BLOCK_ROWS):
+                block = np.asarray(self.embeddings[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+                scores[start:start + len(block)] = block @ query
+
+        return _top_scores(scores, top_k)
+
+    def as_retriever(self, similarity_top_k: int = 2, embed_model: Optional[BaseEmbedding] = None,
+                     mode: str = RETRIEVAL_MODE, section_pattern: Optional[str] = None) -> MmapRetriever:
+        """Retriever over the index (same interface as VectorStoreIndex.as_retriever)"""
+        return MmapRetriever(self, similarity_top_k, embed_model, mode, section_pattern)
+
+    def as_query_engine(self, similarity_top_k: int = 2, mode: str = RETRIEVAL_MODE, **kwargs: Any) -> RetrieverQueryEngine:
+        """Query engine over the index (same interface as VectorStoreIndex.as_query_engine)"""
+        return RetrieverQueryEngine.from_args(retriever=self.as_retriever(similarity_top_k, mode=mode), **kwargs)
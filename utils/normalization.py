@@ -0,0 +1,190 @@
+"""
+Normalization of amounts and dates found in tender documents and forms.
+
+Amounts are written in many ways ("1 234 567,89 DH", "1.250.000,00 dirhams",
+"2,5 millions de dirhams", "1,5 MDH"); dates as 13/06/2024, 13-06-24,
+2024-06-13 or "1er juin 2024". Scalar functions handle single values (form
+fields, extraction results); the *_series functions process whole pandas
+columns, parsing each distinct value once (columns repeat the same amounts
+and dates a lot) and broadcasting the results with NumPy. Scalar texts are
+memoized for the same reason.
+"""
+
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Constants
+PARSE_CACHE_SIZE = 4096  # Distinct texts memoized by the scalar parsers
+MULTIPLIERS = {
+    "mille": 1e3,
+    "k": 1e3,
+    "million": 1e6,
+    "m": 1e6,
+    "milliard": 1e9,
+    "md": 1e9,
+}
+FRENCH_MONTHS = {
+    "janvier": 1, "février": 2, "fevrier": 2, "mars": 3, "avril": 4, "mai": 5, "juin": 6,
+    "juillet": 7, "août": 8, "aout": 8, "septembre": 9, "octobre": 10, "novembre": 11,
+    "décembre": 12, "decembre": 12,
+}
+
+# A number with optional thousands groups and decimals, then an optional multiplier word
+AMOUNT_RE = re.compile(
+    r"(?P<number>\d{1,3}(?:[ \u00a0\u202f.,]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?)"
+    r"(?:\s*(?:de\s+)?(?P<multiplier>milliards?\b|millions?\b|mille\b|mds?\b|m(?=\s*(?:dhs?|mad)\b)|k\b))?",
+    re.IGNORECASE
+)
+SPACES_RE = re.compile(r"[\s\u00a0\u202f]")
+ISO_DATE_RE = re.compile(r"\b(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})\b")
+NUMERIC_DATE_RE = re.compile(r"\b(?P<day>\d{1,2})\s*[/.-]\s*(?P<month>\d{1,2})\s*[/.-]\s*(?P<year>\d{4}|\d{2})\b")
+FRENCH_DATE_RE = re.compile(
+    r"\b(?P<day>\d{1,2})(?:er)?\s+(?P<month>%s)\s+(?P<year>\d{4})\b" % "|".join(FRENCH_MONTHS),
+    re.IGNORECASE
+)
+
+# ---------------------------------------------------------------------------
+# Amounts
+# ---------------------------------------------------------------------------
+
+def _multiplier(word: Optional[str]) -> float:
+    if not word:
+        return 1.0
+    return MULTIPLIERS.get(word.lower().rstrip("s"), 1.0)
+
+def number_to_float(number: str) -> float:
+    """
+    Convert a number written with French or English separators.
+    With both "," and "." the last one is the decimal separator; with a single kind
+    of separator, it separates thousands if repeated or followed by exactly 3 digits.
+
+    Args:
+        number (str): Number as written (e.g. "1 234 567,89", "1.250.000", "2,5")
+
+    Returns:
+        float: Value
+    """
+    n = SPACES_RE.sub("", number)
+    if "," in n and "." in n:
+        decimal, thousands = (",", ".") if n.rfind(",") > n.rfind(".") else (".", ",")
+        return float(n.replace(thousands, "").replace(decimal, "."))
+    for separator in (",", "."):
+        if separator in n:
+            tail = n.rpartition(separator)[2]
+            if n.count(separator) > 1 or len(tail) == 3:
+                return float(n.replace(separator, ""))
+            return float(n.replace(separator, "."))
+    return float(n)
+
+def parse_amount(value: Any) -> Optional[float]:
+    """
+    Parse a monetary amount; when a text holds several amounts, the largest one is kept.
+
+    Args:
+        value (Any): Number or text (e.g. "1 234 567,89 DH", "2,5 millions de dirhams")
+
+    Returns:
+        Optional[float]: Amount, None if no amount is found
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, np.number)):
+        return None if pd.isna(value) else float(value)
+    return _parse_amount_text(str(value))
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_amount_text(text: str) -> Optional[float]:
+    amounts = [
+        number_to_float(match.group("number")) * _multiplier(match.group("multiplier"))
+        for match in AMOUNT_RE.finditer(text)
+    ]
+    return max(amounts) if amounts else None
+
+def _parse_unique(series: pd.Series, parser: Callable[[Any], Any], missing: Any) -> np.ndarray:
+    """
+    Apply a scalar parser to each distinct value of a column only once,
+    then broadcast the results back to the rows with NumPy
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    parsed = np.array([parser(value) for value in uniques] + [None], dtype=object)
+    parsed[pd.isna(parsed)] = missing
+    # Missing values have code -1, i.e. the trailing None
+    return parsed[codes]
+
+def parse_amount_series(values) -> pd.Series:
+    """
+    Column version of parse_amount.
+    Numeric columns are converted directly; text columns are parsed once per distinct value.
+
+    Args:
+        values: pandas Series (or sequence) of numbers and/or texts
+
+    Returns:
+        pd.Series: float amounts, NaN where no amount is found
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype(float)
+    return pd.Series(_parse_unique(series, parse_amount, np.nan).astype(float), index=series.index)
+
+# ---------------------------------------------------------------------------
+# Dates
+# ---------------------------------------------------------------------------
+
+def _make_date(year: str, month: int, day: str) -> Optional[date]:
+    year_value = int(year)
+    if year_value < 100:
+        year_value += 2000
+    try:
+        return date(year_value, int(month), int(day))
+    except ValueError:
+        return None
+
+def parse_date(value: Any) -> Optional[date]:
+    """
+    Parse a date (ISO, dd/mm/yyyy and variants, "1er juin 2024").
+
+    Args:
+        value (Any): date, datetime or text containing a date
+
+    Returns:
+        Optional[date]: Date, None if no valid date is found
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return None if pd.isna(value) else value.date()
+    if isinstance(value, date):
+        return value
+    return _parse_date_text(str(value))
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_date_text(text: str) -> Optional[date]:
+    for pattern in (ISO_DATE_RE, NUMERIC_DATE_RE, FRENCH_DATE_RE):
+        match = pattern.search(text)
+        if match:
+            month = match.group("month")
+            month = FRENCH_MONTHS[month.lower()] if pattern is FRENCH_DATE_RE else int(month)
+            return _make_date(match.group("year"), month, match.group("day"))
+    return None
+
+def parse_date_series(values) -> pd.Series:
+    """
+    Column version of parse_date.
+    Datetime columns are normalized directly; other columns are parsed once per distinct value.
+
+    Args:
+        values: pandas Series (or sequence) of dates and/or texts
+
+    Returns:
+        pd.Series: datetime64 values, NaT where no valid date is found
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.normalize()
+    return pd.Series(pd.to_datetime(_parse_unique(series, parse_date, None)), index=series.index)
@@ -0,0 +1,71 @@
+"""
+Stage-level timing and token accounting for the extraction pipeline.
+
+Pipeline code wraps its stages with `stage("name")` and reports LLM usage with
+`record_tokens`. Both are no-ops unless a recording is active, so they cost
+nothing in the Streamlit app; benchmarks enable them with `recording()`.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+class StageRecorder:
+    """Thread-safe collection of stage durations and token counts"""
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = {}
+        self.tokens: Dict[str, int] = {"prompt_tokens": 0, "completion_tokens": 0, "llm_calls": 0}
+        self._lock = threading.Lock()
+
+    def add_duration(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.durations.setdefault(name, []).append(seconds)
+
+    def add_tokens(self, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self.tokens["prompt_tokens"] += prompt_tokens
+            self.tokens["completion_tokens"] += completion_tokens
+            self.tokens["llm_calls"] += 1
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {"durations": {name: list(values) for name, values in self.durations.items()},
+                    "tokens": dict(self.tokens)}
+
+_recorder: Optional[StageRecorder] = None
+
+@contextmanager
+def recording():
+    """Activate stage recording for the duration of the block"""
+    global _recorder
+    previous = _recorder
+    _recorder = StageRecorder()
+    try:
+        yield _recorder
+    finally:
+        _recorder = previous
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage (no-op when no recording is active)"""
+    recorder = _recorder
+    if recorder is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add_duration(name, time.perf_counter() - start)
+
+def record_duration(name: str, seconds: float) -> None:
+    """Record a duration measured elsewhere (e.g. in a worker process)"""
+    if _recorder is not None:
+        _recorder.add_duration(name, seconds)
+
+def record_tokens(usage) -> None:
+    """Record the token usage of an LLM response (object with prompt/completion tokens)"""
+    if _recorder is not None and usage is not None:
+        _recorder.add_tokens(getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0)
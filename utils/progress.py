@@ -0,0 +1,90 @@
+"""
+Progress reporting for the extraction pipeline.
+
+The extraction core only talks to a ProgressReporter, so it can run in the
+Streamlit app (StreamlitProgress), from the command line (LoggingProgress) or
+silently (ProgressReporter itself, every method is a no-op).
+"""
+
+import logging
+from contextlib import contextmanager
+
+class ProgressReporter:
+    """Progress callback interface; the base class ignores every event"""
+
+    @contextmanager
+    def step(self, message: str):
+        """Long-running step (spinner in the UI)"""
+        yield
+
+    def status(self, message: str) -> None:
+        """Informational message"""
+
+    def warning(self, message: str) -> None:
+        """Non-fatal problem"""
+
+    def error(self, message: str) -> None:
+        """Fatal problem"""
+
+    def progress(self, fraction: float) -> None:
+        """Field extraction progress, between 0 and 1"""
+
+    def field_done(self, field: str, value: str) -> None:
+        """A field has been extracted (partial result)"""
+
+class StreamlitProgress(ProgressReporter):
+    """
+    Reports to the current Streamlit page.
+    Must be used from the script thread: Streamlit elements can't be updated from worker threads.
+    """
+
+    def __init__(self):
+        self._progress_bar = None
+
+    @contextmanager
+    def step(self, message: str):
+        import streamlit as st
+        with st.spinner(message):
+            yield
+
+    def status(self, message: str) -> None:
+        import streamlit as st
+        st.write(message)
+
+    def warning(self, message: str) -> None:
+        import streamlit as st
+        st.warning(message)
+
+    def error(self, message: str) -> None:
+        import streamlit as st
+        st.error(message)
+
+    def progress(self, fraction: float) -> None:
+        import streamlit as st
+        if self._progress_bar is None:
+            self._progress_bar = st.progress(0)
+        self._progress_bar.progress(min(1.0, max(0.0, fraction)))
+
+class LoggingProgress(ProgressReporter):
+    """Reports to a logger, each message prefixed with a label (e.g. the tender name)"""
+
+    def __init__(self, label: str = "", logger: logging.Logger = None):
+        self.label = label
+        self.logger = logger or logging.getLogger("utils.extraction")
+
+    def _format(self, message: str) -> str:
+        return f"[{self.label}] {message}" if self.label else message
+
+    @contextmanager
+    def step(self, message: str):
+        self.logger.info(self._format(message))
+        yield
+
+    def status(self, message: str) -> None:
+        self.logger.info(self._format(message))
+
+    def warning(self, message: str) -> None:
+        self.logger.warning(self._format(message))
+
+    def error(self, message: str) -> None:
+        self.logger.error(self._format(message))
@@ -0,0 +1,174 @@
+"""
+Rule-based fast path for the regular fields of Moroccan tenders.
+
+Reference numbers (N° 12/2024), dates (dd/mm/yyyy), amounts in dirhams and
+contact details (+212 phones, emails) follow very regular patterns. They are
+extracted here with compiled regular expressions over the parsed markdown, each
+with a confidence score; only the fields below the confidence threshold go
+through the retrieval + LLM path.
+"""
+
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Constants
+CONFIDENCE_THRESHOLD = 0.8  # Rule results at or above this confidence skip the LLM
+KEYWORD_WINDOW = 200  # Characters searched after a keyword (e.g. "caution provisoire"), within its sentence
+CORROBORATING_MATCHES = 2  # Matches agreeing on a value before it can reach the threshold
+SINGLE_MATCH_CONFIDENCE = 0.7  # A lone match may be a false positive: below the threshold
+DATE_KEYWORD_WINDOW = 80  # Characters searched before a date for its keyword (e.g. "publié le")
+
+_AMOUNT = (
+    r"(?P<amount>\d{1,3}(?:[ .\u00a0\u202f]\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d{1,2})?)"
+    r"\s*(?P<currency>dirhams?|dhs?|mad)\b(?P<tax>\s*(?:ttc|ht)\b)?"
+)
+# Text between a keyword and its amount: stops at line and sentence ends, and at "néant"
+# ("Caution provisoire : Néant") or "définitif" (the next amount belongs to another caution)
+_KEYWORD_WINDOW = r"(?:(?![.;!?](?:\s|$)|n[ée]ant\b|d[ée]finiti)[^\n]){0,%d}?" % KEYWORD_WINDOW
+CAUTION_RE = re.compile(r"caution\s+provisoire%s%s" % (_KEYWORD_WINDOW, _AMOUNT), re.IGNORECASE)
+ESTIMATION_RE = re.compile(
+    r"(?:estimation|montant\s+estim[ée]|co[uû]t\s+(?:estimatif|pr[ée]visionnel))%s%s"
+    % (_KEYWORD_WINDOW, _AMOUNT),
+    re.IGNORECASE
+)
+REFERENCE_RE = re.compile(
+    r"(?:appel\s+d['’]\s*offres?|consultation|\bAOO?\b)[^\n]{0,80}?"
+    r"\bn\s*[°ºo]\s*[:.]?\s*(?P<reference>[A-Z0-9]{1,12}(?:\s*[/-]\s*[A-Z0-9]{1,12})*\s*/\s*(?:19|20)\d{2}\b"
+    r"(?:/[A-Z][A-Z0-9-]{0,15}\b)*)",  # Trailing service code, e.g. 05/2024/DIDH
+    re.IGNORECASE
+)
+DATE_RE = re.compile(r"\b(?P<day>[0-3]?\d)\s*[/.-]\s*(?P<month>[01]?\d)\s*[/.-]\s*(?P<year>(?:19|20)\d{2})\b")
+# "Date" is stored as the publication date: only dates announced as such are taken. The window
+# stops at sentence ends and at the deadline / opening keywords (their date is another one)
+PUBLICATION_KEYWORDS_RE = re.compile(
+    r"(?:date\s+de\s+(?:la\s+)?publication|publi[ée]e?s?\b|paru(?:e|tion)?\b)"
+    r"(?:(?![.;!?](?:\s|$)|date\s+limite|remise\s+des|ouverture\s+des|s[ée]ance\s+publique)[^\n]){0,%d}$"
+    % DATE_KEYWORD_WINDOW,
+    re.IGNORECASE
+)
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE_RE = re.compile(r"(?<!\d)(?:\+212|00212|0)\s*\(?0?\)?\s*[5-7](?:[\s.-]?\d){8}(?!\d)")
+
+def _confidence(candidates: List[str]) -> Tuple[Optional[str], float]:
+    """
+    Pick the most frequent candidate and score it.
+    A single distinct value scores 0.9 (0.95 if found 3 times or more); with several
+    distinct values the score drops with the share of the most frequent one. A value
+    matched only once stays below the threshold, whatever the other candidates.
+    """
+    if not candidates:
+        return None, 0.0
+    counts = Counter(candidates)
+    value, count = counts.most_common(1)[0]
+    if count < CORROBORATING_MATCHES:
+        return value, SINGLE_MATCH_CONFIDENCE if len(counts) == 1 else 0.5
+    if len(counts) == 1:
+        return value, 0.95 if count > CORROBORATING_MATCHES else 0.9
+    return value, 0.5 + 0.45 * count / len(candidates)
+
+def _amount_digits(amount: str) -> str:
+    """Integer part of an amount, digits only (for comparing candidates)"""
+    integer = re.split(r",\d{1,2}$", amount.strip())[0]
+    if re.fullmatch(r"\d+\.\d{1,2}", integer):
+        integer = integer.split(".")[0]
+    return re.sub(r"\D", "", integer)
+
+def _extract_amount(pattern: re.Pattern, text: str) -> Tuple[Optional[str], float]:
+    """Amount in dirhams following a keyword, as written in the document"""
+    matches = list(pattern.finditer(text))
+    digits = [_amount_digits(m.group("amount")) for m in matches]
+    best, confidence = _confidence([d for d in digits if d and int(d) > 0])
+    if best is None:
+        return None, 0.0
+    match = matches[digits.index(best)]
+    value = f"{match.group('amount')} {match.group('currency')}{match.group('tax') or ''}"
+    return re.sub(r"\s+", " ", value).strip(), confidence
+
+def extract_caution(text: str) -> Tuple[Optional[str], float]:
+    """Montant de la caution provisoire"""
+    return _extract_amount(CAUTION_RE, text)
+
+def extract_estimation(text: str) -> Tuple[Optional[str], float]:
+    """Estimation des coûts du maître d'ouvrage"""
+    return _extract_amount(ESTIMATION_RE, text)
+
+def extract_reference(text: str) -> Tuple[Optional[str], float]:
+    """Numéro de l'appel d'offres (e.g. 12/2024, 05/CR/2024)"""
+    references = [re.sub(r"\s+", "", m.group("reference")).upper() for m in REFERENCE_RE.finditer(text)]
+    return _confidence(references)
+
+def _valid_date(match: re.Match) -> Optional[str]:
+    day, month = int(match.group("day")), int(match.group("month"))
+    if 1 <= day <= 31 and 1 <= month <= 12:
+        return f"{day:02d}/{month:02d}/{match.group('year')}"
+    return None
+
+def extract_date(text: str) -> Tuple[Optional[str], float]:
+    """
+    Date de l'appel d'offres, stored as its publication date ("avis publié le ...",
+    "date de publication : ..."). Other dates (deadline, opening of bids, signatures)
+    are left to the LLM.
+    """
+    dates = []
+    for match in DATE_RE.finditer(text):
+        date = _valid_date(match)
+        if date and PUBLICATION_KEYWORDS_RE.search(text[max(0, match.start() - DATE_KEYWORD_WINDOW):match.start()]):
+            dates.append(date)
+    return _confidence(dates)
+
+def extract_contact(text: str) -> Tuple[Optional[str], float]:
+    """E-mail addresses and phone numbers"""
+    email_matches = [email.rstrip(".").lower() for email in EMAIL_RE.findall(text)]
+    phone_matches = [re.sub(r"[\s.()-]", "", phone) for phone in PHONE_RE.findall(text)]
+    emails = list(dict.fromkeys(email_matches))
+    phones = list(dict.fromkeys(phone_matches))
+    if not emails and not phones:
+        return None, 0.0
+    if len(email_matches) + len(phone_matches) < CORROBORATING_MATCHES:
+        return ("Email: " + emails[0]) if emails else ("Tél: " + phones[0]), SINGLE_MATCH_CONFIDENCE
+    parts = []
+    if emails:
+        parts.append("Email: " + ", ".join(emails))
+    if phones:
+        parts.append("Tél: " + ", ".join(phones))
+    # Contact details are unambiguous, but many of them probably mix several services
+    return " | ".join(parts), 0.9 if len(emails) + len(phones) <= 4 else 0.7
+
+EXTRACTORS: Dict[str, Callable[[str], Tuple[Optional[str], float]]] = {
+    "Référence": extract_reference,
+    "Date": extract_date,
+    "Estimation des coûts": extract_estimation,
+    "Montant de la caution": extract_caution,
+    "Contact": extract_contact,
+}
+
+def extract_with_rules(text: str) -> Dict[str, Tuple[str, float]]:
+    """
+    Run every rule-based extractor over the document text.
+
+    Args:
+        text (str): Parsed markdown of the tender documents
+
+    Returns:
+        Dict[str, Tuple[str, float]]: Field -> (value, confidence), for the fields found
+    """
+    results = {}
+    for field, extractor in EXTRACTORS.items():
+        value, confidence = extractor(text)
+        if value:
+            results[field] = (value, confidence)
+    return results
+
+def confident_fields(text: str, threshold: float = CONFIDENCE_THRESHOLD) -> Dict[str, str]:
+    """
+    Fields extracted by rules with enough confidence to skip the LLM.
+
+    Args:
+        text (str): Parsed markdown of the tender documents
+        threshold (float): Minimum confidence
+
+    Returns:
+        Dict[str, str]: Field -> value
+    """
+    return {field: value for field, (value, confidence) in extract_with_rules(text).items() if confidence >= threshold}
@@ -0,0 +1,275 @@
+"""
+Managed storage of the session directories (cached PDFs, markdown, indices).
+
+A SQLite manifest records the size and last access of every cache entry, so
+enforcing the disk quota doesn't walk the data directory: entries are evicted
+least recently used first, from a background thread started once per process
+instead of on every render of the extraction page. Entries the manifest doesn't
+know yet (created before it existed, or by a process that crashed mid-write)
+are picked up by a periodic reconciliation with the disk.
+"""
+
+import os
+import time
+import shutil
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from utils.answer_cache import get_answer_cache
+
+logger = logging.getLogger(__name__)
+
+# Constants
+CACHE_DIR = "data/cache"
+MANIFEST_PATH = os.path.join(CACHE_DIR, "manifest.db")
+LEGACY_SESSIONS_DIR = "data"  # data/session_<timestamp>, created before the cache existed
+MAX_CACHE_SIZE_BYTES = 2 * 1024 * 1024 * 1024  # 2GB
+MIN_ENTRY_AGE_SECONDS = 3600  # Never evict entries used during the last hour
+GC_INTERVAL_SECONDS = 600
+RECONCILE_EVERY_RUNS = 6  # Compare the manifest with the disk every 6 GC runs (1 hour)
+
+def dir_size(path: str) -> int:
+    """Total size in bytes of the files under a directory"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for file_name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file_name))
+            except OSError:
+                pass
+    return total
+
+class SessionStore:
+    """
+    SQLite manifest of the cache entries with quota enforcement (LRU eviction).
+    Each process opens its own connection; safe to share between threads.
+    """
+
+    def __init__(self, db_path: str = MANIFEST_PATH, cache_dir: str = CACHE_DIR,
+                 max_size_bytes: int = MAX_CACHE_SIZE_BYTES):
+        """
+        Initialize the session store.
+
+        Args:
+            db_path (str): Path to SQLite manifest
+            cache_dir (str): Root directory of the cache entries
+            max_size_bytes (int): Disk quota of the cache
+        """
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._gc_thread = None
+        self._gc_stop = threading.Event()
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the manifest table if it doesn't exist."""
+        with self._lock:
+            self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                created_at REAL,
+                last_access REAL
+            )
+            ''')
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)")
+            self.conn.commit()
+
+    @staticmethod
+    def _key(entry_dir: str) -> str:
+        return os.path.normpath(entry_dir)
+
+    def touch(self, entry_dir: str) -> None:
+        """
+        Record an access to an entry (registers it if unknown).
+
+        Args:
+            entry_dir (str): Cache entry directory
+        """
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO entries (path, size, created_at, last_access) VALUES (?, 0, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET last_access = excluded.last_access",
+                (self._key(entry_dir), now, now)
+            )
+            self.conn.commit()
+
+    def update_size(self, entry_dir: str) -> int:
+        """
+        Measure an entry after files were written to it, and record an access.
+
+        Args:
+            entry_dir (str): Cache entry directory
+
+        Returns:
+            int: Size of the entry in bytes
+        """
+        size = dir_size(entry_dir)
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO entries (path, size, created_at, last_access) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, last_access = excluded.last_access",
+                (self._key(entry_dir), size, now, now)
+            )
+            self.conn.commit()
+        return size
+
+    def total_size(self) -> int:
+        """Total size in bytes of the entries, as recorded in the manifest"""
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _disk_entries(self) -> List[str]:
+        """Entry directories found on disk: cached documents, cached tenders and legacy session dirs"""
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for section in os.listdir(self.cache_dir):
+                section_dir = os.path.join(self.cache_dir, section)
+                if os.path.isdir(section_dir):
+                    entries.extend(os.path.join(section_dir, name) for name in os.listdir(section_dir))
+        if os.path.isdir(LEGACY_SESSIONS_DIR):
+            entries.extend(
+                os.path.join(LEGACY_SESSIONS_DIR, name)
+                for name in os.listdir(LEGACY_SESSIONS_DIR) if name.startswith("session_")
+            )
+        return [self._key(entry) for entry in entries if os.path.isdir(entry)]
+
+    def reconcile(self) -> Dict[str, int]:
+        """
+        Register the entries missing from the manifest and forget the ones deleted from disk.
+
+        Returns:
+            Dict[str, int]: Number of added and removed manifest rows
+        """
+        on_disk = set(self._disk_entries())
+        with self._lock:
+            known = {row[0] for row in self.conn.execute("SELECT path FROM entries")}
+
+        added = on_disk - known
+        removed = known - on_disk
+        rows = []
+        for path in added:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            rows.append((path, dir_size(path), mtime, mtime))
+
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO entries (path, size, created_at, last_access) VALUES (?, ?, ?, ?)", rows
+            )
+            self.conn.executemany("DELETE FROM entries WHERE path = ?", [(path,) for path in removed])
+            self.conn.commit()
+        return {"added": len(rows), "removed": len(removed)}
+
+    def evict(self, max_size_bytes: Optional[int] = None) -> int:
+        """
+        Evict least recently used entries until the cache fits in the quota.
+
+        Args:
+            max_size_bytes (Optional[int]): Disk quota, the store's one if None
+
+        Returns:
+            int: Number of evicted entries
+        """
+        max_size_bytes = self.max_size_bytes if max_size_bytes is None else max_size_bytes
+        total_size = self.total_size()
+        if total_size <= max_size_bytes:
+            return 0
+
+        with self._lock:
+            candidates = self.conn.execute(
+                "SELECT path, size FROM entries WHERE last_access < ? ORDER BY last_access",
+                (time.time() - MIN_ENTRY_AGE_SECONDS,)
+            ).fetchall()
+
+        evicted = 0
+        for path, size in candidates:
+            if total_size <= max_size_bytes:
+                break
+            with self._lock:
+                # Skip entries accessed by another process since the selection
+                cursor = self.conn.execute(
+                    "DELETE FROM entries WHERE path = ? AND last_access < ?",
+                    (path, time.time() - MIN_ENTRY_AGE_SECONDS)
+                )
+                self.conn.commit()
+            if cursor.rowcount:
+                shutil.rmtree(path, ignore_errors=True)
+                # Chatbot answers computed from the index of the entry
+                get_answer_cache().invalidate(path)
+                total_size -= size
+                evicted += 1
+
+        if evicted:
+            logger.info("Evicted %d cache entries, %d bytes left", evicted, total_size)
+        return evicted
+
+    def collect(self, reconcile: bool = False) -> int:
+        """
+        One cleanup run: optional reconciliation with the disk, then quota enforcement.
+
+        Args:
+            reconcile (bool): Compare the manifest with the disk first
+
+        Returns:
+            int: Number of evicted entries
+        """
+        if reconcile:
+            self.reconcile()
+        return self.evict()
+
+    def _gc_loop(self, interval_seconds: float):
+        runs = 0
+        while not self._gc_stop.is_set():
+            try:
+                self.collect(reconcile=runs % RECONCILE_EVERY_RUNS == 0)
+            except Exception as e:
+                # Cleanup must never take the app down
+                logger.warning("Cache cleanup failed: %s", e)
+            runs += 1
+            self._gc_stop.wait(interval_seconds)
+
+    def start_gc(self, interval_seconds: float = GC_INTERVAL_SECONDS) -> None:
+        """
+        Start the background cleanup thread (once per process).
+
+        Args:
+            interval_seconds (float): Delay between two cleanup runs
+        """
+        with self._lock:
+            if self._gc_thread is not None and self._gc_thread.is_alive():
+                return
+            self._gc_stop.clear()
+            self._gc_thread = threading.Thread(
+                target=self._gc_loop, args=(interval_seconds,), name="cache-gc", daemon=True
+            )
+            self._gc_thread.start()
+
+    def stop_gc(self) -> None:
+        """Stop the background cleanup thread."""
+        self._gc_stop.set()
+        if self._gc_thread is not None:
+            self._gc_thread.join()
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_session_store() -> SessionStore:
+    """Process-wide session store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore()
+        return _store
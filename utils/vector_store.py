@@ -2,13 +2,15 @@ import os
 import glob
 import streamlit as st
 from typing import Dict, Any, List, Optional
-from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, StorageContext, load_index_from_storage
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.llms.openai import OpenAI as LlamaIndexOpenAI
-from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core import SimpleDirectoryReader
 from llama_index.core import Settings
+from utils.answer_cache import get_answer_cache
+from utils.backends import get_llama_index_llm
+from utils.embedding_cache import get_embed_model
+from utils.chunking import SectionNodeParser
+from utils.mmap_index import EmptyIndexError, MmapVectorIndex, has_mmap_index
 
-def create_vector_index(md_path: str) -> Optional[VectorStoreIndex]:
+def create_vector_index(md_path: str) -> Optional[MmapVectorIndex]:
     """
     Build vector store index from markdown document and persist it.
     
@@ -16,7 +18,7 @@ def create_vector_index(md_path: str) -> Optional[VectorStoreIndex]:
         md_path (str): Path to markdown file
         
     Returns:
-        VectorStoreIndex: Indexed document or None if error
+        MmapVectorIndex: Indexed document or None if error
     """
     try:
         # Check if file exists
@@ -25,8 +27,8 @@ def create_vector_index(md_path: str) -> Optional[VectorStoreIndex]:
             return None
             
         # Initialize embedding model and LLM
-        embed_model = OpenAIEmbedding(model="text-embedding-3-small")
-        llm = LlamaIndexOpenAI(model="gpt-3.5-turbo")
+        embed_model = get_embed_model("text-embedding-3-small")
+        llm = get_llama_index_llm("gpt-3.5-turbo")
         
         # Set global settings
         Settings.llm = llm
@@ -38,11 +40,10 @@ def create_vector_index(md_path: str) -> Optional[VectorStoreIndex]:
         persist_dir = f"data/indices/{doc_name}"
         
         # Check if index already exists
-        if os.path.exists(persist_dir):
+        if has_mmap_index(persist_dir):
             try:
-                # Load existing index
-                storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
-                return load_index_from_storage(storage_context)
+                # Load existing index (rebuilt if it comes from another embedding model)
+                return MmapVectorIndex.load(persist_dir, embed_model)
             except Exception as e:
                 st.warning(f"Failed to load existing index: {e}. Recreating...")
                 # Continue to recreate the index
@@ -58,22 +59,24 @@ def create_vector_index(md_path: str) -> Optional[VectorStoreIndex]:
             return None
         
         # Create index
-        index = VectorStoreIndex.from_documents(
-            docs, 
-            show_progress=True
-        )
+        nodes = SectionNodeParser().get_nodes_from_documents(docs, show_progress=True)
+        index = MmapVectorIndex.build(nodes)
         
-        # Persist index
-        index.storage_context.persist(persist_dir=persist_dir)
+        # Persist index (answers computed from a previous one are stale)
+        index.persist(persist_dir)
+        get_answer_cache().invalidate(persist_dir)
         
         return index
+    except EmptyIndexError as e:
+        st.warning(f"{md_path}: {e}")
+        return None
     except Exception as e:
         import traceback
         st.error(f"Error creating vector index for {md_path}: {e}")
         st.error(traceback.format_exc())
         return None
 
-def load_vector_indices(index_paths: Dict[str, str]) -> Dict[str, VectorStoreIndex]:
+def load_vector_indices(index_paths: Dict[str, str]) -> Dict[str, MmapVectorIndex]:
     """
     Load vector indices from persisted storage.
     
@@ -81,13 +84,13 @@ def load_vector_indices(index_paths: Dict[str, str]) -> Dict[str, VectorStoreInd
         index_paths (Dict[str, str]): Paths to markdown files
         
     Returns:
-        Dict[str, VectorStoreIndex]: Loaded indices
+        Dict[str, MmapVectorIndex]: Loaded indices
     """
     indices = {}
     
     # Initialize embed model and LLM
-    embed_model = OpenAIEmbedding(model="text-embedding-3-small")
-    llm = LlamaIndexOpenAI(model="gpt-3.5-turbo")
+    embed_model = get_embed_model("text-embedding-3-small")
+    llm = get_llama_index_llm("gpt-3.5-turbo")
     
     # Set global settings
     Settings.llm = llm
@@ -103,11 +106,10 @@ def load_vector_indices(index_paths: Dict[str, str]) -> Dict[str, VectorStoreInd
         doc_name = file_name.split('_')[0] if '_' in file_name else name
         persist_dir = f"data/indices/{doc_name}"
         
-        if os.path.exists(persist_dir):
+        if has_mmap_index(persist_dir):
             try:
                 # Load existing index
-                storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
-                indices[name] = load_index_from_storage(storage_context)
+                indices[name] = MmapVectorIndex.load(persist_dir, embed_model)
                 st.success(f"Loaded index for {name}")
             except Exception as e:
                 st.warning(f"Failed to load existing index for {name}: {e}. Creating new index...")